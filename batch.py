@@ -0,0 +1,349 @@
+"""
+Replays report requests through the pipeline of the lambda handler on a pool of worker processes,
+to generate reports in bulk or to measure the pipeline under load
+
+    python batch.py <directory|glob|file.jsonl> [--workers N] [--output DIR] [--upload]
+                    [--in-process] [--soak N]
+
+A directory is read for *.json files, a .jsonl file holds one event per line. Every event is an
+SNS notification, as received by the handler, or its message alone. The reports are written to
+OUTPUT/<bucket>/<user_id>/<video_id>.pdf, the same keys they are uploaded to, unless --upload
+runs the whole handler (upload and email included). The result of every report is appended to
+OUTPUT/results.jsonl as it completes, and a throughput, latency and failure summary is printed
+at the end. Reports only start while the memory they are expected to use fits under
+ADMISSION_MEMORY_CEILING (see common.admission), so --workers can be the number of cpus whatever
+the memory of the node. --soak N generates the report of the first request N times in this
+process instead, the way a warm container does, and fails when figures are left open or memory
+keeps growing (see common.figures.soak_check):
+
+    python batch.py data/sample_video_data.json --soak 200
+"""
+from typing import Dict, Iterator, List
+import argparse
+import concurrent.futures
+import functools
+import glob
+import json
+import os
+import pathlib
+import shutil
+import statistics
+import time
+import traceback
+from common.admission import *
+
+# reports submitted to the pool and not yet completed, per worker. the requests are read as they
+# are submitted, so that a large replay is never held in memory at once. the memory of a report is
+# reserved when it is submitted, a report waiting for a worker would hold memory it does not use
+IN_FLIGHT_PER_WORKER = 1
+
+# latency percentiles of the summary
+summary_percentiles = [50, 90, 99]
+
+
+def read_events(source: str) -> Iterator[Dict]:
+    """
+    Reads the report requests to replay
+
+    Args:
+        param(str): a directory of json files, a glob pattern or a jsonl file
+
+    Returns:
+        Iterator[Dict]: the message of every event, in file order
+    """
+    path_source = pathlib.Path(source)
+    if path_source.is_dir():
+        list_paths = sorted(path_source.glob("*.json"))
+    elif path_source.suffix == ".jsonl":
+        with open(path_source, encoding="utf8") as file:
+            for line in file:
+                if line.strip():
+                    yield _message(json.loads(line))
+        return
+    else:
+        list_paths = sorted(pathlib.Path(path) for path in glob.glob(source))
+
+    for path_event in list_paths:
+        with open(path_event, encoding="utf8") as file:
+            yield _message(json.load(file))
+
+
+def _message(event: Dict) -> Dict:
+    """
+    Message of an SNS notification, the way the handler reads it, or the event when it is one
+    """
+    if "Records" not in event:
+        return event
+    message = event["Records"][0]["Sns"]["Message"]
+    return message if isinstance(message, dict) else json.loads(message)
+
+
+def _start_worker(path_tmp: str) -> None:
+    """
+    Initializes a worker process: its reports are written to a directory of its own, the fixed file
+    names of the reports would collide between workers otherwise, and what every report of a warm
+    container reuses (the modules, the static pages, the resampled images) is prepared before the
+    first report is timed
+    """
+    from common.artifacts import set_artifacts_directory
+
+    set_artifacts_directory(pathlib.Path(path_tmp) / f"batch-worker-{os.getpid()}")
+
+    import index
+
+    index.warm_up()
+
+
+def _run_report(data: Dict, path_output: str, upload: bool) -> Dict:
+    """
+    Generates the report of a request in a worker process
+
+    Returns:
+        Dict: the request, the files written or the error, and the seconds taken
+    """
+    import index
+
+    result = {
+        "user_id": data.get("user_id"),
+        "video_id": data.get("video_id"),
+        "pid": os.getpid(),
+    }
+    start = time.perf_counter()
+    try:
+        if not data.get("user_id"):
+            raise ValueError("no user id given")
+        if upload:
+            result["response"] = index.handler({"Records": [{"Sns": {"Message": data}}]}, None)
+        else:
+            payload, generate_pdf = index._generate_report(data)
+            result["peak_memory"] = payload["peak_memory"]
+            path_report = (
+                pathlib.Path(path_output)
+                / index.leadership_assessment_pdf_bucket
+                / str(data["user_id"])
+                / f"{data['video_id']}.pdf"
+            )
+            path_report.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(generate_pdf, path_report)
+            result["pdf"] = str(path_report)
+            path_thumbnail = index.thumbnail_path(generate_pdf)
+            if path_thumbnail.is_file():
+                shutil.copyfile(path_thumbnail, path_report.with_suffix(".png"))
+                result["thumbnail"] = str(path_report.with_suffix(".png"))
+        result["ok"] = True
+    except Exception as error:
+        result["ok"] = False
+        result["error"] = f"{type(error).__name__}: {error}"
+        result["traceback"] = traceback.format_exc()
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _report_done(
+    admission: AdmissionController, data: Dict, memory: int, future: concurrent.futures.Future
+) -> None:
+    """
+    Frees the memory reserved for a report once it is done, and corrects the estimates by the peak
+    it measured
+    """
+    admission.release(memory)
+    if not future.cancelled() and future.exception() is None:
+        admission.observe(data, future.result())
+
+
+def _percentile(list_values: List[float], percentile: int) -> float:
+    list_values = sorted(list_values)
+    index = min(len(list_values) - 1, round(percentile / 100 * (len(list_values) - 1)))
+    return list_values[index]
+
+
+def summarize(list_results: List[Dict], seconds: float) -> Dict:
+    """
+    Summarizes a batch
+
+    Args:
+        param1(List[Dict]): the result of every report
+        param2(float): wall-clock seconds of the batch
+
+    Returns:
+        Dict: the number of reports and failures, the throughput and the latency percentiles
+    """
+    list_seconds = [result["seconds"] for result in list_results if result["ok"]]
+    summary = {
+        "reports": len(list_results),
+        "failures": sum(not result["ok"] for result in list_results),
+        "seconds": round(seconds, 3),
+        "reports_per_minute": round(60 * len(list_results) / seconds, 2) if seconds else 0.0,
+    }
+    if list_seconds:
+        for percentile in summary_percentiles:
+            summary[f"p{percentile}"] = _percentile(list_seconds, percentile)
+        summary["mean"] = round(statistics.mean(list_seconds), 3)
+        summary["max"] = max(list_seconds)
+    return summary
+
+
+def run_batch(
+    events: Iterator[Dict], path_output: str, workers: int = os.cpu_count(), upload: bool = False
+) -> Dict:
+    """
+    Replays report requests on a pool of worker processes, with at most IN_FLIGHT_PER_WORKER
+    reports per worker submitted at once, and fewer when their memory would not fit under the
+    ceiling of the admission controller. The results are appended to results.jsonl in the output
+    directory as they complete
+
+    Args:
+        param1(Iterator[Dict]): the messages of the handler
+        param2(str): the output directory
+        param3(int): number of worker processes
+        param4(bool): whether the handler uploads and emails the reports
+
+    Returns:
+        Dict: the summary of the batch, see summarize
+    """
+    path_output = pathlib.Path(path_output)
+    path_output.mkdir(parents=True, exist_ok=True)
+    path_tmp = os.environ.get("REPORT_TMP_DIR", "/tmp")
+    list_results, pending = [], set()
+    admission = AdmissionController()
+
+    with concurrent.futures.ProcessPoolExecutor(
+        workers, initializer=_start_worker, initargs=(path_tmp,)
+    ) as executor, open(path_output / "results.jsonl", "w", encoding="utf8") as file_results:
+
+        def collect(return_when):
+            done, not_done = concurrent.futures.wait(pending, return_when=return_when)
+            for future in done:
+                result = future.result()
+                list_results.append(result)
+                file_results.write(json.dumps(result, default=str) + "\n")
+                file_results.flush()
+                status = "ok" if result["ok"] else result["error"]
+                print(f"{result['user_id']}/{result['video_id']} {result['seconds']}s {status}")
+            return not_done
+
+        # the workers are started and warmed up before the clock starts
+        list(executor.map(int, range(workers)))
+        start = time.perf_counter()
+        for data in events:
+            memory = admission.estimate(data)
+            admission.acquire(memory)
+            future = executor.submit(_run_report, data, str(path_output), upload)
+            future.add_done_callback(functools.partial(_report_done, admission, data, memory))
+            pending.add(future)
+            if len(pending) >= IN_FLIGHT_PER_WORKER * workers:
+                pending = collect(concurrent.futures.FIRST_COMPLETED)
+        collect(concurrent.futures.ALL_COMPLETED)
+        seconds = time.perf_counter() - start
+
+    summary = summarize(list_results, seconds)
+    summary["admission"] = admission.status()
+    print("batch", summary)
+    return summary
+
+
+def run_batch_in_process(
+    events: Iterator[Dict], path_output: str, render_concurrency: int = 1, upload: bool = False
+) -> Dict:
+    """
+    Replays report requests in this process with index.generate_reports, which overlaps the
+    uploads of the reports rendered with the rendering of the next ones
+
+    Args:
+        param1(Iterator[Dict]): the messages of the handler
+        param2(str): the output directory
+        param3(int): number of reports rendered at once
+        param4(bool): whether the reports are uploaded and emailed
+
+    Returns:
+        Dict: the summary of the batch, see summarize
+    """
+    import index
+
+    path_output = pathlib.Path(path_output)
+    path_output.mkdir(parents=True, exist_ok=True)
+    index.warm_up()
+    start = time.perf_counter()
+    list_results = index.generate_reports(list(events), render_concurrency, deliver=upload)
+    seconds = time.perf_counter() - start
+
+    with open(path_output / "results.jsonl", "w", encoding="utf8") as file_results:
+        for result in list_results:
+            if result["ok"] and not upload:
+                path_report = (
+                    path_output
+                    / index.leadership_assessment_pdf_bucket
+                    / str(result["user_id"])
+                    / f"{result['video_id']}.pdf"
+                )
+                path_report.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(result["pdf"], path_report)
+                path_thumbnail = index.thumbnail_path(result["pdf"])
+                if path_thumbnail.is_file():
+                    shutil.copyfile(path_thumbnail, path_report.with_suffix(".png"))
+                shutil.rmtree(result.pop("directory"), ignore_errors=True)
+                result["pdf"] = str(path_report)
+            file_results.write(json.dumps(result, default=str) + "\n")
+
+    summary = summarize(list_results, seconds)
+    print("batch", summary)
+    return summary
+
+
+def run_soak(events: Iterator[Dict], n_reports: int) -> Dict:
+    """
+    Generates the report of the first request many times in a row in this process, and checks that
+    its memory stays flat
+
+    Args:
+        param1(Iterator[Dict]): the messages of the handler, only the first one is used
+        param2(int): number of reports generated after the warm up
+
+    Returns:
+        Dict: the rss before and after the reports and its growth, see soak_check
+
+    Raises:
+        AssertionError: a report left a figure open or the rss kept growing
+    """
+    import index
+    from common.figures import soak_check
+
+    data = next(iter(events))
+    index.warm_up()
+    return soak_check(lambda index_report: index._generate_report(data), n_reports)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays report requests on a pool of workers")
+    parser.add_argument("source", help="a directory of json files, a glob pattern or a jsonl file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default="batch_output")
+    parser.add_argument(
+        "--upload", action="store_true", help="run the whole handler: upload and email the reports"
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="render in this process, --workers reports at once, see index.generate_reports",
+    )
+    parser.add_argument(
+        "--soak",
+        type=int,
+        metavar="N",
+        help="generate the report of the first request N times and fail if memory keeps growing",
+    )
+    args = parser.parse_args()
+    if args.soak:
+        try:
+            run_soak(read_events(args.source), args.soak)
+        except AssertionError as error:
+            print("soak check failed:", error)
+            raise SystemExit(1)
+        raise SystemExit(0)
+    if args.in_process:
+        summary = run_batch_in_process(
+            read_events(args.source), args.output, args.workers, args.upload
+        )
+    else:
+        summary = run_batch(read_events(args.source), args.output, args.workers, args.upload)
+    raise SystemExit(1 if summary["failures"] else 0)
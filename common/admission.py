@@ -0,0 +1,289 @@
+from typing import Dict, Iterator, List, Union
+import contextlib
+import os
+import resource
+import sys
+import threading
+import time
+
+# memory (in bytes) the reports of a node may use at once, 0 for ADMISSION_MEMORY_FRACTION of the
+# memory limit of the container (or of the node when it has none)
+ADMISSION_MEMORY_CEILING = int(os.environ.get("ADMISSION_MEMORY_CEILING", 0))
+ADMISSION_MEMORY_FRACTION = float(os.environ.get("ADMISSION_MEMORY_FRACTION", 0.8))
+
+# seconds between two looks at the live memory while a report waits to be admitted
+ADMISSION_POLL_SECONDS = 0.5
+
+# memory (in bytes) a report is expected to add to the process rendering it at its peak, before the
+# peaks of the reports of this runner are measured: a base, plus an amount per skill (the gauges,
+# bars and narrative pages) and per point of its time series (the line charts)
+report_memory_estimates = {
+    "leadership_assessment": {
+        "base": 250 * 1024 * 1024,
+        "per_skill": 4 * 1024 * 1024,
+        "per_point": 16 * 1024,
+    },
+    "talentinsights_assessment": {
+        "base": 150 * 1024 * 1024,
+        "per_skill": 3 * 1024 * 1024,
+        "per_point": 0,
+    },
+}
+
+# time series of the video data the charts of a report are drawn from
+report_time_series = [
+    ("speech_rate", "timestamp_graph_data"),
+    ("power_db", "data"),
+    ("looking_at_camera", "data"),
+    ("smiling", "data"),
+    ("pitch_data", "data"),
+    ("word_data",),
+]
+
+# weight of the last measured peak in the correction of the estimates of a report type
+MEMORY_ESTIMATE_SMOOTHING = 0.3
+
+
+def estimate_report_memory(data: Dict) -> int:
+    """
+    Estimates the memory a report adds to the process rendering it at its peak, from the size of
+    its payload
+
+    Args:
+        param(Dict): the report request (the message of the handler)
+
+    Returns:
+        int: bytes
+    """
+    video_data = data.get("video_data") or {}
+    model = report_memory_estimates.get(
+        video_data.get("assessment_type"), report_memory_estimates["leadership_assessment"]
+    )
+    points = 0
+    for path in report_time_series:
+        value = video_data
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        points += len(value) if isinstance(value, list) else 0
+    skills = len(video_data.get("recruiter_skills") or {})
+    return model["base"] + model["per_skill"] * skills + model["per_point"] * points
+
+
+def _process_memory(pid: int) -> int:
+    """
+    Proportional set size of a process (its shared pages, like the pages forked workers share with
+    their parent, are divided between the processes sharing them), its resident set size when the
+    kernel does not report it
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf8") as file:
+            for line in file:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf8") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def process_tree_memory(pid: Union[int, None] = None) -> int:
+    """
+    Memory used by a process and all its descendants, the worker processes of a runner
+
+    Args:
+        param(int): the process, this process by default
+
+    Returns:
+        int: bytes
+    """
+    pid = pid or os.getpid()
+    if not os.path.isdir("/proc"):
+        # no procfs, only the peak of this process is known (kilobytes on linux, bytes on macos)
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak_rss * (1 if sys.platform == "darwin" else 1024)
+
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf8") as file:
+                # the name of the process is in parentheses and may hold spaces
+                parent = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    memory, list_pids = 0, [pid]
+    while list_pids:
+        pid = list_pids.pop()
+        memory += _process_memory(pid)
+        list_pids.extend(children.get(pid, []))
+    return memory
+
+
+def memory_limit() -> int:
+    """
+    Memory limit of the container, the memory of the node when it has none
+
+    Returns:
+        int: bytes
+    """
+    list_limits = []
+    for path_limit in [
+        "/sys/fs/cgroup/memory.max",
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+    ]:
+        try:
+            with open(path_limit, encoding="utf8") as file:
+                list_limits.append(int(file.read().strip()))
+        except (OSError, ValueError):
+            # no cgroup, or "max" when it is not limited
+            continue
+    try:
+        list_limits.append(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"))
+    except (OSError, ValueError):
+        pass
+    return min(list_limits) if list_limits else 0
+
+
+class AdmissionController:
+    """
+    Starts reports only while the memory they are projected to use stays under a ceiling, so that
+    a node renders as many reports at once as its memory allows and the out-of-memory killer does
+    not take down every report in progress. The memory projected is the live memory of this
+    process and its workers, or the memory they used with no report running plus the estimates of
+    the reports running when that is more, plus the estimate of the report to start. A report is
+    always started when none is running, however large its estimate. The estimates of every report
+    type are corrected by the peaks measured by its reports
+
+    Args:
+        param(int): bytes the reports may use at once, ADMISSION_MEMORY_CEILING or
+        ADMISSION_MEMORY_FRACTION of the memory limit by default
+    """
+
+    def __init__(self, ceiling: int = ADMISSION_MEMORY_CEILING) -> None:
+        self.ceiling = ceiling or int(ADMISSION_MEMORY_FRACTION * memory_limit())
+        self.condition = threading.Condition()
+        self.running = 0
+        self.reserved = 0
+        self.idle_memory = process_tree_memory()
+        self.corrections: Dict[str, float] = {}
+        self.stats = {"admitted": 0, "waited": 0, "wait_seconds": 0.0, "max_running": 0}
+
+    def estimate(self, data: Dict) -> int:
+        """
+        Estimates the memory of a report, see estimate_report_memory, corrected by the peaks
+        measured so far
+
+        Args:
+            param(Dict): the report request
+
+        Returns:
+            int: bytes
+        """
+        assessment_type = (data.get("video_data") or {}).get("assessment_type")
+        with self.condition:
+            correction = self.corrections.get(assessment_type, 1.0)
+        return int(correction * estimate_report_memory(data))
+
+    def observe(self, data: Dict, result) -> None:
+        """
+        Corrects the estimates of a report type by the peak memory measured by one of its reports
+
+        Args:
+            param1(Dict): the report request
+            param2: the result of the report, a dict whose peak_memory is the memory (in bytes)
+            the report added to its process at its peak. Anything else is ignored
+        """
+        peak_memory = result.get("peak_memory") if isinstance(result, dict) else None
+        if not peak_memory or peak_memory <= 0:
+            return
+        assessment_type = (data.get("video_data") or {}).get("assessment_type")
+        ratio = peak_memory / estimate_report_memory(data)
+        with self.condition:
+            correction = self.corrections.get(assessment_type, 1.0)
+            self.corrections[assessment_type] = correction + MEMORY_ESTIMATE_SMOOTHING * (
+                ratio - correction
+            )
+
+    def projected(self, memory: int) -> int:
+        """
+        Memory projected once a report of the given estimate is started
+
+        Args:
+            param(int): the estimate of the report, in bytes
+
+        Returns:
+            int: bytes
+        """
+        return max(process_tree_memory(), self.idle_memory + self.reserved) + memory
+
+    def acquire(self, memory: int) -> None:
+        """
+        Waits until a report fits under the ceiling, and reserves its memory
+
+        Args:
+            param(int): the estimate of the report, in bytes
+        """
+        start = time.perf_counter()
+        with self.condition:
+            waited = False
+            while self.running and self.projected(memory) > self.ceiling:
+                waited = True
+                self.condition.wait(ADMISSION_POLL_SECONDS)
+            self.running += 1
+            self.reserved += memory
+            self.stats["admitted"] += 1
+            self.stats["max_running"] = max(self.stats["max_running"], self.running)
+            if waited:
+                self.stats["waited"] += 1
+                self.stats["wait_seconds"] += time.perf_counter() - start
+
+    def release(self, memory: int) -> None:
+        """
+        Frees the memory reserved for a report once it is done
+
+        Args:
+            param(int): the estimate the report was admitted with
+        """
+        with self.condition:
+            self.running -= 1
+            self.reserved -= memory
+            if not self.running:
+                # what the workers kept from the reports they rendered stays with them
+                self.idle_memory = process_tree_memory()
+            self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def admit(self, memory: int) -> Iterator[None]:
+        """
+        Runs a report once it is admitted, see acquire
+        """
+        self.acquire(memory)
+        try:
+            yield
+        finally:
+            self.release(memory)
+
+    def status(self) -> Dict[str, Union[int, float]]:
+        """
+        Returns:
+            Dict[str, Union[int, float]]: the ceiling, the memory reserved and live, the reports
+            running, and how many were admitted and had to wait
+        """
+        with self.condition:
+            return {
+                "ceiling": self.ceiling,
+                "running": self.running,
+                "reserved": self.reserved,
+                "idle_memory": self.idle_memory,
+                "memory": process_tree_memory(),
+                **{key: round(value, 3) for key, value in self.stats.items()},
+            }
@@ -0,0 +1,115 @@
+from typing import Iterator, Union
+import contextlib
+import contextvars
+import hashlib
+import os
+import pathlib
+import re
+import threading
+
+# directory the artifacts of a report (charts, rendered html, pdf) are written to. /tmp on lambda,
+# where a container renders one report at a time; runners that render several reports at once
+# give each of their worker processes its own directory
+_artifacts_directory = pathlib.Path(os.environ.get("REPORT_TMP_DIR", "/tmp"))
+
+# directory of the report generated by the current thread or task, when a process generates
+# several reports at once, see report_artifacts
+_report_directory = contextvars.ContextVar("report_directory", default=None)
+
+# directories of the reports being generated by this process, two reports never share one
+_reserved_directories = set()
+_reserved_directories_lock = threading.Lock()
+
+
+def artifacts_directory() -> pathlib.Path:
+    """
+    Directory the artifacts of the report being generated are written to
+
+    Returns:
+        pathlib.Path: the directory of the report when it has one, the directory of the process
+        otherwise
+    """
+    return _report_directory.get() or _artifacts_directory
+
+
+def set_artifacts_directory(path: Union[str, pathlib.Path]) -> pathlib.Path:
+    """
+    Changes the directory the artifacts of the reports of this process are written to
+
+    Args:
+        param(Union[str, pathlib.Path]): the directory, created if needed
+
+    Returns:
+        pathlib.Path: the directory
+    """
+    global _artifacts_directory
+    _artifacts_directory = pathlib.Path(path)
+    _artifacts_directory.mkdir(parents=True, exist_ok=True)
+    return _artifacts_directory
+
+
+def artifact_path(name: str) -> pathlib.Path:
+    """
+    Path of an artifact of the report being rendered
+
+    Args:
+        param(str): name of the file
+
+    Returns:
+        pathlib.Path: the path of the file in the artifacts directory
+    """
+    return artifacts_directory() / name
+
+
+def _safe_part(part: str) -> str:
+    """
+    A directory name that stays in its parent: anything but letters, digits, - and _ is replaced,
+    and the names that had to be changed get a digest of the original, so that they do not
+    collide with each other
+    """
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", part)
+    if safe != part or not safe:
+        safe += "-" + hashlib.sha256(part.encode("utf8")).hexdigest()[:8]
+    return safe
+
+
+@contextlib.contextmanager
+def report_artifacts(*parts: str) -> Iterator[pathlib.Path]:
+    """
+    Writes the artifacts of the report generated by the current thread or task to a directory of
+    its own under the directory of the process, so that reports generated at once do not overwrite
+    each other's files. The parts (the user and video ids for instance) are reduced to safe names,
+    they can never lead out of the directory of the process, and the last one gets the lowest
+    suffix no other report of the process is using: identical requests generated at once get
+    directories of their own, and a report generated again reuses the paths of the previous one
+    (the paths of the charts end up in the html of the report, whose fragments are only laid out
+    again when it changes). The directory stays reserved until the block exits, a caller that
+    removes it must do so in the block
+
+    Args:
+        *parts(str): path of the directory, relative to the directory of the process
+
+    Yields:
+        pathlib.Path: the directory
+    """
+    list_parts = [_safe_part(str(part)) for part in parts]
+    with _reserved_directories_lock:
+        suffix = 0
+        while True:
+            directory = _artifacts_directory.joinpath(
+                *list_parts[:-1], f"{list_parts[-1]}.{suffix}"
+            )
+            if directory not in _reserved_directories:
+                break
+            suffix += 1
+        _reserved_directories.add(directory)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        token = _report_directory.set(directory)
+        try:
+            yield directory
+        finally:
+            _report_directory.reset(token)
+    finally:
+        with _reserved_directories_lock:
+            _reserved_directories.discard(directory)
@@ -0,0 +1,206 @@
+from typing import Dict, List, Tuple, Union
+import functools
+import hashlib
+import io
+import os
+import pathlib
+import threading
+import weasyprint
+from PIL import Image
+from .quality import *
+
+# optimized static images by content hash of the source, placed size and quality profile
+optimized_assets = {}
+
+# directory the optimized static images of every quality profile are written to, in a directory
+# of their own per profile so that reports rendered at different profiles never overwrite them
+STATIC_ASSETS_DIR = pathlib.Path(os.environ.get("STATIC_ASSETS_DIR", "/tmp/static_assets"))
+
+# optimized static images served to weasyprint from memory, by their path in the directory of
+# their profile, with the process that prepared them
+static_assets = {}
+static_assets_lock = threading.Lock()
+
+mime_types = {"JPEG": "image/jpeg", "PNG": "image/png"}
+
+
+@functools.lru_cache(maxsize=64)
+def _source_digest(path_source: str, mtime_ns: int, size: int) -> str:
+    return hashlib.sha256(pathlib.Path(path_source).read_bytes()).hexdigest()
+
+
+def optimize_image(
+    content: bytes,
+    placement: Tuple[float, Union[float, None]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> Tuple[bytes, str]:
+    """
+    Resamples an image to the resolution of a quality profile at the size it is placed at, and
+    encodes it again: jpeg at the quality of the profile, png when it has transparency. Images
+    that are already small enough, or that would not get any lighter, are kept as they are
+
+    Args:
+        param1(bytes): the content of the source image
+        param2(Tuple[float, Union[float, None]]): width and height (in inches) of the box the image
+        is contained in, None when only the width constrains it
+        param3(str): name of the quality profile
+
+    Returns:
+        Tuple[bytes, str]: the optimized image and its mime type
+    """
+    profile = get_quality_profile(quality_profile)
+    with Image.open(io.BytesIO(content)) as image:
+        placement_width, placement_height = placement
+        scale = placement_width * profile["dpi"] / image.width
+        if placement_height is not None:
+            scale = min(scale, placement_height * profile["dpi"] / image.height)
+        source = (content, mime_types.get(image.format, "application/octet-stream"))
+        if scale >= 1:
+            return source
+
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        resized = image.resize(size, Image.LANCZOS)
+        buffer = io.BytesIO()
+        if resized.mode in ("RGBA", "LA", "P"):
+            resized.save(buffer, format="PNG", optimize=True)
+            optimized = (buffer.getvalue(), mime_types["PNG"])
+        else:
+            resized.convert("RGB").save(
+                buffer,
+                format="JPEG",
+                quality=profile["jpeg_quality"],
+                optimize=True,
+                progressive=True,
+            )
+            optimized = (buffer.getvalue(), mime_types["JPEG"])
+    # a resampled palette image can take more room than its source
+    return min(optimized, source, key=lambda image: len(image[0]))
+
+
+def asset_directory(quality_profile: str = DEFAULT_QUALITY_PROFILE) -> pathlib.Path:
+    """
+    Directory the static files of the reports rendered at a quality profile are written to
+
+    Args:
+        param(str): name of the quality profile
+
+    Returns:
+        pathlib.Path: the directory, created when missing
+    """
+    get_quality_profile(quality_profile)
+    path_directory = STATIC_ASSETS_DIR / quality_profile
+    path_directory.mkdir(parents=True, exist_ok=True)
+    return path_directory
+
+
+def _write_atomically(path_file: pathlib.Path, content: bytes) -> None:
+    # replaced at once, the other threads and workers of a runner may be reading it. the partial
+    # name is unique to the thread, the threads of a process write the same files
+    path_partial = path_file.with_name(
+        f"{path_file.name}.{os.getpid()}.{threading.get_ident()}.partial"
+    )
+    path_partial.write_bytes(content)
+    os.replace(path_partial, path_file)
+
+
+def prepare_static_files(
+    list_files: List[Union[str, pathlib.Path]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> pathlib.Path:
+    """
+    Copies files the templates use as they are (stylesheets) to the directory of a quality
+    profile, next to its images, so that their relative urls resolve to the images of the profile
+
+    Args:
+        param1(List[Union[str, pathlib.Path]]): the files to copy
+        param2(str): name of the quality profile
+
+    Returns:
+        pathlib.Path: the directory of the profile
+    """
+    path_directory = asset_directory(quality_profile)
+    for path_source in list_files:
+        path_source = pathlib.Path(path_source)
+        path_file = path_directory / path_source.name
+        content = path_source.read_bytes()
+        if not path_file.exists() or path_file.read_bytes() != content:
+            _write_atomically(path_file, content)
+    return path_directory
+
+
+def prepare_static_assets(
+    dict_assets: Dict[str, Tuple[Union[str, pathlib.Path], Tuple[float, Union[float, None]]]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> pathlib.Path:
+    """
+    Makes the optimized version of every static image available in the directory of its quality
+    profile: in memory for asset_url_fetcher, and on disk for the other readers (worker processes,
+    the direct pdf backend). Nothing is done for the images this process already prepared from the
+    same source, so that the reports of a warm container neither decode nor copy them again
+
+    Args:
+        param1(Dict[str, Tuple[Union[str, pathlib.Path], Tuple[float, Union[float, None]]]]):
+        the source and the placed size (in inches) of every image, by its file name
+        param2(str): name of the quality profile
+
+    Returns:
+        pathlib.Path: the directory of the profile, that the templates reference the images in
+    """
+    path_directory = asset_directory(quality_profile)
+    for name, (path_source, placement) in dict_assets.items():
+        path_asset = path_directory / name
+        stat = os.stat(path_source)
+        key = (
+            _source_digest(str(path_source), stat.st_mtime_ns, stat.st_size),
+            tuple(placement),
+            quality_profile,
+        )
+        with static_assets_lock:
+            asset = static_assets.get(str(path_asset))
+            if (
+                asset is not None
+                and asset["key"] == key
+                and asset["pid"] == os.getpid()
+                and path_asset.exists()
+            ):
+                continue
+
+        if key not in optimized_assets:
+            optimized_assets[key] = optimize_image(
+                pathlib.Path(path_source).read_bytes(), placement, quality_profile
+            )
+        content, mime_type = optimized_assets[key]
+
+        _write_atomically(path_asset, content)
+        with static_assets_lock:
+            static_assets[str(path_asset)] = {
+                "key": key,
+                "content": content,
+                "mime_type": mime_type,
+                "pid": os.getpid(),
+            }
+    return path_directory
+
+
+def asset_url_fetcher(url: str, *args, **kwargs) -> Dict:
+    """
+    Url fetcher for weasyprint that serves the static images prepared by this process from memory,
+    any other url (the images a worker inherited from the process it was forked from included) is
+    fetched by the default fetcher, from the directory of its quality profile
+
+    Args:
+        param(str): the url to fetch
+
+    Returns:
+        Dict: the fetched resource, as expected by weasyprint
+    """
+    if url.startswith("file://"):
+        with static_assets_lock:
+            asset = static_assets.get(url[len("file://") :])
+        if asset is not None and asset["pid"] == os.getpid():
+            return {
+                "string": asset["content"],
+                "mime_type": asset["mime_type"],
+                "redirected_url": url,
+            }
+    return weasyprint.default_url_fetcher(url, *args, **kwargs)
@@ -0,0 +1,222 @@
+"""
+Compares raster and vector output for every chart that can be saved either way. For each chart and
+format it measures the time to draw and save the chart, the time weasyprint takes to lay out and
+write a page embedding it at its placed width, and the size of that pdf
+
+    python -m common.benchmark [quality_profile] [repeats]
+
+The fastest format of each chart is printed so that chart_codecs can be updated accordingly
+"""
+from typing import Dict, List, Union
+import contextlib
+import json
+import pathlib
+import sys
+import time
+import weasyprint
+from leadership_assessment.scripts import graphing
+from leadership_assessment.scripts import leadership_pdf_report
+from talentinsights_assessment.scripts import talentinsights_pdf_report
+from .chart_cache import chart_cache
+from .quality import *
+
+# chart functions that go through save_chart, by the module they are called from, with the
+# codec table and the name of the chart in that table
+benchmarked_charts = {
+    leadership_pdf_report: {
+        "generate_skill_score_bar_charts": (graphing, "skill_bar_chart"),
+        "generate_focus_area_spider_plot": (graphing, "focus_area_spider_plot"),
+        "generate_color_bar_plot": (graphing, "color_bar"),
+        "generate_line_chart": (graphing, "line_chart"),
+        "generate_stacked_bar_chart_pauses": (graphing, "pauses_stacked_bar_chart"),
+    },
+    talentinsights_pdf_report: {
+        "_generate_job_fitment_bar": (talentinsights_pdf_report, "job_fitment_bar"),
+        "_generate_spider_plot": (talentinsights_pdf_report, "spider_plot"),
+    },
+}
+
+benchmarked_formats = ["raster", "vector"]
+
+path_sample_data = pathlib.Path(__file__).parent.parent / "data" / "sample_video_data.json"
+
+
+def sample_payload() -> Dict:
+    """
+    Builds a report payload from the sample video data, the same way the lambda handler does. Used
+    by the benchmark and by the tests
+    """
+    with open(path_sample_data, encoding="utf8") as file:
+        data = json.load(file)["Records"][0]["Sns"]["Message"]
+    video_data = data["video_data"]
+    return {
+        "skill_scores": video_data.get("recruiter_skills", {}),
+        "Candidate": {
+            "name": video_data.get("name", "undefined"),
+            "company": video_data.get("company_name", ""),
+            "user_id": data.get("user_id"),
+            "video_id": data.get("video_id"),
+            "reference_no": data.get("reference_no"),
+        },
+        **video_data,
+        "Job Fitment": video_data.get("job_fitment", {"R1": 40, "R2": 60, "S": 0}),
+    }
+
+
+@contextlib.contextmanager
+def _timed_charts(chart_format: str, timings: Dict[str, List]):
+    """
+    Switches every benchmarked chart to the format and wraps the chart functions so that each call
+    records its duration and the files it wrote
+    """
+    list_restore = []
+    for report_module, dict_functions in benchmarked_charts.items():
+        for function_name, (chart_module, chart_name) in dict_functions.items():
+            function = getattr(report_module, function_name)
+            list_restore.append((report_module, function_name, function))
+            list_restore.append(
+                (chart_module.chart_codecs, chart_name, chart_module.chart_codecs[chart_name])
+            )
+            # the raster format keeps the configured codec, png for charts configured as svg
+            if chart_format == "vector":
+                chart_module.chart_codecs[chart_name] = "svg"
+            elif chart_module.chart_codecs[chart_name] == "svg":
+                chart_module.chart_codecs[chart_name] = "png"
+
+            def timed(*args, function=function, chart_name=chart_name, **kwargs):
+                start = time.perf_counter()
+                result = function(*args, **kwargs)
+                timings.setdefault(chart_name, []).append(
+                    (time.perf_counter() - start, result)
+                )
+                return result
+
+            setattr(report_module, function_name, timed)
+    try:
+        yield
+    finally:
+        for target, name, value in reversed(list_restore):
+            if isinstance(target, dict):
+                target[name] = value
+            else:
+                setattr(target, name, value)
+
+
+def _render_charts(quality_profile: str) -> None:
+    """
+    Draws every benchmarked chart of both reports once from the sample payload
+    """
+    payload = sample_payload()
+
+    dict_payload = leadership_pdf_report._parse_payload(dict(payload))
+    dict_payload["skills"] = leadership_pdf_report._modify_scores(dict_payload["skills"])
+    leadership_pdf_report._generate_all_graphics(
+        dict_payload, quality_profile=quality_profile
+    )
+
+    _, dict_job_fitment, _, list_series_agent_scores = talentinsights_pdf_report._parse_payload(
+        dict(payload, Candidate=dict(payload["Candidate"]))
+    )
+    talentinsights_pdf_report._generate_job_fitment_bar(dict_job_fitment, quality_profile)
+    talentinsights_pdf_report._generate_spider_plot(
+        *list_series_agent_scores, quality_profile=quality_profile
+    )
+
+
+def _placement_width(chart_name: str) -> float:
+    for report_module, dict_functions in benchmarked_charts.items():
+        for chart_module, name in dict_functions.values():
+            if name == chart_name:
+                return chart_module.chart_placement_widths[chart_name]
+
+
+def _measure_pdf(chart_name: str, list_paths: List[pathlib.Path]) -> Dict[str, float]:
+    """
+    Writes a pdf that only embeds the charts at their placed width
+    """
+    width = _placement_width(chart_name)
+    html = "".join(
+        f'<img src="{path_chart}" style="display: block; width: {width}in">'
+        for path_chart in list_paths
+    )
+    start = time.perf_counter()
+    pdf = weasyprint.HTML(string=html, base_url="/").write_pdf()
+    return {"pdf_seconds": time.perf_counter() - start, "pdf_bytes": len(pdf)}
+
+
+def _flatten_paths(result: Union[pathlib.Path, Dict]) -> List[pathlib.Path]:
+    if isinstance(result, dict):
+        return [path_chart for value in result.values() for path_chart in _flatten_paths(value)]
+    return [pathlib.Path(result)]
+
+
+def benchmark_chart_formats(
+    quality_profile: str = DEFAULT_QUALITY_PROFILE, repeats: int = 3
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Measures every benchmarked chart in raster and in vector format, keeping the fastest of the
+    repeats. The chart cache is disabled so that every repeat draws the charts
+
+    Args:
+        param1(str): name of the quality profile used for the raster charts
+        param2(int): number of times every chart is drawn in each format
+
+    Returns:
+        Dict[str, Dict[str, Dict[str, float]]]: render time, pdf time and pdf size of every chart
+        in each format, and the format with the lowest total time
+    """
+    cache_enabled, chart_cache.enabled = chart_cache.enabled, False
+    results = {}
+    try:
+        for chart_format in benchmarked_formats:
+            for _ in range(repeats):
+                timings = {}
+                with _timed_charts(chart_format, timings):
+                    _render_charts(quality_profile)
+
+                for chart_name, list_calls in timings.items():
+                    list_paths = [
+                        path_chart
+                        for _, result in list_calls
+                        for path_chart in _flatten_paths(result)
+                    ]
+                    measure = {
+                        "render_seconds": sum(seconds for seconds, _ in list_calls),
+                        **_measure_pdf(chart_name, list_paths),
+                    }
+                    best = results.setdefault(chart_name, {}).get(chart_format)
+                    if best is None or measure["render_seconds"] + measure["pdf_seconds"] < (
+                        best["render_seconds"] + best["pdf_seconds"]
+                    ):
+                        results[chart_name][chart_format] = measure
+    finally:
+        chart_cache.enabled = cache_enabled
+
+    for chart_name, dict_formats in results.items():
+        dict_formats["fastest"] = min(
+            benchmarked_formats,
+            key=lambda chart_format: dict_formats[chart_format]["render_seconds"]
+            + dict_formats[chart_format]["pdf_seconds"],
+        )
+    return results
+
+
+def _print_results(results: Dict[str, Dict[str, Dict[str, float]]]) -> None:
+    print(f"{'chart':<26}{'format':<8}{'render s':>10}{'pdf s':>10}{'pdf bytes':>12}")
+    for chart_name, dict_formats in results.items():
+        for chart_format in benchmarked_formats:
+            measure = dict_formats[chart_format]
+            print(
+                f"{chart_name:<26}{chart_format:<8}{measure['render_seconds']:>10.3f}"
+                f"{measure['pdf_seconds']:>10.3f}{measure['pdf_bytes']:>12}"
+                + ("  <- fastest" if dict_formats["fastest"] == chart_format else "")
+            )
+
+
+if __name__ == "__main__":
+    _print_results(
+        benchmark_chart_formats(
+            sys.argv[1] if len(sys.argv) > 1 else DEFAULT_QUALITY_PROFILE,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+        )
+    )
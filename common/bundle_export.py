@@ -0,0 +1,188 @@
+from typing import Callable, Dict, Iterable, Iterator, Tuple, Union
+import collections
+import concurrent.futures
+import io
+import os
+import time
+import zipfile
+
+# size (in bytes) of the parts the archive is uploaded in, s3 requires at least 5 MiB for every
+# part but the last. the memory of an export is about one part plus the reports being fetched
+BUNDLE_PART_SIZE = int(os.environ.get("BUNDLE_PART_SIZE", 16 * 1024 * 1024))
+BUNDLE_FETCH_WORKERS = int(os.environ.get("BUNDLE_FETCH_WORKERS", 8))
+
+
+class MultipartUploadWriter(io.RawIOBase):
+    """
+    Write-only stream that uploads what is written to it as the parts of a multipart upload, so
+    that an archive is never staged on disk nor held in memory. The upload is completed when the
+    stream is closed, and must be aborted if writing fails
+    """
+
+    def __init__(
+        self, s3_client, bucket_name: str, blob_name: str, part_size: int = BUNDLE_PART_SIZE
+    ) -> None:
+        super().__init__()
+        self.s3_client, self.bucket_name, self.blob_name = s3_client, bucket_name, blob_name
+        self.part_size = part_size
+        self.upload_id = s3_client.create_multipart_upload(Bucket=bucket_name, Key=blob_name)[
+            "UploadId"
+        ]
+        self.buffer, self.parts, self.position = bytearray(), [], 0
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[: self.part_size]))
+            del self.buffer[: self.part_size]
+        return len(data)
+
+    def _upload_part(self, data: bytes) -> None:
+        number = len(self.parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.blob_name,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=data,
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        # the last part may be smaller than the others, or empty for an empty upload
+        if self.buffer or not self.parts:
+            self._upload_part(bytes(self.buffer))
+            self.buffer = bytearray()
+        self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=self.blob_name,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts},
+        )
+        super().close()
+
+    def abort(self) -> None:
+        """
+        Drops the parts uploaded so far, s3 keeps (and bills) them otherwise
+        """
+        if not self.closed:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=self.blob_name, UploadId=self.upload_id
+            )
+            self.buffer = bytearray()
+            super().close()
+
+
+def s3_fetcher(s3_client, bucket_name: str, blob_name: str) -> Callable[[], Union[bytes, None]]:
+    """
+    Fetches a report from s3 when it is called, None when there is no such report
+
+    Args:
+        param1: the s3 client
+        param2(str): the bucket
+        param3(str): the key of the report
+
+    Returns:
+        Callable[[], Union[bytes, None]]: the fetcher
+    """
+
+    def fetch() -> Union[bytes, None]:
+        try:
+            return s3_client.get_object(Bucket=bucket_name, Key=blob_name)["Body"].read()
+        except s3_client.exceptions.NoSuchKey:
+            return None
+
+    return fetch
+
+
+def _fetch_in_order(
+    entries: Iterable[Tuple[str, Callable[[], Union[bytes, None]]]],
+    executor: concurrent.futures.Executor,
+    window: int,
+) -> Iterator[Tuple[str, Union[bytes, None], Union[Exception, None]]]:
+    """
+    Runs the fetchers concurrently, with at most window reports in flight, and yields them in the
+    order of the entries
+    """
+    pending = collections.deque()
+    for name, fetch in entries:
+        pending.append((name, executor.submit(fetch)))
+        if len(pending) >= window:
+            yield _result(*pending.popleft())
+    while pending:
+        yield _result(*pending.popleft())
+
+
+def _result(name: str, future: concurrent.futures.Future) -> Tuple:
+    try:
+        return name, future.result(), None
+    except Exception as error:
+        return name, None, error
+
+
+def export_bundle(
+    entries: Iterable[Tuple[str, Callable[[], Union[bytes, None]]]],
+    s3_client,
+    bucket_name: str,
+    blob_name: str,
+    workers: int = BUNDLE_FETCH_WORKERS,
+    part_size: int = BUNDLE_PART_SIZE,
+) -> Dict:
+    """
+    Streams reports into a zip archive written directly as a multipart upload. The reports are
+    fetched (or generated) concurrently and written as they arrive, in order, so that memory does
+    not depend on the number of reports: about one part being uploaded and twice as many reports
+    as workers, plus a few hundred bytes of zip directory per report. The pdfs are stored without
+    compression, they are compressed already. The reports that could not be fetched are listed in
+    MISSING.txt at the end of the archive
+
+    Args:
+        param1(Iterable[Tuple[str, Callable[[], Union[bytes, None]]]]): the name of every report in
+        the archive and the function that fetches its pdf (None when there is no such report). A
+        generator is only consumed as the reports are written
+        param2: the s3 client
+        param3(str): bucket of the archive
+        param4(str): key of the archive
+        param5(int): number of reports fetched concurrently
+        param6(int): size (in bytes) of the parts of the upload
+
+    Returns:
+        Dict: the key of the archive, the number of reports and of bytes written, the reports
+        missing and the seconds taken
+    """
+    start = time.perf_counter()
+    summary = {"blob_name": blob_name, "reports": 0, "missing": []}
+    writer = MultipartUploadWriter(s3_client, bucket_name, blob_name, part_size)
+    try:
+        with zipfile.ZipFile(
+            writer, "w", compression=zipfile.ZIP_STORED, allowZip64=True
+        ) as archive, concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            for name, content, error in _fetch_in_order(entries, executor, 2 * workers):
+                if content is None:
+                    summary["missing"].append(f"{name}: {error or 'not found'}")
+                    continue
+                archive.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), content)
+                summary["reports"] += 1
+            if summary["missing"]:
+                archive.writestr(
+                    zipfile.ZipInfo("MISSING.txt", time.localtime()[:6]),
+                    "\n".join(summary["missing"]) + "\n",
+                )
+        summary["bytes"] = writer.tell()
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    print("exported bundle", {key: value for key, value in summary.items() if key != "missing"})
+    return summary
@@ -0,0 +1,286 @@
+from typing import Callable, Dict, Union
+import collections
+import functools
+import hashlib
+import inspect
+import io
+import json
+import os
+import pathlib
+import threading
+import numpy as np
+import pandas as pd
+from .artifacts import *
+from .deadline import *
+
+# bump whenever the look of a memoized chart changes, so that stale charts are never served
+CHART_STYLE_VERSION = 2
+
+# the in-process tier keeps the most recently used charts up to this many bytes
+CHART_CACHE_MEMORY_BYTES = 64 * 1024 * 1024
+
+# the on-disk tier is only enabled when a (possibly shared) directory is configured
+CHART_CACHE_DIR = os.environ.get("CHART_CACHE_DIR")
+CHART_CACHE_DISK_BYTES = int(os.environ.get("CHART_CACHE_DISK_BYTES", 512 * 1024 * 1024))
+
+
+def canonical_value(value):
+    """
+    Converts the values json cannot serialize into an equivalent that it can, so that equal
+    parameters always produce the same key
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, pd.Series):
+        return {str(key): canonical_value(item) for key, item in value.items()}
+    if isinstance(value, pathlib.PurePath):
+        return str(value)
+    raise TypeError(f"cannot build a chart cache key from {type(value)}")
+
+
+def chart_cache_key(
+    function: Callable, arguments: Dict, codec: Union[str, None] = None
+) -> str:
+    """
+    Builds the content address of a chart from the function that draws it, its parameters (which
+    include the quality profile), the codec it is saved with and the style version
+
+    Args:
+        param1(Callable): the chart function
+        param2(Dict): the bound parameters of the call
+        param3(str): the codec save_chart encodes the chart with, None for charts returned as
+        pixels
+
+    Returns:
+        str: hex digest identifying the chart
+    """
+    canonical = json.dumps(
+        [
+            CHART_STYLE_VERSION,
+            f"{function.__module__}.{function.__qualname__}",
+            codec,
+            arguments,
+        ],
+        sort_keys=True,
+        default=canonical_value,
+    )
+    return hashlib.sha256(canonical.encode("utf8")).hexdigest()
+
+
+class ChartCache:
+    """
+    Two-tier cache of rendered charts: an in-process LRU tier bounded in bytes, backed by an
+    optional on-disk tier that can be shared between containers and is evicted by size, least
+    recently used files first
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int = CHART_CACHE_MEMORY_BYTES,
+        directory: Union[str, pathlib.Path, None] = CHART_CACHE_DIR,
+        disk_bytes: int = CHART_CACHE_DISK_BYTES,
+    ) -> None:
+        self.memory_bytes = memory_bytes
+        self.directory = pathlib.Path(directory) if directory else None
+        self.disk_bytes = disk_bytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.enabled = True
+        self.lock = threading.Lock()
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Union[bytes, None]:
+        """
+        Looks a chart up in memory first and then on disk, promoting disk hits to memory
+
+        Args:
+            param(str): the key of the chart
+
+        Returns:
+            Union[bytes, None]: the cached chart, None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self.entries[key]
+
+        if self.directory:
+            path_entry = self.directory / key
+            try:
+                content = path_entry.read_bytes()
+                os.utime(path_entry)
+            except OSError:
+                content = None
+            if content is not None:
+                self._remember(key, content)
+                self.stats["disk_hits"] += 1
+                return content
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, content: bytes) -> None:
+        """
+        Stores a chart in both tiers
+
+        Args:
+            param1(str): the key of the chart
+            param2(bytes): the serialized chart
+        """
+        if not self.enabled:
+            return
+
+        self._remember(key, content)
+        if not self.directory:
+            return
+
+        # write then rename, so that other containers sharing the directory never read half a file
+        path_entry = self.directory / key
+        path_partial = self.directory / f"{key}.{os.getpid()}.{threading.get_ident()}.partial"
+        try:
+            path_partial.write_bytes(content)
+            os.replace(path_partial, path_entry)
+            self._evict_disk()
+        except OSError:
+            path_partial.unlink(missing_ok=True)
+
+    def _remember(self, key: str, content: bytes) -> None:
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = content
+            self.size += len(content)
+            while self.size > self.memory_bytes and self.entries:
+                self.size -= len(self.entries.popitem(last=False)[1])
+
+    def _evict_disk(self) -> None:
+        list_files = []
+        for path_entry in self.directory.iterdir():
+            try:
+                stat = path_entry.stat()
+            except OSError:
+                continue
+            list_files.append((stat.st_mtime, stat.st_size, path_entry))
+
+        disk_size = sum(size for _, size, _ in list_files)
+        for _, size, path_entry in sorted(list_files, key=lambda item: item[0]):
+            if disk_size <= self.disk_bytes:
+                break
+            path_entry.unlink(missing_ok=True)
+            disk_size -= size
+
+
+chart_cache = ChartCache()
+
+
+def _serialize_chart(chart: Union[pathlib.Path, np.ndarray]) -> bytes:
+    """
+    Serializes what a chart function returns: either the path of the encoded image, stored with
+    its content, or the raw pixels of the chart
+    """
+    buffer = io.BytesIO()
+    if isinstance(chart, np.ndarray):
+        np.savez_compressed(buffer, pixels=chart)
+    else:
+        # charts of the artifacts directory are restored in the artifacts directory of the report
+        # that hits the cache, which may be another one
+        path_chart = pathlib.Path(chart)
+        if path_chart.parent == artifacts_directory():
+            path_chart = pathlib.Path(path_chart.name)
+        np.savez(
+            buffer,
+            path=np.array(str(path_chart)),
+            content=np.frombuffer(pathlib.Path(chart).read_bytes(), dtype=np.uint8),
+        )
+    return buffer.getvalue()
+
+
+def _deserialize_chart(content: bytes) -> Union[pathlib.Path, np.ndarray]:
+    """
+    Restores a chart serialized by _serialize_chart, writing the image back to its path
+    """
+    with np.load(io.BytesIO(content), allow_pickle=False) as archive:
+        if "pixels" in archive:
+            return archive["pixels"]
+        path_chart = pathlib.Path(str(archive["path"]))
+        if not path_chart.is_absolute():
+            path_chart = artifact_path(path_chart.name)
+        path_chart.write_bytes(archive["content"].tobytes())
+        return path_chart
+
+
+def _fallback_chart(
+    function: Callable, arguments: Dict, codec: Union[str, None], cache: ChartCache
+) -> Union[bytes, None]:
+    """
+    Looks a chart up at the other quality profiles, the best first, for a report short of time
+
+    Returns:
+        Union[bytes, None]: the cached chart, None when it was never drawn at any profile
+    """
+    for quality_profile in reversed(list(quality_profiles)):
+        if quality_profile == arguments["quality_profile"]:
+            continue
+        content = cache.get(
+            chart_cache_key(function, {**arguments, "quality_profile": quality_profile}, codec)
+        )
+        if content is not None:
+            current_budget().degrade("charts", f"{function.__name__} cached at {quality_profile}")
+            return content
+    return None
+
+
+def memoize_chart(
+    rounding: Union[Dict[str, int], None] = None,
+    cache: Union[ChartCache, None] = None,
+    codec: Union[Callable[[], str], None] = None,
+) -> Callable:
+    """
+    Memoizes a chart function that is a pure function of its parameters. The function must return
+    either the path of the image it saved or the pixels of the chart
+
+    Args:
+        param1(Dict[str, int]): number of decimals some parameters are rounded to before the
+        chart is drawn, when the chart cannot show more precision than that
+        param2(ChartCache): the cache to use, the module-level cache by default
+        param3(Callable[[], str]): returns the codec the function saves its chart with, looked up
+        on every call since chart_codecs can be switched at runtime (python -m common.benchmark)
+
+    Returns:
+        Callable: the decorator
+    """
+
+    def decorator(function: Callable) -> Callable:
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            for name, decimals in (rounding or {}).items():
+                bound.arguments[name] = np.round(bound.arguments[name], decimals).item()
+
+            chart_cache_used = cache or chart_cache
+            chart_codec = codec() if codec else None
+            key = chart_cache_key(function, bound.arguments, chart_codec)
+            content = chart_cache_used.get(key)
+            if content is None and "quality_profile" in bound.arguments and deadline_fallback():
+                content = _fallback_chart(function, bound.arguments, chart_codec, chart_cache_used)
+            if content is not None:
+                return _deserialize_chart(content)
+
+            chart = function(*bound.args, **bound.kwargs)
+            chart_cache_used.put(key, _serialize_chart(chart))
+            return chart
+
+        return wrapper
+
+    return decorator
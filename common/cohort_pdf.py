@@ -0,0 +1,53 @@
+from typing import Iterable, Tuple, Union
+import pathlib
+import tempfile
+import weasyprint
+from .parallel_pdf import *
+from .pdf_optimize import *
+
+
+def write_cohort_pdf(
+    documents: Iterable[Tuple[str, weasyprint.Document]],
+    path_pdf: Union[str, pathlib.Path],
+) -> pathlib.Path:
+    """
+    Writes the reports of a cohort into a single pdf. The reports are consumed one at a time, so
+    only one laid out report is held in memory: its pages are written to a temporary pdf and only
+    their anchors, links and bookmarks are kept until every report is merged. Every report gets a
+    (closed) outline entry holding its own bookmarks, its internal links stay within the report,
+    and the images and fonts the reports have in common are embedded once
+
+    Args:
+        param1(Iterable[Tuple[str, weasyprint.Document]]): the title of the outline entry and the
+        laid out pages of every report, in order. A generator lays each report out when its turn
+        comes
+        param2(Union[str, pathlib.Path]): where to write the pdf
+
+    Returns:
+        pathlib.Path: path of the pdf
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        list_chunks = []
+        for index, (title, document) in enumerate(documents):
+            pages, list_pages = detach_internal_links(document.pages)
+            # the anchors of every report are named alike
+            for page in list_pages:
+                page["anchors"] = {
+                    f"{index}/{name}": position for name, position in page["anchors"].items()
+                }
+                page["links"] = [
+                    (kind, f"{index}/{anchor}", rectangle)
+                    for kind, anchor, rectangle in page["links"]
+                ]
+            if list_pages:
+                list_pages[0]["bookmarks"].insert(0, (0, title, (0, 0), "closed"))
+
+            path_chunk = pathlib.Path(directory) / f"{index}.pdf"
+            document.copy(pages).write_pdf(path_chunk)
+            list_chunks.append({"pdf": path_chunk, "pages": list_pages})
+            # released before the next report is laid out
+            del document, pages
+
+        merge_chunks(list_chunks, path_pdf)
+    optimize_pdf(path_pdf)
+    return pathlib.Path(path_pdf)
@@ -0,0 +1,319 @@
+from typing import Dict, Iterator, List, Tuple, Union
+import contextlib
+import contextvars
+import math
+import os
+import threading
+import time
+from .quality import *
+
+# seconds kept for uploading and emailing a report once its pdf is written, the rendering is
+# planned to end this long before the deadline. the measured duration of the uploads replaces it
+# when it is longer
+DEADLINE_UPLOAD_RESERVE = float(os.environ.get("DEADLINE_UPLOAD_RESERVE", 10))
+
+# seconds every stage of a report is expected to take before this process has measured it, by
+# quality profile for the stages whose cost depends on it. optimize only runs when there is time
+# left for it once the pdf is written, and is never planned for
+stage_cost_estimates = {
+    "leadership_assessment": {
+        "charts": {"draft": 2.0, "screen": 4.0, "print": 6.0},
+        "optional_charts": {"draft": 0.5, "screen": 1.0, "print": 2.0},
+        "layout": {"draft": 8.0, "screen": 10.0, "print": 14.0},
+        "thumbnail": 1.0,
+        "optimize": 3.0,
+        "upload": 2.0,
+    },
+    "talentinsights_assessment": {
+        "charts": {"draft": 1.0, "screen": 2.0, "print": 3.0},
+        "layout": {"draft": 6.0, "screen": 8.0, "print": 11.0},
+        "direct_layout": {"draft": 1.0, "screen": 1.5, "print": 2.0},
+        "thumbnail": 1.0,
+        "optimize": 2.0,
+        "upload": 2.0,
+    },
+}
+
+# weight of the last measured duration of a stage in its running estimate
+STAGE_COST_SMOOTHING = 0.3
+
+# running estimates of the stages measured by this process, by report type, stage and quality
+# profile, shared by the reports of a warm container
+_measured_costs: Dict[Tuple[str, str, Union[str, None]], float] = {}
+_measured_costs_lock = threading.Lock()
+
+# budget of the report generated by the current thread or task, see render_budget
+_render_budget = contextvars.ContextVar("render_budget", default=None)
+
+
+class RenderBudget:
+    """
+    Time a report has left before its deadline (the timeout of the lambda invocation, or of the
+    worker rendering it). The options of the report are planned against the cost of its stages:
+    when they would not fit, the report gives up, in turn, its preview, the quality of its charts,
+    its optional charts and its html layout, and serves the charts it can from the cache at any
+    quality. What was given up, and why, is recorded with the report
+
+    Args:
+        param1(float): seconds left before the deadline, None for no deadline
+        param2(float): seconds kept for the upload once the pdf is written
+    """
+
+    def __init__(
+        self, seconds: Union[float, None], upload_reserve: float = DEADLINE_UPLOAD_RESERVE
+    ) -> None:
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.upload_reserve = upload_reserve
+        self.report_type = None
+        self.degradations: List[Dict[str, Union[str, float]]] = []
+        self.cached_fallback = False
+        # stages planned and not run yet, with their quality profile
+        self._pending: Dict[str, Union[str, None]] = {}
+        # [start, seconds of the nested stages] of every stage running
+        self._running: List[List[float]] = []
+
+    @classmethod
+    def from_context(cls, context) -> "RenderBudget":
+        """
+        Budget of a lambda invocation
+
+        Args:
+            param(LambdaContext): the context of the handler, None when called outside lambda
+
+        Returns:
+            RenderBudget: the budget, without deadline when there is no context
+        """
+        get_remaining_time = getattr(context, "get_remaining_time_in_millis", None)
+        return cls(None if get_remaining_time is None else get_remaining_time() / 1000)
+
+    def remaining(self) -> float:
+        """
+        Returns:
+            float: seconds left to render before the time kept for the upload
+        """
+        if self.deadline is None:
+            return math.inf
+        reserve = max(self.upload_reserve, self.cost("upload"))
+        return self.deadline - time.monotonic() - reserve
+
+    def _cost_key(self, stage: str, quality_profile: Union[str, None]) -> Tuple:
+        estimate = stage_cost_estimates.get(self.report_type, {}).get(stage, 0.0)
+        return self.report_type, stage, quality_profile if isinstance(estimate, dict) else None
+
+    def cost(self, stage: str, quality_profile: Union[str, None] = None) -> float:
+        """
+        Expected duration of a stage, measured by this process or estimated
+
+        Args:
+            param1(str): the stage
+            param2(str): the quality profile it is run with
+
+        Returns:
+            float: seconds
+        """
+        key = self._cost_key(stage, quality_profile)
+        with _measured_costs_lock:
+            if key in _measured_costs:
+                return _measured_costs[key]
+        estimate = stage_cost_estimates.get(self.report_type, {}).get(stage, 0.0)
+        return estimate[quality_profile] if isinstance(estimate, dict) else estimate
+
+    def _stages(self, options: Dict) -> Dict[str, Union[str, None]]:
+        quality_profile = options["quality_profile"]
+        stages = {"charts": quality_profile}
+        if options.get("optional_charts"):
+            stages["optional_charts"] = quality_profile
+        if options.get("backend") == "direct":
+            stages["direct_layout"] = quality_profile
+        else:
+            stages["layout"] = quality_profile
+            if options.get("thumbnail"):
+                stages["thumbnail"] = None
+        return stages
+
+    def _estimate(self, options: Dict) -> float:
+        return sum(self.cost(*stage) for stage in self._stages(options).items())
+
+    def plan(self, report_type: str, options: Dict) -> Dict:
+        """
+        Plans the options of a report to fit its deadline, giving up what costs the most time the
+        reader misses the least first
+
+        Args:
+            param1(str): the report type
+            param2(Dict): the options of the report function (quality_profile, thumbnail,
+            optional_charts, backend)
+
+        Returns:
+            Dict: the options to render the report with
+        """
+        self.report_type = report_type
+        options = dict(options)
+        while self._estimate(options) > self.remaining():
+            cheaper = _cheaper_options(options)
+            if cheaper is None:
+                self.degrade(
+                    "plan",
+                    f"{self._estimate(options):.1f}s expected with {self.remaining():.1f}s left",
+                )
+                break
+            reason, options = cheaper
+            self.degrade("plan", reason)
+        # a chart already drawn at another quality costs nothing, unlike drawing it again
+        self.cached_fallback = bool(self.degradations)
+        self._pending = self._stages(options)
+        return options
+
+    def allows(self, stage: str, quality_profile: Union[str, None] = None) -> bool:
+        """
+        Whether a stage still fits before the deadline along with the stages planned after it, it
+        is given up and recorded when it does not
+
+        Args:
+            param1(str): the stage
+            param2(str): the quality profile it is run with
+
+        Returns:
+            bool: whether to run the stage
+        """
+        following = sum(
+            self.cost(name, profile) for name, profile in self._pending.items() if name != stage
+        )
+        seconds = self.remaining() - following
+        cost = self.cost(stage, quality_profile)
+        if cost <= seconds:
+            return True
+        self._pending.pop(stage, None)
+        self.degrade(stage, f"skipped, {cost:.1f}s expected with {max(seconds, 0):.1f}s left")
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, stage: str, quality_profile: Union[str, None] = None) -> Iterator[None]:
+        """
+        Measures a stage and updates its running estimate. The stages nested in it are measured
+        on their own and not counted in it
+        """
+        self._pending.pop(stage, None)
+        self._running.append([time.perf_counter(), 0.0])
+        try:
+            yield
+        finally:
+            start, nested = self._running.pop()
+            seconds = time.perf_counter() - start
+            if self._running:
+                self._running[-1][1] += seconds
+            key = self._cost_key(stage, quality_profile)
+            with _measured_costs_lock:
+                previous = _measured_costs.get(key)
+                _measured_costs[key] = (
+                    seconds - nested
+                    if previous is None
+                    else previous + STAGE_COST_SMOOTHING * (seconds - nested - previous)
+                )
+
+    def degrade(self, stage: str, reason: str) -> None:
+        """
+        Records what the report gave up to meet its deadline
+
+        Args:
+            param1(str): the stage that was degraded
+            param2(str): what was given up
+        """
+        remaining = self.remaining()
+        self.degradations.append(
+            {"stage": stage, "reason": reason, "remaining": round(remaining, 1)}
+            if remaining != math.inf
+            else {"stage": stage, "reason": reason}
+        )
+        print("degraded report", self.degradations[-1])
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: what the report gave up, one "stage: reason" per degradation, empty when nothing
+        """
+        return "; ".join(f"{item['stage']}: {item['reason']}" for item in self.degradations)
+
+
+def _cheaper_options(options: Dict) -> Union[Tuple[str, Dict], None]:
+    """
+    The next cheaper options of a report and what they give up, None when nothing is left to give
+    up. The preview goes first, then the quality profile steps down to draft, then the optional
+    charts and the html layout go
+    """
+    if options.get("thumbnail"):
+        return "preview skipped", {**options, "thumbnail": None}
+    list_profiles = list(quality_profiles)
+    position = list_profiles.index(options["quality_profile"])
+    if position > 0:
+        quality_profile = list_profiles[position - 1]
+        return (
+            f"{options['quality_profile']} quality lowered to {quality_profile}",
+            {**options, "quality_profile": quality_profile},
+        )
+    if options.get("optional_charts"):
+        return "optional charts skipped", {**options, "optional_charts": False}
+    if "backend" in options and options["backend"] != "direct":
+        return "laid out directly, without html", {**options, "backend": "direct"}
+    return None
+
+
+@contextlib.contextmanager
+def render_budget(budget: RenderBudget) -> Iterator[RenderBudget]:
+    """
+    Makes a budget the budget of the report generated by the current thread or task
+
+    Args:
+        param(RenderBudget): the budget
+
+    Yields:
+        RenderBudget: the budget
+    """
+    token = _render_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _render_budget.reset(token)
+
+
+def current_budget() -> Union[RenderBudget, None]:
+    """
+    Returns:
+        Union[RenderBudget, None]: the budget of the report being generated, None without one
+    """
+    return _render_budget.get()
+
+
+@contextlib.contextmanager
+def render_stage(stage: str, quality_profile: Union[str, None] = None) -> Iterator[None]:
+    """
+    Measures a stage of the report being generated against its budget, when it has one
+
+    Args:
+        param1(str): the stage
+        param2(str): the quality profile it is run with
+    """
+    budget = current_budget()
+    if budget is None:
+        yield
+        return
+    with budget.stage(stage, quality_profile):
+        yield
+
+
+def deadline_allows(stage: str, quality_profile: Union[str, None] = None) -> bool:
+    """
+    Whether a stage of the report being generated still fits before its deadline, always True for
+    a report without budget. See RenderBudget.allows
+    """
+    budget = current_budget()
+    return budget is None or budget.allows(stage, quality_profile)
+
+
+def deadline_fallback() -> bool:
+    """
+    Whether the report being generated serves the charts it can from the cache at another quality
+    than the one asked for
+    """
+    budget = current_budget()
+    return budget is not None and budget.cached_fallback
@@ -0,0 +1,581 @@
+from typing import Dict, List, Tuple, Union
+import os
+import pathlib
+import re
+import threading
+import matplotlib
+import numpy as np
+import pydyf
+from PIL import Image
+
+# 1 css pixel in pdf points, and the default page margin of weasyprint (75px)
+CSS_PX = 0.75
+DEFAULT_MARGIN = 75 * CSS_PX
+MM = 72 / 25.4
+
+page_sizes = {"letter": (612, 792), "a4": (595.28, 841.89)}
+
+# the standard pdf fonts need no embedding, their metrics come with matplotlib
+standard_fonts = {"regular": "Helvetica", "bold": "Helvetica-Bold"}
+
+# glyphs of the windows-1252 encoding whose name differs from their code in the standard encoding
+_glyph_names = {
+    "'": "quotesingle",
+    "`": "grave",
+    "‘": "quoteleft",
+    "’": "quoteright",
+    "“": "quotedblleft",
+    "”": "quotedblright",
+    "–": "endash",
+    "—": "emdash",
+    "…": "ellipsis",
+    "•": "bullet",
+    " ": "space",
+    "é": "eacute",
+    "è": "egrave",
+    "à": "agrave",
+    "ç": "ccedilla",
+    "ñ": "ntilde",
+    "ü": "udieresis",
+    "ö": "odieresis",
+}
+
+
+def _load_font_metrics(font_name: str) -> Dict[str, Union[float, Dict[str, float]]]:
+    """
+    Reads the advance width of every windows-1252 character and the vertical metrics of a standard
+    font from its afm file, once per process
+    """
+    path_afm = pathlib.Path(matplotlib.get_data_path()) / "fonts" / "pdfcorefonts" / f"{font_name}.afm"
+    widths_by_code, widths_by_name, header = {}, {}, {}
+    with open(path_afm, encoding="latin-1") as file:
+        for line in file:
+            if line.startswith("C "):
+                fields = dict(
+                    field.strip().split(" ", 1) for field in line.split(";") if field.strip()
+                )
+                width = float(fields["WX"]) / 1000
+                widths_by_code[int(fields["C"])] = width
+                widths_by_name[fields["N"]] = width
+            elif " " in line:
+                key, value = line.split(" ", 1)
+                header[key] = value.strip()
+
+    widths = {}
+    for code in range(32, 256):
+        char = bytes([code]).decode("cp1252", errors="ignore")
+        if not char:
+            continue
+        if char in _glyph_names:
+            widths[char] = widths_by_name.get(_glyph_names[char], widths_by_name["n"])
+        elif code < 127:
+            widths[char] = widths_by_code[code]
+    return {
+        "widths": widths,
+        "default_width": widths_by_name["n"],
+        "ascent": float(header["Ascender"]) / 1000,
+        "descent": float(header["Descender"]) / 1000,
+    }
+
+
+font_metrics = {style: _load_font_metrics(name) for style, name in standard_fonts.items()}
+
+
+def text_width(text: str, size: float, bold: bool = False) -> float:
+    """
+    Width of a single line of text in points
+
+    Args:
+        param1(str): the text
+        param2(float): font size in points
+        param3(bool): whether the bold font is used
+
+    Returns:
+        float: the width of the text
+    """
+    metrics = font_metrics["bold" if bold else "regular"]
+    widths, default_width = metrics["widths"], metrics["default_width"]
+    return size * sum(widths.get(char, default_width) for char in text)
+
+
+def wrap_text(text: str, size: float, width: float, bold: bool = False) -> List[str]:
+    """
+    Breaks text into the lines that fit a width, at spaces. A word longer than the width is left
+    on its own line
+
+    Args:
+        param1(str): the text
+        param2(float): font size in points
+        param3(float): available width in points
+        param4(bool): whether the bold font is used
+
+    Returns:
+        List[str]: the lines
+    """
+    list_lines, line = [], ""
+    space = text_width(" ", size, bold)
+    line_width = 0
+    for word in text.split():
+        word_width = text_width(word, size, bold)
+        if line and line_width + space + word_width > width:
+            list_lines.append(line)
+            line, line_width = word, word_width
+        else:
+            line, line_width = (f"{line} {word}", line_width + space + word_width) if line else (
+                word,
+                word_width,
+            )
+    if line:
+        list_lines.append(line)
+    return list_lines
+
+
+def hex_to_rgb(color: str) -> Tuple[float, float, float]:
+    color = color.lstrip("#")
+    return tuple(int(color[index : index + 2], 16) / 255 for index in (0, 2, 4))
+
+
+def _pdf_string(text: str) -> bytes:
+    encoded = text.encode("cp1252", errors="replace")
+    return b"(" + re.sub(rb"([\\()])", rb"\\\1", encoded) + b")"
+
+
+# decoded images by path, with the modification time and size they were decoded at, so that the
+# static pictures of the reports are only decoded once per process
+_image_streams = {}
+_image_streams_lock = threading.Lock()
+
+
+def _image_stream(path_image: Union[str, pathlib.Path]) -> Tuple[Dict, int, int]:
+    """
+    Converts an image file into the content of a pdf image xobject: jpeg files are embedded as is,
+    any other format is decoded and deflated, with its alpha channel as a soft mask
+    """
+    stat = os.stat(path_image)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _image_streams_lock:
+        cached = _image_streams.get(str(path_image))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    with Image.open(path_image) as image:
+        width, height = image.size
+        if image.format == "JPEG" and image.mode in ("RGB", "L"):
+            image_stream = {
+                "data": pathlib.Path(path_image).read_bytes(),
+                "filter": "/DCTDecode",
+                "color_space": "/DeviceRGB" if image.mode == "RGB" else "/DeviceGray",
+                "mask": None,
+            }
+        else:
+            pixels = np.asarray(image.convert("RGBA"))
+            alpha = pixels[:, :, 3]
+            image_stream = {
+                "data": pixels[:, :, :3].tobytes(),
+                "filter": None,
+                "color_space": "/DeviceRGB",
+                "mask": None if alpha.min() == 255 else alpha.tobytes(),
+            }
+
+    with _image_streams_lock:
+        _image_streams[str(path_image)] = (version, (image_stream, width, height))
+    return image_stream, width, height
+
+
+def image_size(path_image: Union[str, pathlib.Path]) -> Tuple[int, int]:
+    """
+    Size in pixels of an image, decoded once per process
+
+    Args:
+        param(Union[str, pathlib.Path]): path of the image
+
+    Returns:
+        Tuple[int, int]: width and height of the image
+    """
+    _, width, height = _image_stream(path_image)
+    return width, height
+
+
+class DirectPdf:
+    """
+    Writes a pdf directly with absolute positioning, for reports whose layout is fixed. The cursor
+    (y) goes down from the top of the page like in css, flowing text and images start a new page
+    when they do not fit. Every page but the ones created without footer gets the page number box
+    and the footer rule of the report stylesheets
+    """
+
+    def __init__(
+        self,
+        page_size: str = "letter",
+        margin: float = DEFAULT_MARGIN,
+        text_color: str = "#393939",
+        footer_color: str = "#14213d",
+    ) -> None:
+        self.width, self.height = page_sizes[page_size]
+        self.margin = margin
+        self.text_color = text_color
+        self.footer_color = footer_color
+        self.pages = []
+        self.anchors = {}
+        self.images = {}
+        self.y = 0
+
+    @property
+    def text_runs(self) -> List[str]:
+        """
+        Lines of text drawn on every page, in the order they were drawn, list markers excluded
+        """
+        return [text for page in self.pages for text in page["text_runs"]]
+
+    @property
+    def left(self) -> float:
+        return self.margin
+
+    @property
+    def content_width(self) -> float:
+        return self.width - 2 * self.margin
+
+    @property
+    def bottom(self) -> float:
+        return self.height - self.margin
+
+    def new_page(self, footer: bool = True, margin: Union[float, None] = None) -> None:
+        """
+        Starts a new page and moves the cursor to the top of its content area
+
+        Args:
+            param1(bool): whether the page gets the footer
+            param2(float): top margin of the page, the margin of the document by default
+        """
+        self.pages.append(
+            {
+                "stream": pydyf.Stream(compress=True),
+                "images": set(),
+                "links": [],
+                "text_runs": [],
+                "footer": footer,
+            }
+        )
+        self.y = self.margin if margin is None else margin
+
+    def ensure_space(self, height: float) -> None:
+        """
+        Starts a new page when a block of that height does not fit below the cursor
+        """
+        if self.y + height > self.bottom and self.y > self.margin:
+            self.new_page()
+
+    def space(self, height: float) -> None:
+        self.y += height
+
+    def anchor(self, name: str) -> None:
+        """
+        Records the position of the cursor as the target of internal links
+        """
+        self.anchors[name] = (len(self.pages) - 1, self.y)
+
+    def link(self, x: float, y: float, width: float, height: float, anchor: str) -> None:
+        """
+        Adds an internal link over a rectangle of the current page (css coordinates)
+        """
+        self.pages[-1]["links"].append((x, y, width, height, anchor))
+
+    def draw_text(
+        self,
+        x: float,
+        y: float,
+        text: str,
+        size: float,
+        bold: bool = False,
+        color: Union[str, None] = None,
+        line_height: float = 1.25,
+    ) -> None:
+        """
+        Draws a single line of text whose line box starts at y (css coordinates)
+        """
+        metrics = font_metrics["bold" if bold else "regular"]
+        half_leading = (line_height - metrics["ascent"] + metrics["descent"]) * size / 2
+        baseline = self.height - (y + half_leading + metrics["ascent"] * size)
+
+        stream = self.pages[-1]["stream"]
+        stream.begin_text()
+        stream.set_color_rgb(*hex_to_rgb(color or self.text_color))
+        stream.set_font_size("F2" if bold else "F1", size)
+        stream.text_matrix(1, 0, 0, 1, x, baseline)
+        stream.show_text(_pdf_string(text))
+        stream.end_text()
+        self.pages[-1]["text_runs"].append(text)
+
+    def paragraph(
+        self,
+        text: str,
+        size: float = 10,
+        bold: bool = False,
+        color: Union[str, None] = None,
+        align: str = "left",
+        indent: float = 0,
+        width: Union[float, None] = None,
+        line_height: float = 1.25,
+        bullet: Union[str, None] = None,
+    ) -> None:
+        """
+        Lays out a block of wrapped text at the cursor, breaking pages between lines
+
+        Args:
+            param1(str): the text
+            param2(float): font size in points
+            param3(bool): whether the bold font is used
+            param4(str): css color of the text
+            param5(str): left, center or right
+            param6(float): left offset from the content area
+            param7(float): available width, the rest of the content area by default
+            param8(float): line height relative to the font size
+            param9(str): marker drawn in front of the first line, in the indentation
+        """
+        width = self.content_width - indent if width is None else width
+        for index, line in enumerate(wrap_text(text, size, width, bold)):
+            self.ensure_space(size * line_height)
+            x = self.left + indent
+            if align == "center":
+                x += (width - text_width(line, size, bold)) / 2
+            elif align == "right":
+                x += width - text_width(line, size, bold)
+            if bullet and index == 0:
+                self.draw_marker(bullet, x, self.y, size, color, line_height)
+            self.draw_text(x, self.y, line, size, bold, color, line_height)
+            self.y += size * line_height
+
+    def draw_marker(
+        self, marker: str, x: float, y: float, size: float, color: Union[str, None], line_height: float
+    ) -> None:
+        # list markers are generated content, they are not part of the text of the report
+        self.draw_text(x - text_width(marker + " ", size), y, marker, size, False, color, line_height)
+        self.pages[-1]["text_runs"].pop()
+
+    def rule(self, color: str, thickness: float, width: Union[float, None] = None) -> None:
+        """
+        Draws a horizontal line across the content area at the cursor and moves below it
+        """
+        stream = self.pages[-1]["stream"]
+        stream.set_color_rgb(*hex_to_rgb(color))
+        stream.rectangle(
+            self.left, self.height - self.y - thickness, width or self.content_width, thickness
+        )
+        stream.fill()
+        self.y += thickness
+
+    def draw_image(
+        self, path_image: Union[str, pathlib.Path], x: float, y: float, width: float, height: float
+    ) -> None:
+        """
+        Draws an image into a rectangle of the current page (css coordinates)
+        """
+        name = self._image_name(path_image)
+        self.pages[-1]["images"].add(name)
+        stream = self.pages[-1]["stream"]
+        stream.push_state()
+        stream.transform(width, 0, 0, height, x, self.height - y - height)
+        stream.draw_x_object(name)
+        stream.pop_state()
+
+    def image(
+        self,
+        path_image: Union[str, pathlib.Path],
+        width: Union[float, None] = None,
+        height: Union[float, None] = None,
+        align: str = "center",
+    ) -> Tuple[float, float]:
+        """
+        Lays out an image at the cursor, keeping its aspect ratio when only one dimension is given
+
+        Returns:
+            Tuple[float, float]: the placed width and height
+        """
+        pixel_width, pixel_height = image_size(path_image)
+        if width is None and height is None:
+            width = min(self.content_width, pixel_width * CSS_PX)
+        if height is None:
+            height = width * pixel_height / pixel_width
+        elif width is None:
+            width = height * pixel_width / pixel_height
+        self.ensure_space(height)
+        x = self.left
+        if align == "center":
+            x += (self.content_width - width) / 2
+        self.draw_image(path_image, x, self.y, width, height)
+        self.y += height
+        return width, height
+
+    def background(self, path_image: Union[str, pathlib.Path]) -> None:
+        """
+        Draws an image over the whole current page, contained and centered
+        """
+        pixel_width, pixel_height = image_size(path_image)
+        scale = min(self.width / pixel_width, self.height / pixel_height)
+        width, height = pixel_width * scale, pixel_height * scale
+        self.draw_image(
+            path_image, (self.width - width) / 2, (self.height - height) / 2, width, height
+        )
+
+    def _image_name(self, path_image: Union[str, pathlib.Path]) -> str:
+        key = str(path_image)
+        if key not in self.images:
+            self.images[key] = f"Im{len(self.images)}"
+        return self.images[key]
+
+    def _draw_footer(self, page: Dict, number: int) -> None:
+        """
+        Footer of the report stylesheets: a thin rule across the bottom margin and a box holding
+        the page number in its right corner
+        """
+        stream = page["stream"]
+        box = 10 * MM
+        top = self.bottom + (self.margin - box) / 2
+        stream.push_state()
+        stream.set_state("Half")
+        stream.set_color_rgb(*hex_to_rgb(self.footer_color))
+        stream.rectangle(self.left, self.height - top - box / 2, self.content_width, 0.5 * MM)
+        stream.fill()
+        stream.pop_state()
+        stream.set_color_rgb(*hex_to_rgb(self.footer_color))
+        stream.rectangle(self.width - self.margin - box, self.height - top - box, box, box)
+        stream.fill()
+
+        label = str(number)
+        metrics = font_metrics["regular"]
+        stream.begin_text()
+        stream.set_color_rgb(1, 1, 1)
+        stream.set_font_size("F1", 10)
+        stream.text_matrix(
+            1,
+            0,
+            0,
+            1,
+            self.width - self.margin - box / 2 - text_width(label, 10) / 2,
+            self.height - top - box / 2 - (metrics["ascent"] + metrics["descent"]) * 10 / 2,
+        )
+        stream.show_text(_pdf_string(label))
+        stream.end_text()
+
+    def write(self, path_pdf: Union[str, pathlib.Path]) -> pathlib.Path:
+        """
+        Writes the pdf, with compressed object streams
+
+        Args:
+            param(Union[str, pathlib.Path]): where to write the pdf
+
+        Returns:
+            pathlib.Path: path of the pdf
+        """
+        document = pydyf.PDF()
+
+        fonts = pydyf.Dictionary()
+        for font_key, style in (("F1", "regular"), ("F2", "bold")):
+            font = pydyf.Dictionary(
+                {
+                    "Type": "/Font",
+                    "Subtype": "/Type1",
+                    "BaseFont": f"/{standard_fonts[style]}",
+                    "Encoding": "/WinAnsiEncoding",
+                }
+            )
+            document.add_object(font)
+            fonts[font_key] = font.reference
+
+        half_transparent = pydyf.Dictionary({"Type": "/ExtGState", "ca": 0.5, "CA": 0.5})
+        document.add_object(half_transparent)
+
+        xobjects = pydyf.Dictionary()
+        for path_image, name in self.images.items():
+            image_stream, width, height = _image_stream(path_image)
+            extra = {
+                "Type": "/XObject",
+                "Subtype": "/Image",
+                "Width": width,
+                "Height": height,
+                "ColorSpace": image_stream["color_space"],
+                "BitsPerComponent": 8,
+            }
+            if image_stream["mask"] is not None:
+                mask = pydyf.Stream(
+                    [image_stream["mask"]],
+                    {
+                        "Type": "/XObject",
+                        "Subtype": "/Image",
+                        "Width": width,
+                        "Height": height,
+                        "ColorSpace": "/DeviceGray",
+                        "BitsPerComponent": 8,
+                    },
+                    compress=True,
+                )
+                document.add_object(mask)
+                extra["SMask"] = mask.reference
+            if image_stream["filter"]:
+                extra["Filter"] = image_stream["filter"]
+            xobject = pydyf.Stream(
+                [image_stream["data"]], extra, compress=image_stream["filter"] is None
+            )
+            document.add_object(xobject)
+            xobjects[name] = xobject.reference
+
+        resources = pydyf.Dictionary(
+            {
+                "Font": fonts,
+                "XObject": xobjects,
+                "ExtGState": pydyf.Dictionary({"Half": half_transparent.reference}),
+            }
+        )
+        document.add_object(resources)
+
+        list_page_objects = []
+        for number, page in enumerate(self.pages, start=1):
+            if page["footer"]:
+                self._draw_footer(page, number)
+            document.add_object(page["stream"])
+            page_object = pydyf.Dictionary(
+                {
+                    "Type": "/Page",
+                    "Parent": document.pages.reference,
+                    "MediaBox": pydyf.Array([0, 0, self.width, self.height]),
+                    "Contents": page["stream"].reference,
+                    "Resources": resources.reference,
+                }
+            )
+            document.add_page(page_object)
+            list_page_objects.append(page_object)
+
+        # links can only reference their target page once every page has an object number
+        for page, page_object in zip(self.pages, list_page_objects):
+            annotations = pydyf.Array()
+            for x, y, width, height, anchor in page["links"]:
+                if anchor not in self.anchors:
+                    continue
+                target_index, target_y = self.anchors[anchor]
+                annotation = pydyf.Dictionary(
+                    {
+                        "Type": "/Annot",
+                        "Subtype": "/Link",
+                        "Rect": pydyf.Array(
+                            [x, self.height - y - height, x + width, self.height - y]
+                        ),
+                        "Border": pydyf.Array([0, 0, 0]),
+                        "Dest": pydyf.Array(
+                            [
+                                list_page_objects[target_index].reference,
+                                "/XYZ",
+                                0,
+                                self.height - target_y,
+                                0,
+                            ]
+                        ),
+                    }
+                )
+                document.add_object(annotation)
+                annotations.append(annotation.reference)
+            if annotations:
+                page_object["Annots"] = annotations
+
+        with open(path_pdf, "wb") as file:
+            document.write(file, compress=True)
+        return pathlib.Path(path_pdf)
@@ -0,0 +1,158 @@
+from typing import Dict, Tuple, Union
+import pathlib
+import numpy as np
+import matplotlib
+from matplotlib.transforms import Bbox
+from PIL import Image
+from .quality import *
+
+# file extension of each codec a chart can be encoded with. svg charts stay vector graphics, weasyprint
+# draws them itself instead of embedding and rescaling a bitmap
+codec_suffixes = {"png": ".png", "jpeg": ".jpg", "svg": ".svg"}
+
+# codecs that are encoded from the rasterized pixels of a chart
+raster_codecs = ["png", "jpeg"]
+
+
+def render_figure(
+    fig: matplotlib.figure.Figure,
+    quality_profile: str,
+    placement_width: Union[int, float],
+    crop: Tuple[float, float, float, float] = (0, 0, 1, 1),
+) -> np.ndarray:
+    """
+    Rasterizes the figure at the resolution of the quality profile without encoding it, and crops
+    the pixels in memory so that the chart only needs to be encoded once
+
+    Args:
+        param1(matplotlib.figure.Figure): the figure to rasterize
+        param2(str): name of the quality profile
+        param3(Union[int, float]): width in inches that the whole (uncropped) figure occupies in the pdf
+        param4(Tuple[float, float, float, float]): the region to keep as fractions of the figure
+        (left, top, right, bottom), measured from the top left corner
+
+    Returns:
+        np.ndarray: the RGB pixels of the cropped chart
+    """
+    savefig_kwargs = apply_quality_profile(fig, quality_profile, placement_width)
+    fig.set_dpi(savefig_kwargs["dpi"])
+    fig.canvas.draw()
+    pixels = np.asarray(fig.canvas.buffer_rgba())
+
+    height, width = pixels.shape[:2]
+    left, top, right, bottom = crop
+    return pixels[
+        int(height * top) : int(height * bottom), int(width * left) : int(width * right), :3
+    ].copy()
+
+
+def encode_chart(
+    pixels: np.ndarray,
+    path_stem: Union[str, pathlib.Path],
+    codec: str,
+    quality_profile: str,
+) -> pathlib.Path:
+    """
+    Encodes the pixels of a chart exactly once. Flat-color charts are stored as palette PNG files
+    and charts with gradients or photographic content as JPEG files
+
+    Args:
+        param1(np.ndarray): the RGB pixels of the chart
+        param2(Union[str, pathlib.Path]): path of the image without its extension
+        param3(str): png or jpeg
+        param4(str): name of the quality profile, sets the jpeg quality
+
+    Returns:
+        pathlib.Path: path of the saved image, including the extension of the codec
+
+    Raises:
+        ValueError: the codec is not a raster codec
+    """
+    if codec not in raster_codecs:
+        raise ValueError(
+            f"cannot encode pixels as {codec}, expected one of {raster_codecs}"
+        )
+
+    path_chart = pathlib.Path(path_stem).with_suffix(codec_suffixes[codec])
+    image = Image.fromarray(pixels)
+
+    if codec == "png":
+        image.quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(
+            path_chart, format="PNG", optimize=True
+        )
+    else:
+        image.save(
+            path_chart,
+            format="JPEG",
+            quality=get_quality_profile(quality_profile)["jpeg_quality"],
+            optimize=True,
+            subsampling=0,
+        )
+    return path_chart
+
+
+def save_chart(
+    fig: matplotlib.figure.Figure,
+    path_stem: Union[str, pathlib.Path],
+    codec: str,
+    quality_profile: str,
+    placement_width: Union[int, float],
+    crop: Tuple[float, float, float, float] = (0, 0, 1, 1),
+) -> pathlib.Path:
+    """
+    Rasterizes, crops and encodes the figure in a single pass, or saves it as a vector graphic
+    when the codec is svg
+
+    Args:
+        param1(matplotlib.figure.Figure): the figure to save
+        param2(Union[str, pathlib.Path]): path of the image without its extension
+        param3(str): png, jpeg or svg
+        param4(str): name of the quality profile
+        param5(Union[int, float]): width in inches that the whole (uncropped) figure occupies in the pdf
+        param6(Tuple[float, float, float, float]): the region to keep as fractions of the figure
+        (left, top, right, bottom), measured from the top left corner
+
+    Returns:
+        pathlib.Path: path of the saved image
+
+    Raises:
+        ValueError: the codec is not supported
+    """
+    if codec == "svg":
+        return save_vector_chart(fig, path_stem, crop)
+
+    pixels = render_figure(fig, quality_profile, placement_width, crop)
+    return encode_chart(pixels, path_stem, codec, quality_profile)
+
+
+def save_vector_chart(
+    fig: matplotlib.figure.Figure,
+    path_stem: Union[str, pathlib.Path],
+    crop: Tuple[float, float, float, float] = (0, 0, 1, 1),
+) -> pathlib.Path:
+    """
+    Saves the figure as an svg file, the crop is applied to the page of the svg so nothing has
+    to be rasterized. The resolution of the quality profile does not apply to vector charts
+
+    Args:
+        param1(matplotlib.figure.Figure): the figure to save
+        param2(Union[str, pathlib.Path]): path of the image without its extension
+        param3(Tuple[float, float, float, float]): the region to keep as fractions of the figure
+        (left, top, right, bottom), measured from the top left corner
+
+    Returns:
+        pathlib.Path: path of the saved svg file
+    """
+    path_chart = pathlib.Path(path_stem).with_suffix(codec_suffixes["svg"])
+
+    # the bounding box is in inches and measured from the bottom left corner
+    width, height = fig.get_size_inches()
+    left, top, right, bottom = crop
+    fig.savefig(
+        path_chart,
+        format="svg",
+        bbox_inches=Bbox(
+            [[left * width, (1 - bottom) * height], [right * width, (1 - top) * height]]
+        ),
+    )
+    return path_chart
@@ -0,0 +1,228 @@
+from typing import Callable, Dict, Iterator, Union
+import contextlib
+import contextvars
+import gc
+import resource
+import sys
+import threading
+import time
+import matplotlib
+import matplotlib.figure
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# maximum growth (in bytes) of the retained rss tolerated by the soak check once the container is warm
+SOAK_RSS_TOLERANCE = 32 * 1024 * 1024
+
+
+# rc parameters of the charts of the report being generated, see chart_style. the charts never
+# change rcParams themselves, so that the reports generated by one process never see each other's
+# style
+_chart_style = contextvars.ContextVar("chart_style", default={})
+
+# matplotlib reads the rc parameters from a single global dictionary, so the charts of concurrent
+# reports are drawn one at a time (they hold the gil while drawing anyway)
+_chart_style_lock = threading.RLock()
+
+# telemetry of the reports tracked by this process and not done yet, see track_report_memory. the
+# peak rss is the peak of the whole process, it is only the peak of a report when no other report
+# ran at any point of it
+_tracked_reports = []
+_tracked_reports_lock = threading.Lock()
+
+# keyword arguments of plt.subplots that are not arguments of the figure
+_subplots_kwargs = [
+    "sharex",
+    "sharey",
+    "squeeze",
+    "width_ratios",
+    "height_ratios",
+    "subplot_kw",
+    "gridspec_kw",
+]
+
+
+@contextlib.contextmanager
+def chart_style(style: Dict[str, object]) -> Iterator[None]:
+    """
+    Sets the rc parameters the charts of the current report (thread or task) are drawn with
+
+    Args:
+        param(Dict[str, object]): the rc parameters that differ from the matplotlib defaults
+    """
+    token = _chart_style.set(style)
+    try:
+        yield
+    finally:
+        _chart_style.reset(token)
+
+
+@contextlib.contextmanager
+def _styled_chart() -> Iterator[None]:
+    with _chart_style_lock, matplotlib.rc_context(_chart_style.get()):
+        yield
+
+
+@contextlib.contextmanager
+def managed_figure(*args, **kwargs) -> Iterator[matplotlib.figure.Figure]:
+    """
+    Creates a figure that belongs to the chart alone: it is not registered with pyplot, whose
+    current figure and figure manager are shared by the whole process, and is drawn with the style
+    of the current report. Charts draw on it through its own methods, never through pyplot
+
+    Args:
+        *args, **kwargs: forwarded to matplotlib.figure.Figure
+
+    Yields:
+        matplotlib.figure.Figure: the new figure
+    """
+    with _styled_chart():
+        fig = matplotlib.figure.Figure(*args, **kwargs)
+        FigureCanvasAgg(fig)
+        yield fig
+
+
+@contextlib.contextmanager
+def managed_subplots(*args, **kwargs) -> Iterator:
+    """
+    Same as managed_figure for charts laid out like plt.subplots
+
+    Args:
+        *args, **kwargs: forwarded to plt.subplots
+
+    Yields:
+        Tuple[matplotlib.figure.Figure, matplotlib.axes.Axes]: the new figure and its axes
+    """
+    subplots_kwargs = {key: kwargs.pop(key) for key in _subplots_kwargs if key in kwargs}
+    with managed_figure(**kwargs) as fig:
+        yield fig, fig.subplots(*args, **subplots_kwargs)
+
+
+def read_rss() -> Dict[str, int]:
+    """
+    Reads the current and the peak resident set size of the process
+
+    Returns:
+        Dict[str, int]: the current (rss) and peak (peak_rss) resident set size in bytes
+    """
+    try:
+        with open("/proc/self/status", encoding="utf8") as file:
+            status = dict(line.split(":", 1) for line in file if ":" in line)
+        return {
+            "rss": int(status["VmRSS"].split()[0]) * 1024,
+            "peak_rss": int(status["VmHWM"].split()[0]) * 1024,
+        }
+    except (OSError, KeyError, ValueError):
+        # no procfs, only the lifetime peak is known (kilobytes on linux, bytes on macos)
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss *= 1 if sys.platform == "darwin" else 1024
+        return {"rss": peak_rss, "peak_rss": peak_rss}
+
+
+def _reset_peak_rss() -> None:
+    """
+    Resets the peak resident set size of the process so that the peak of each report is measured
+    on its own. Only supported by linux, elsewhere the peak stays the lifetime peak of the process
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf8") as file:
+            file.write("5")
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def track_report_memory(report_name: str = "report") -> Iterator[Dict[str, Union[str, int, float]]]:
+    """
+    Records the peak and retained rss of a single report, as well as the figures that are still
+    open once it is done. The telemetry is printed so that it ends up in the container logs. The
+    rss is the rss of the whole process: when other reports ran in the process at any point of the
+    report (shared is then True), its peak is not its own and peak_rss is None, and the peak is
+    only reset while no other report is tracked, so that the reports running do not lose theirs
+
+    Args:
+        param(str): name of the report used in the log line
+
+    Yields:
+        Dict[str, Union[str, int, float]]: the telemetry of the report, filled in when the block exits
+    """
+    telemetry = {"report": report_name}
+    gc.collect()
+    with _tracked_reports_lock:
+        telemetry["shared"] = bool(_tracked_reports)
+        for other in _tracked_reports:
+            other["shared"] = True
+        _tracked_reports.append(telemetry)
+        if not telemetry["shared"]:
+            _reset_peak_rss()
+        rss_before = read_rss()["rss"]
+    start = time.perf_counter()
+    try:
+        yield telemetry
+    finally:
+        gc.collect()
+        with _tracked_reports_lock:
+            # by identity, the telemetry of two reports can be equal
+            _tracked_reports[:] = [other for other in _tracked_reports if other is not telemetry]
+            rss_after = read_rss()
+        telemetry.update(
+            {
+                "seconds": round(time.perf_counter() - start, 3),
+                "rss_before": rss_before,
+                "peak_rss": None if telemetry["shared"] else rss_after["peak_rss"],
+                "retained_rss": rss_after["rss"] - rss_before,
+                "open_figures": len(plt.get_fignums()),
+            }
+        )
+        print("report memory", telemetry)
+
+
+def soak_check(
+    generate_report: Callable[[int], object],
+    n_reports: int = 1000,
+    n_warmup_reports: int = 20,
+    rss_tolerance: int = SOAK_RSS_TOLERANCE,
+) -> Dict[str, int]:
+    """
+    Generates the same kind of report many times in a row, the way a warm container does, and checks
+    that memory stays flat: no figure may be left open and, once the caches and the allocator are
+    warm, the rss may not grow by more than the tolerance
+
+    Args:
+        param1(Callable[[int], object]): generates one report, receives the index of the report
+        param2(int): number of reports generated after the warm up
+        param3(int): number of reports generated before the baseline rss is taken
+        param4(int): maximum growth of the rss in bytes
+
+    Returns:
+        Dict[str, int]: the baseline, final and peak rss in bytes and the growth of the rss
+
+    Raises:
+        AssertionError: a report left a figure open or the rss kept growing
+    """
+    for index in range(n_warmup_reports):
+        generate_report(index)
+    gc.collect()
+    rss_baseline = read_rss()["rss"]
+
+    for index in range(n_reports):
+        generate_report(n_warmup_reports + index)
+        if plt.get_fignums():
+            raise AssertionError(
+                f"report {index} left {len(plt.get_fignums())} figures open"
+            )
+
+    gc.collect()
+    rss_final = read_rss()
+    result = {
+        "rss_baseline": rss_baseline,
+        "rss_final": rss_final["rss"],
+        "peak_rss": rss_final["peak_rss"],
+        "rss_growth": rss_final["rss"] - rss_baseline,
+    }
+    print("soak check", result)
+    if result["rss_growth"] > rss_tolerance:
+        raise AssertionError(
+            f"rss grew by {result['rss_growth']} bytes over {n_reports} reports"
+        )
+    return result
@@ -0,0 +1,89 @@
+from typing import Dict, Union
+import collections
+import functools
+import hashlib
+import json
+import pathlib
+import threading
+import jinja2
+import markupsafe
+from .chart_cache import canonical_value
+
+# rendered fragments kept by this process, least recently used first
+FRAGMENT_CACHE_SIZE = 1024
+
+fragment_cache = collections.OrderedDict()
+fragment_cache_stats = {"hits": 0, "misses": 0}
+fragment_cache_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_environment(path_templates: str) -> jinja2.Environment:
+    """
+    One environment per template directory and process, so that every fragment template is only
+    compiled once
+    """
+    return jinja2.Environment(loader=jinja2.FileSystemLoader(path_templates))
+
+
+@functools.lru_cache(maxsize=256)
+def _source_digest(filename: str, mtime_ns: int) -> str:
+    return hashlib.sha256(pathlib.Path(filename).read_bytes()).hexdigest()
+
+
+def fragment_version(template: jinja2.Template, context: Dict) -> str:
+    """
+    Identifies a rendered fragment by the source of its template and the content it expands, so
+    that editing either of them renders the fragment again
+
+    Args:
+        param1(jinja2.Template): the fragment template
+        param2(Dict): the variables the fragment is rendered with
+
+    Returns:
+        str: hex digest of the fragment version
+    """
+    path_template = pathlib.Path(template.filename)
+    canonical = json.dumps(
+        [
+            _source_digest(str(path_template), path_template.stat().st_mtime_ns),
+            template.name,
+            context,
+        ],
+        sort_keys=True,
+        default=canonical_value,
+    )
+    return hashlib.sha256(canonical.encode("utf8")).hexdigest()
+
+
+def render_fragment(
+    path_templates: Union[str, pathlib.Path], name: str, context: Dict
+) -> markupsafe.Markup:
+    """
+    Renders a fragment template once per content version. The fragment only depends on static
+    content (the text of a skill for instance), so the same html is reused by every report and the
+    main template only stitches the fragments together
+
+    Args:
+        param1(Union[str, pathlib.Path]): directory of the templates
+        param2(str): name of the fragment template within that directory
+        param3(Dict): the variables the fragment is rendered with
+
+    Returns:
+        markupsafe.Markup: the rendered fragment, inserted as is by the main template
+    """
+    template = _get_environment(str(path_templates)).get_template(name)
+    key = fragment_version(template, context)
+    with fragment_cache_lock:
+        if key in fragment_cache:
+            fragment_cache.move_to_end(key)
+            fragment_cache_stats["hits"] += 1
+            return fragment_cache[key]
+
+    fragment = markupsafe.Markup(template.render(context))
+    with fragment_cache_lock:
+        fragment_cache_stats["misses"] += 1
+        fragment_cache[key] = fragment
+        while len(fragment_cache) > FRAGMENT_CACHE_SIZE:
+            fragment_cache.popitem(last=False)
+    return fragment
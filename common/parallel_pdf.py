@@ -0,0 +1,413 @@
+from typing import Dict, List, Tuple, Union
+import concurrent.futures
+import copy
+import io
+import pathlib
+import re
+import threading
+import pikepdf
+import weasyprint
+from .report_graph import *
+from .assets import *
+from .thumbnails import *
+
+# 1 css pixel in pdf points
+PX_TO_PT = 0.75
+
+# pages laid out by each chunk of a document the last time it was rendered, used to predict the
+# page offset of the following chunks. keyed by the base url and the articles of the chunk
+chunk_page_counts = {}
+
+_executor, _executor_workers = None, 0
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> Union[concurrent.futures.ProcessPoolExecutor, None]:
+    """
+    Returns the pool of worker processes, started once per process so that warm containers keep
+    their workers (and the fonts they loaded). None when the platform cannot start a pool
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None and _executor_workers != workers:
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _executor is None:
+            try:
+                _executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+                _executor_workers = workers
+            except (OSError, NotImplementedError):
+                # aws lambda has no /dev/shm, so multiprocessing cannot create its semaphores
+                return None
+        return _executor
+
+
+def split_articles(html: str) -> Tuple[str, List[str], str]:
+    """
+    Splits a rendered report at its top-level article elements, every page break of the templates
+    is the start of one of them
+
+    Args:
+        param(str): the rendered html of the report
+
+    Returns:
+        Tuple[str, List[str], str]: the html before the first article (head, styles and running
+        elements), the html of every article and the html after the last article
+    """
+    list_bounds, depth, start = [], 0, None
+    for match in re.finditer(r"<(/?)article\b[^>]*>", html):
+        if match.group(1):
+            depth -= 1
+            if depth == 0:
+                list_bounds.append((start, match.end()))
+        else:
+            if depth == 0:
+                start = match.start()
+            depth += 1
+
+    if not list_bounds:
+        return html, [], ""
+    return (
+        html[: list_bounds[0][0]],
+        [html[start:end] for start, end in list_bounds],
+        html[list_bounds[-1][1] :],
+    )
+
+
+def _render_chunk(
+    html: str, base_url: str, page_offset: int, thumbnail_mode: Union[str, None] = None
+) -> Dict:
+    """
+    Lays out one chunk of the report in a worker process. The chunk starts with page_offset empty
+    placeholder pages so that page counters match the whole report, they are dropped before the
+    chunk is written. Internal links and bookmarks are returned instead of written, they can only
+    be resolved once every chunk is laid out. The pages of the chunk that the preview of the
+    report needs are painted from the same layout
+    """
+    document = weasyprint.HTML(
+        string=html, base_url=base_url, url_fetcher=asset_url_fetcher
+    ).render()
+    pages, list_pages = detach_internal_links(document.pages[page_offset:])
+
+    chunk_document = document.copy(pages)
+    return {
+        "pdf": chunk_document.write_pdf(),
+        "pages": list_pages,
+        "thumbnails": (
+            page_thumbnails(chunk_document, thumbnail_mode, page_offset) if thumbnail_mode else []
+        ),
+    }
+
+
+def detach_internal_links(
+    pages: List[weasyprint.Page],
+) -> Tuple[List[weasyprint.Page], List[Dict]]:
+    """
+    Records the anchors, internal links and bookmarks of laid out pages, so that they can be
+    resolved by merge_chunks once the pages are merged with pages of other documents. The pages
+    themselves are left untouched, they may be shared (the static pages of a template)
+
+    Args:
+        param(List[weasyprint.Page]): the laid out pages
+
+    Returns:
+        Tuple[List[weasyprint.Page], List[Dict]]: copies of the pages without internal links nor
+        bookmarks, to be written, and the height, anchors, internal links and bookmarks of every page
+    """
+    list_copies, list_pages = [], []
+    for page in pages:
+        list_pages.append(
+            {
+                "height": page.height,
+                "anchors": dict(page.anchors),
+                "links": [link for link in page.links if link[0] == "internal"],
+                "bookmarks": list(page.bookmarks),
+            }
+        )
+        page_copy = copy.copy(page)
+        page_copy.links = [link for link in page.links if link[0] != "internal"]
+        page_copy.bookmarks = []
+        list_copies.append(page_copy)
+    return list_copies, list_pages
+
+
+def _placeholder_pages(page_offset: int) -> str:
+    return '<article style="page-break-before: always"></article>' * page_offset
+
+
+def merge_chunks(list_chunks: List[Dict], path_pdf: Union[str, pathlib.Path]) -> None:
+    """
+    Concatenates the pages of every chunk in order and adds the internal links and the outline
+    of the whole document
+
+    Args:
+        param1(List[Dict]): the pdf of every chunk (its content, or the path of a file for chunks
+        that should not all be held in memory) and the pages recorded by detach_internal_links
+        param2(Union[str, pathlib.Path]): where to write the pdf
+    """
+    merged = pikepdf.Pdf.new()
+    list_sources = [
+        pikepdf.Pdf.open(
+            io.BytesIO(chunk["pdf"]) if isinstance(chunk["pdf"], bytes) else chunk["pdf"]
+        )
+        for chunk in list_chunks
+    ]
+    for source in list_sources:
+        merged.pages.extend(source.pages)
+    for key, value in list_sources[0].docinfo.items():
+        merged.docinfo[key] = value
+
+    list_pages = [page for chunk in list_chunks for page in chunk["pages"]]
+    dict_anchors = {
+        name: (index, x, y)
+        for index, page in enumerate(list_pages)
+        for name, (x, y) in page["anchors"].items()
+    }
+
+    for index, page in enumerate(list_pages):
+        height = page["height"] * PX_TO_PT
+        for _, anchor, (x, y, width, link_height) in page["links"]:
+            if anchor not in dict_anchors:
+                continue
+            target_index, target_x, target_y = dict_anchors[anchor]
+            target_height = list_pages[target_index]["height"] * PX_TO_PT
+            annotation = merged.make_indirect(
+                pikepdf.Dictionary(
+                    Type=pikepdf.Name.Annot,
+                    Subtype=pikepdf.Name.Link,
+                    Rect=[
+                        x * PX_TO_PT,
+                        height - (y + link_height) * PX_TO_PT,
+                        (x + width) * PX_TO_PT,
+                        height - y * PX_TO_PT,
+                    ],
+                    Border=[0, 0, 0],
+                    Dest=[
+                        merged.pages[target_index].obj,
+                        pikepdf.Name.XYZ,
+                        target_x * PX_TO_PT,
+                        target_height - target_y * PX_TO_PT,
+                        0,
+                    ],
+                )
+            )
+            page_object = merged.pages[index].obj
+            if pikepdf.Name.Annots not in page_object:
+                page_object.Annots = merged.make_indirect(pikepdf.Array())
+            page_object.Annots.append(annotation)
+
+    with merged.open_outline() as outline:
+        list_parents = []
+        for index, page in enumerate(list_pages):
+            height = page["height"] * PX_TO_PT
+            for bookmark in page["bookmarks"]:
+                level, label, (x, y) = bookmark[:3]
+                item = pikepdf.OutlineItem(
+                    label, index, "XYZ", left=x * PX_TO_PT, top=height - y * PX_TO_PT
+                )
+                # the open/closed state is only recorded by recent weasyprint versions
+                item.is_closed = tuple(bookmark[3:]) == ("closed",)
+                while list_parents and list_parents[-1][0] >= level:
+                    list_parents.pop()
+                if list_parents:
+                    list_parents[-1][1].children.append(item)
+                else:
+                    outline.root.append(item)
+                list_parents.append((level, item))
+
+    merged.save(path_pdf)
+
+
+def _write_pdf_single(
+    html: str,
+    path_pdf: Union[str, pathlib.Path],
+    base_url: str,
+    thumbnail_mode: Union[str, None] = None,
+) -> pathlib.Path:
+    """
+    Lays the whole report out in this process
+    """
+    document = weasyprint.HTML(
+        string=html, base_url=base_url, url_fetcher=asset_url_fetcher
+    ).render()
+    document.write_pdf(path_pdf)
+    write_thumbnail(document, path_pdf, thumbnail_mode)
+    return pathlib.Path(path_pdf)
+
+
+def write_pdf_parallel(
+    html: str,
+    path_pdf: Union[str, pathlib.Path],
+    base_url: str,
+    workers: int,
+    thumbnail_mode: Union[str, None] = None,
+) -> pathlib.Path:
+    """
+    Lays the report out in page chunks across worker processes and merges the pages in order. The
+    page offset of every chunk is predicted from the previous render of the same chunk; a chunk
+    whose offset turns out to be wrong is laid out again with the right one. When the offsets
+    still move after as many layouts as there are chunks (the page count of a chunk depends on
+    its offset), the report is laid out in this process instead
+
+    Args:
+        param1(str): the rendered html of the report
+        param2(Union[str, pathlib.Path]): where to write the pdf
+        param3(str): base url used to resolve the relative urls of the html
+        param4(int): number of worker processes
+        param5(Union[str, None]): preview written next to the pdf, see write_thumbnail
+
+    Returns:
+        pathlib.Path: path of the pdf
+    """
+    prefix, list_articles, suffix = split_articles(html)
+    executor = _get_executor(workers) if workers > 1 and len(list_articles) > 1 else None
+    if executor is None:
+        return _write_pdf_single(html, path_pdf, base_url, thumbnail_mode)
+
+    # contiguous groups of articles, one per worker
+    number_chunks = min(workers, len(list_articles))
+    list_bounds = [
+        len(list_articles) * index // number_chunks for index in range(number_chunks + 1)
+    ]
+    list_groups = [
+        list_articles[start:end] for start, end in zip(list_bounds, list_bounds[1:])
+    ]
+    list_keys = [(base_url, start, end) for start, end in zip(list_bounds, list_bounds[1:])]
+
+    # every article starts on a new page, so a chunk has at least as many pages as articles
+    list_predicted = [
+        chunk_page_counts.get(key, len(group)) for key, group in zip(list_keys, list_groups)
+    ]
+    list_offsets = [sum(list_predicted[:index]) for index in range(number_chunks)]
+    list_chunks = [None] * number_chunks
+    list_pending = list(range(number_chunks))
+
+    for _ in range(number_chunks):
+        futures = {
+            index: executor.submit(
+                _render_chunk,
+                prefix
+                + _placeholder_pages(list_offsets[index])
+                + "".join(list_groups[index])
+                + suffix,
+                base_url,
+                list_offsets[index],
+                thumbnail_mode,
+            )
+            for index in list_pending
+        }
+        for index, future in futures.items():
+            list_chunks[index] = future.result()
+            list_chunks[index]["offset"] = list_offsets[index]
+
+        list_counts = [len(chunk["pages"]) for chunk in list_chunks]
+        list_offsets = [sum(list_counts[:index]) for index in range(number_chunks)]
+        list_pending = [
+            index
+            for index in range(number_chunks)
+            if list_chunks[index]["offset"] != list_offsets[index]
+        ]
+        if not list_pending:
+            break
+
+    for key, count in zip(list_keys, list_counts):
+        chunk_page_counts[key] = count
+    if list_pending:
+        # merged, the pages of the pending chunks would be numbered and linked from wrong offsets
+        print(
+            f"page offsets of chunks {list_pending} did not settle after {number_chunks} "
+            "layouts, laying the report out in one process"
+        )
+        return _write_pdf_single(html, path_pdf, base_url, thumbnail_mode)
+
+    merge_chunks(list_chunks, path_pdf)
+    save_thumbnail(
+        [png for chunk in list_chunks for png in chunk["thumbnails"]], path_pdf, thumbnail_mode
+    )
+    return pathlib.Path(path_pdf)
+
+
+def _render_page_node(
+    html: str,
+    base_url: str,
+    page_offset: int,
+    path_node: pathlib.Path,
+    thumbnail_mode: Union[str, None] = None,
+) -> Dict:
+    """
+    Lays out the pages of one article and keeps them, and their previews, in the directory of its
+    node
+    """
+    chunk = _render_chunk(html, base_url, page_offset, thumbnail_mode)
+    path_chunk = path_node / "pages.pdf"
+    path_chunk.write_bytes(chunk["pdf"])
+    list_thumbnails = []
+    for index, png in enumerate(chunk["thumbnails"]):
+        list_thumbnails.append(path_node / f"thumbnail_{index}.png")
+        list_thumbnails[-1].write_bytes(png)
+    return {"pdf": path_chunk, "pages": chunk["pages"], "thumbnails": list_thumbnails}
+
+
+def write_pdf_incremental(
+    html: str,
+    path_pdf: Union[str, pathlib.Path],
+    base_url: str,
+    graph: ReportGraph,
+    thumbnail_mode: Union[str, None] = None,
+) -> pathlib.Path:
+    """
+    Lays the report out article by article through the graph of the report, so that only the
+    articles whose html, referenced files or page offset changed since the last render of the same
+    report are laid out again. The pages of every article are then merged in order
+
+    Args:
+        param1(str): the rendered html of the report
+        param2(Union[str, pathlib.Path]): where to write the pdf
+        param3(str): base url used to resolve the relative urls of the html
+        param4(ReportGraph): the graph of the report
+        param5(Union[str, None]): preview written next to the pdf, see write_thumbnail
+
+    Returns:
+        pathlib.Path: path of the pdf
+    """
+    prefix, list_articles, suffix = split_articles(html)
+    if not list_articles:
+        document = weasyprint.HTML(
+            string=html, base_url=base_url, url_fetcher=asset_url_fetcher
+        ).render()
+        document.write_pdf(path_pdf)
+        write_thumbnail(document, path_pdf, thumbnail_mode)
+        return pathlib.Path(path_pdf)
+
+    # the head and the running elements are laid out with every article
+    graph.source("html_frame", prefix, suffix, resource_fingerprint(prefix + suffix, base_url))
+
+    list_chunks, page_offset = [], 0
+    for index, article in enumerate(list_articles):
+        name_fragment = f"html_fragment_{index}"
+        graph.source(name_fragment, article, resource_fingerprint(article, base_url))
+        name_page = f"pdf_pages_{index}"
+        chunk = graph.run(
+            name_page,
+            ["html_frame", name_fragment],
+            _render_page_node,
+            prefix + _placeholder_pages(page_offset) + article + suffix,
+            base_url,
+            page_offset,
+            graph.node_directory(name_page),
+            thumbnail_mode,
+        )
+        list_chunks.append(
+            {
+                "pdf": chunk["pdf"].read_bytes(),
+                "pages": chunk["pages"],
+                "thumbnails": [path.read_bytes() for path in chunk["thumbnails"]],
+            }
+        )
+        page_offset += len(chunk["pages"])
+
+    merge_chunks(list_chunks, path_pdf)
+    save_thumbnail(
+        [png for chunk in list_chunks for png in chunk["thumbnails"]], path_pdf, thumbnail_mode
+    )
+    return pathlib.Path(path_pdf)
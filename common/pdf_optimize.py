@@ -0,0 +1,287 @@
+from typing import Dict, Iterator, List, Set, Union
+import hashlib
+import io
+import os
+import pathlib
+import time
+import pikepdf
+from fontTools import subset, ttLib
+from PIL import Image
+from .deadline import *
+
+# size (in bytes) a report should stay under once optimized, the reports are attached to emails
+# whose raw message (base64 encoded, about 4/3 of the pdf) is limited to 10 MB. 0 disables it
+PDF_SIZE_BUDGET = int(os.environ.get("PDF_SIZE_BUDGET", 7 * 1024 * 1024))
+
+# jpeg qualities the photos are encoded at again, in turn, while a report is over its budget
+budget_jpeg_qualities = [75, 60, 45]
+
+
+def _resource_dictionaries(pdf: pikepdf.Pdf) -> Iterator[pikepdf.Dictionary]:
+    """
+    Yields the resource dictionary of every page and of every form they draw, once each
+    """
+    seen = set()
+    stack = [page.obj.get(pikepdf.Name.Resources) for page in pdf.pages]
+    while stack:
+        resources = stack.pop()
+        if resources is None or (resources.is_indirect and resources.objgen in seen):
+            continue
+        if resources.is_indirect:
+            seen.add(resources.objgen)
+        yield resources
+        for xobject in resources.get(pikepdf.Name.XObject, {}).values():
+            if xobject.get(pikepdf.Name.Subtype) == pikepdf.Name.Form:
+                stack.append(xobject.get(pikepdf.Name.Resources))
+
+
+def _object_digest(value, memo: Dict) -> str:
+    """
+    Digests an object by content, the objects it references included, so that two copies of the
+    same image or font (one per chunk of a merged report for instance) have the same digest
+    """
+    if isinstance(value, pikepdf.Object) and value.is_indirect:
+        if value.objgen in memo:
+            return memo[value.objgen]
+        memo[value.objgen] = ""  # guards against reference cycles
+    digest = hashlib.sha256()
+    if isinstance(value, pikepdf.Stream):
+        digest.update(b"stream")
+        digest.update(value.read_raw_bytes())
+    if isinstance(value, (pikepdf.Dictionary, pikepdf.Stream)):
+        for key in sorted(value.keys()):
+            digest.update(key.encode("utf8"))
+            digest.update(_object_digest(value[key], memo).encode("utf8"))
+    elif isinstance(value, pikepdf.Array):
+        digest.update(b"array")
+        for item in value:
+            digest.update(_object_digest(item, memo).encode("utf8"))
+    else:
+        digest.update(repr(value).encode("utf8"))
+    hexdigest = digest.hexdigest()
+    if isinstance(value, pikepdf.Object) and value.is_indirect:
+        memo[value.objgen] = hexdigest
+    return hexdigest
+
+
+def deduplicate_resources(pdf: pikepdf.Pdf) -> int:
+    """
+    Points every page to a single copy of the images and fonts that are embedded more than once,
+    the other copies are no longer referenced and are left out when the pdf is saved
+
+    Args:
+        param(pikepdf.Pdf): the pdf, modified in place
+
+    Returns:
+        int: number of references moved to another copy
+    """
+    memo, canonical, count = {}, {}, 0
+    for resources in _resource_dictionaries(pdf):
+        for category in (pikepdf.Name.XObject, pikepdf.Name.Font):
+            dictionary = resources.get(category)
+            if dictionary is None:
+                continue
+            for name in list(dictionary.keys()):
+                value = dictionary[name]
+                if not value.is_indirect:
+                    continue
+                if value.get(pikepdf.Name.Subtype) == pikepdf.Name.Form:
+                    continue
+                first = canonical.setdefault(_object_digest(value, memo), value)
+                if first.objgen != value.objgen:
+                    dictionary[name] = first
+                    count += 1
+    return count
+
+
+def _text_codes(operands: List, operator: str) -> Iterator[bytes]:
+    if operator in ("Tj", "'"):
+        yield bytes(operands[0])
+    elif operator == '"':
+        yield bytes(operands[2])
+    elif operator == "TJ":
+        for item in operands[0]:
+            if isinstance(item, pikepdf.String):
+                yield bytes(item)
+
+
+def _used_glyphs(pdf: pikepdf.Pdf) -> Dict[tuple, Set[int]]:
+    """
+    Collects the two-byte character codes shown with every composite font, by font object
+    """
+    dict_glyphs = {}
+    stack = [(page, page.obj.get(pikepdf.Name.Resources)) for page in pdf.pages]
+    seen = set()
+    while stack:
+        content, resources = stack.pop()
+        if resources is None:
+            continue
+        fonts = resources.get(pikepdf.Name.Font, {})
+        for xobject in resources.get(pikepdf.Name.XObject, {}).values():
+            if (
+                xobject.get(pikepdf.Name.Subtype) == pikepdf.Name.Form
+                and xobject.objgen not in seen
+            ):
+                seen.add(xobject.objgen)
+                stack.append((xobject, xobject.get(pikepdf.Name.Resources, resources)))
+
+        font = None
+        for operands, operator in pikepdf.parse_content_stream(content):
+            operator = str(operator)
+            if operator == "Tf":
+                font = fonts.get(operands[0])
+                continue
+            if (
+                font is None
+                or not font.is_indirect
+                or font.get(pikepdf.Name.Subtype) != pikepdf.Name.Type0
+            ):
+                continue
+            glyphs = dict_glyphs.setdefault(font.objgen, set())
+            for codes in _text_codes(operands, operator):
+                glyphs.update(
+                    int.from_bytes(codes[index : index + 2], "big")
+                    for index in range(0, len(codes) - 1, 2)
+                )
+    return dict_glyphs
+
+
+def subset_fonts(pdf: pikepdf.Pdf) -> int:
+    """
+    Subsets the fully embedded TrueType fonts to the glyphs the pdf shows. WeasyPrint already
+    subsets the fonts it embeds (their name carries a subset tag), only composite fonts with an
+    identity encoding are subset here, their glyph ids are kept so that neither the content
+    streams nor the cid to glyph id map change
+
+    Args:
+        param(pikepdf.Pdf): the pdf, modified in place
+
+    Returns:
+        int: number of fonts subset
+    """
+    count = 0
+    for objgen, glyphs in _used_glyphs(pdf).items():
+        font = pdf.get_object(objgen)
+        if font.get(pikepdf.Name.Encoding) != pikepdf.Name("/Identity-H"):
+            continue
+        descendant = font.DescendantFonts[0]
+        descriptor = descendant.get(pikepdf.Name.FontDescriptor)
+        base_font = str(font.BaseFont)[1:]
+        if descriptor is None or pikepdf.Name.FontFile2 not in descriptor or base_font[6:7] == "+":
+            continue
+        cid_to_gid = descendant.get(pikepdf.Name.CIDToGIDMap)
+        if isinstance(cid_to_gid, pikepdf.Stream):
+            mapping = cid_to_gid.read_bytes()
+            glyphs = {
+                int.from_bytes(mapping[2 * cid : 2 * cid + 2], "big")
+                for cid in glyphs
+                if 2 * cid + 2 <= len(mapping)
+            }
+
+        ttfont = ttLib.TTFont(io.BytesIO(descriptor.FontFile2.read_bytes()))
+        options = subset.Options()
+        options.retain_gids = True
+        options.notdef_outline = True
+        options.name_IDs = ["*"]
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(gids=sorted(glyphs | {0}))
+        subsetter.subset(ttfont)
+        buffer = io.BytesIO()
+        ttfont.save(buffer)
+        descriptor.FontFile2.write(buffer.getvalue())
+
+        digest = hashlib.sha256(str(sorted(glyphs)).encode("utf8")).digest()
+        tag = "".join(chr(ord("A") + byte % 26) for byte in digest[:6])
+        name = pikepdf.Name(f"/{tag}+{base_font}")
+        font.BaseFont = descendant.BaseFont = descriptor.FontName = name
+        count += 1
+    return count
+
+
+def recompress_images(pdf: pikepdf.Pdf, jpeg_quality: int) -> int:
+    """
+    Encodes the jpeg images of the pdf again at a lower quality, keeping the ones that would not
+    get any lighter
+
+    Args:
+        param1(pikepdf.Pdf): the pdf, modified in place
+        param2(int): the jpeg quality
+
+    Returns:
+        int: number of images encoded again
+    """
+    count, seen = 0, set()
+    for resources in _resource_dictionaries(pdf):
+        for image in resources.get(pikepdf.Name.XObject, {}).values():
+            if (
+                image.get(pikepdf.Name.Subtype) != pikepdf.Name.Image
+                or image.objgen in seen
+                or image.get(pikepdf.Name.Filter) != pikepdf.Name.DCTDecode
+                or image.get(pikepdf.Name.ColorSpace) == pikepdf.Name.DeviceCMYK
+            ):
+                continue
+            seen.add(image.objgen)
+            content = image.read_raw_bytes()
+            buffer = io.BytesIO()
+            with Image.open(io.BytesIO(content)) as pil_image:
+                pil_image.save(buffer, format="JPEG", quality=jpeg_quality, optimize=True)
+            if buffer.tell() < len(content):
+                image.write(buffer.getvalue(), filter=pikepdf.Name.DCTDecode)
+                count += 1
+    return count
+
+
+def _save(pdf: pikepdf.Pdf, path_pdf: pathlib.Path) -> int:
+    pdf.save(
+        path_pdf,
+        linearize=True,
+        object_stream_mode=pikepdf.ObjectStreamMode.generate,
+        compress_streams=True,
+        recompress_flate=True,
+    )
+    return path_pdf.stat().st_size
+
+
+def optimize_pdf(
+    path_pdf: Union[str, pathlib.Path], size_budget: int = PDF_SIZE_BUDGET
+) -> Dict[str, Union[int, float, bool, str]]:
+    """
+    Post-processes a report before it is uploaded and emailed: the images and fonts embedded more
+    than once are deduplicated, the fully embedded fonts are subset, and the pdf is written again
+    linearized (the first page displays before the rest is downloaded) with its objects packed
+    into compressed object streams. A report still over its size budget has its photos encoded
+    again at lower qualities until it fits. A report short of time before its deadline is left
+    as it is
+
+    Args:
+        param1(Union[str, pathlib.Path]): path of the pdf, replaced by the optimized pdf
+        param2(int): size (in bytes) the pdf should stay under, 0 for no budget
+
+    Returns:
+        Dict[str, Union[int, float, bool, str]]: the size of the pdf before and after, and what was
+        done to it
+    """
+    start = time.perf_counter()
+    path_pdf = pathlib.Path(path_pdf)
+    summary = {"path": str(path_pdf), "before": path_pdf.stat().st_size}
+    if not deadline_allows("optimize"):
+        return {**summary, "after": summary["before"], "skipped": True}
+    with render_stage("optimize"), pikepdf.Pdf.open(path_pdf, allow_overwriting_input=True) as pdf:
+        summary["deduplicated"] = deduplicate_resources(pdf)
+        summary["subset_fonts"] = subset_fonts(pdf)
+        summary["after"] = _save(pdf, path_pdf)
+        for jpeg_quality in budget_jpeg_qualities:
+            if not size_budget or summary["after"] <= size_budget:
+                break
+            if not recompress_images(pdf, jpeg_quality):
+                continue
+            summary["jpeg_quality"] = jpeg_quality
+            summary["after"] = _save(pdf, path_pdf)
+
+    summary["budget"] = size_budget
+    summary["within_budget"] = not size_budget or summary["after"] <= size_budget
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    print("optimized pdf", summary)
+    if not summary["within_budget"]:
+        print(f"WARNING: {path_pdf.name} is over its size budget of {size_budget} bytes")
+    return summary
@@ -0,0 +1,65 @@
+from typing import Dict, Union
+import matplotlib
+import matplotlib.figure
+
+# named render-quality profiles shared by every chart of both reports. dpi is the resolution of the
+# chart at its placed size in the pdf, not the resolution of the matplotlib figure
+quality_profiles = {
+    "draft": {"dpi": 72, "antialiased": False, "jpeg_quality": 60},
+    "screen": {"dpi": 144, "antialiased": True, "jpeg_quality": 85},
+    "print": {"dpi": 220, "antialiased": True, "jpeg_quality": 92},
+}
+
+DEFAULT_QUALITY_PROFILE = "screen"
+
+# width (in inches) of the content box of a letter page with weasyprint's default 75px margins
+PAGE_CONTENT_WIDTH = 8.5 - 2 * 75 / 96
+
+
+def get_quality_profile(quality_profile: str) -> Dict[str, Union[int, bool]]:
+    """
+    Looks up a render-quality profile by name
+
+    Args:
+        param(str): name of the profile (draft, screen or print)
+
+    Returns:
+        Dict[str, Union[int, bool]]: the dpi, antialiasing and jpeg quality of the profile
+
+    Raises:
+        ValueError: the profile does not exist
+    """
+    if quality_profile not in quality_profiles:
+        raise ValueError(
+            f"unknown quality profile {quality_profile}, expected one of {list(quality_profiles)}"
+        )
+    return quality_profiles[quality_profile]
+
+
+def apply_quality_profile(
+    fig: matplotlib.figure.Figure,
+    quality_profile: str,
+    placement_width: Union[int, float],
+) -> Dict:
+    """
+    Applies the antialiasing of a quality profile to every artist of the figure and computes the
+    savefig arguments so that the saved image has the resolution of the profile at the width the
+    figure occupies in the pdf
+
+    Args:
+        param1(matplotlib.figure.Figure): the figure about to be saved
+        param2(str): name of the quality profile
+        param3(Union[int, float]): width in inches that the whole figure occupies in the pdf
+
+    Returns:
+        Dict: keyword arguments for savefig (dpi and the jpeg quality)
+    """
+    profile = get_quality_profile(quality_profile)
+
+    for artist in fig.findobj(lambda artist: hasattr(artist, "set_antialiased")):
+        artist.set_antialiased(profile["antialiased"])
+
+    return {
+        "dpi": profile["dpi"] * placement_width / fig.get_figwidth(),
+        "pil_kwargs": {"quality": profile["jpeg_quality"]},
+    }
@@ -0,0 +1,287 @@
+from typing import Callable, Dict, Iterator, List, Union
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import pathlib
+import re
+import shutil
+import tempfile
+from .artifacts import _safe_part
+from .chart_cache import CHART_STYLE_VERSION, canonical_value
+
+# artifacts of every report are kept under <root>/<user_id>/<video_id> (reduced to safe names, see
+# report_artifacts), so that a re-score of the same video can reuse them. point it to a shared
+# volume to reuse them across containers
+REPORT_ARTIFACTS_DIR = os.environ.get("REPORT_ARTIFACTS_DIR", "/tmp/report_artifacts")
+
+
+def fingerprint(*values) -> str:
+    """
+    Digests the inputs of a node, numpy arrays, pandas series and paths included
+
+    Args:
+        *values: the inputs
+
+    Returns:
+        str: hex digest of the inputs
+    """
+    canonical = json.dumps(
+        [CHART_STYLE_VERSION, *values], sort_keys=True, default=canonical_value
+    )
+    return hashlib.sha256(canonical.encode("utf8")).hexdigest()
+
+
+def resource_fingerprint(html: str, base_url: str) -> str:
+    """
+    Digests the content of the local files (charts, images and stylesheets) a fragment of html
+    references, so that a fragment whose charts were redrawn is laid out again even though its
+    html did not change
+
+    Args:
+        param1(str): the html fragment
+        param2(str): base url used to resolve the relative urls of the html
+
+    Returns:
+        str: hex digest of the referenced files
+    """
+    digest = hashlib.sha256()
+    path_base = pathlib.Path(base_url)
+    path_base = path_base if path_base.is_dir() else path_base.parent
+    for match in re.finditer(
+        r"""(?:src|href)=["']([^"']+)["']|url\(["']?([^"')]+)["']?\)""", html
+    ):
+        path_resource = path_base / (match.group(1) or match.group(2)).replace("file://", "")
+        if path_resource.is_file():
+            digest.update(str(path_resource).encode("utf8"))
+            digest.update(path_resource.read_bytes())
+    return digest.hexdigest()
+
+
+def _encode(value):
+    if isinstance(value, pathlib.PurePath):
+        return {"__path__": str(value)}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if list(value) == ["__path__"]:
+            return pathlib.Path(value["__path__"])
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _list_paths(value) -> List[pathlib.Path]:
+    if isinstance(value, pathlib.PurePath):
+        return [pathlib.Path(value)]
+    if isinstance(value, dict):
+        return [path for item in value.values() for path in _list_paths(item)]
+    if isinstance(value, (list, tuple)):
+        return [path for item in value for path in _list_paths(item)]
+    return []
+
+
+class ReportGraph:
+    """
+    Incremental build graph of one report. Source nodes (the parsed sections of the payload, the
+    html fragments of the pages) are only fingerprinted; the other nodes (charts, laid out pages)
+    are identified by the fingerprint of their arguments and of the nodes they depend on, and their
+    result and files are persisted with the report, so that a re-score only executes the nodes
+    whose inputs changed. A render must hold the graph on its own, see open_report_graph
+    """
+
+    def __init__(
+        self,
+        user_id: str,
+        video_id: str,
+        root: Union[str, pathlib.Path] = REPORT_ARTIFACTS_DIR,
+    ) -> None:
+        # the ids come from the payload, they must not lead out of the root
+        self.directory = pathlib.Path(root) / _safe_part(str(user_id)) / _safe_part(str(video_id))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path_manifest = self.directory / "manifest.json"
+        try:
+            self.manifest = json.loads(self.path_manifest.read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            self.manifest = {}
+        self.fingerprints = {}
+        self.executed, self.reused = [], []
+
+    def node_directory(self, name: str) -> pathlib.Path:
+        """
+        Directory where the files of a node are persisted, a node may write its files there directly
+
+        Args:
+            param(str): name of the node
+
+        Returns:
+            pathlib.Path: the directory of the node
+        """
+        return self.directory / name
+
+    def source(self, name: str, *values) -> str:
+        """
+        Adds a source node, identified by the fingerprint of its values
+
+        Args:
+            param1(str): name of the node, unique within the report
+            *values: the content of the node
+
+        Returns:
+            str: the fingerprint of the node
+        """
+        self.fingerprints[name] = fingerprint(name, *values)
+        return self.fingerprints[name]
+
+    def run(self, name: str, dependencies: List[str], function: Callable, *args, **kwargs):
+        """
+        Returns the result of a node, executing it only when its arguments or the nodes it depends
+        on changed since the last report, or when one of its files is gone. The files the result
+        references are copied into the directory of the node and the result references them there,
+        a node may also write its files in that directory directly
+
+        Args:
+            param1(str): name of the node, unique within the report
+            param2(List[str]): names of the nodes it depends on, added before it
+            param3(Callable): executes the node, called with the remaining arguments
+
+        Returns:
+            the result of the node
+        """
+        key = fingerprint(
+            name,
+            f"{function.__module__}.{function.__qualname__}",
+            [self.fingerprints[dependency] for dependency in dependencies],
+            args,
+            kwargs,
+        )
+        self.fingerprints[name] = key
+
+        entry = self.manifest.get(name)
+        if entry is not None and entry["fingerprint"] == key:
+            result = _decode(entry["result"])
+            list_paths = [
+                path for path in _list_paths(result) if self.directory in path.parents
+            ]
+            if all(path.is_file() for path in list_paths):
+                self.reused.append(name)
+                return result
+
+        path_node = self.node_directory(name)
+        path_node.mkdir(parents=True, exist_ok=True)
+        result = function(*args, **kwargs)
+        result = self._persist(result, path_node)
+        self.manifest[name] = {"fingerprint": key, "result": _encode(result)}
+        self.executed.append(name)
+        return result
+
+    def _persist(self, value, path_node: pathlib.Path):
+        if isinstance(value, pathlib.PurePath):
+            path_value = pathlib.Path(value)
+            if not path_value.is_file() or path_value.parent == path_node:
+                return value
+            path_persisted = path_node / path_value.name
+            shutil.copyfile(path_value, path_persisted)
+            return path_persisted
+        if isinstance(value, dict):
+            return {key: self._persist(item, path_node) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return type(value)(self._persist(item, path_node) for item in value)
+        return value
+
+    def save(self) -> Dict[str, List[str]]:
+        """
+        Writes the manifest of the report and drops the nodes that this report no longer has
+
+        Returns:
+            Dict[str, List[str]]: the names of the executed and of the reused nodes
+        """
+        for name in list(self.manifest):
+            if name not in self.executed and name not in self.reused:
+                del self.manifest[name]
+                shutil.rmtree(self.node_directory(name), ignore_errors=True)
+
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf8",
+            dir=self.directory,
+            prefix="manifest.json.",
+            suffix=".partial",
+            delete=False,
+        ) as file_partial:
+            file_partial.write(json.dumps(self.manifest, default=canonical_value))
+        os.replace(file_partial.name, self.path_manifest)
+
+        summary = {"executed": self.executed, "reused": self.reused}
+        print("report graph", self.directory, {key: len(value) for key, value in summary.items()})
+        return summary
+
+
+@contextlib.contextmanager
+def open_report_graph(
+    user_id: str, video_id: str, root: Union[str, pathlib.Path] = REPORT_ARTIFACTS_DIR
+) -> Iterator[Union[ReportGraph, None]]:
+    """
+    Holds the graph of a report for the whole of a render, with an exclusive lock on its directory
+    (across the threads and processes of the node, and the nodes sharing the volume when it
+    supports locks). Two renders of the same report at once (a redelivered message, a duplicate
+    request) would copy files over the ones the other is laying out and drop the nodes its manifest
+    references: the render that finds the graph held goes without it and renders in full
+
+    Args:
+        param1(str): the user id of the report
+        param2(str): the video id of the report
+        param3(Union[str, pathlib.Path]): root of the graphs of the reports
+
+    Yields:
+        Union[ReportGraph, None]: the graph, None when another render holds it
+    """
+    path_directory = pathlib.Path(root) / _safe_part(str(user_id)) / _safe_part(str(video_id))
+    path_directory.mkdir(parents=True, exist_ok=True)
+    with open(path_directory / "graph.lock", "a") as file_lock:
+        try:
+            fcntl.flock(file_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("report graph", path_directory, "held by another render, rendering in full")
+            locked = False
+        else:
+            locked = True
+        try:
+            yield ReportGraph(user_id, video_id, root) if locked else None
+        finally:
+            if locked:
+                fcntl.flock(file_lock, fcntl.LOCK_UN)
+
+
+def run_node(
+    graph: Union[ReportGraph, None],
+    name: str,
+    dependencies: List[str],
+    function: Callable,
+    *args,
+    **kwargs,
+):
+    """
+    Runs a node through the graph of the report, or simply executes it when the report is not
+    built incrementally
+
+    Args:
+        param1(ReportGraph): the graph of the report, None to always execute the node
+        param2(str): name of the node
+        param3(List[str]): names of the nodes it depends on
+        param4(Callable): executes the node, called with the remaining arguments
+
+    Returns:
+        the result of the node
+    """
+    if graph is None:
+        return function(*args, **kwargs)
+    return graph.run(name, dependencies, function, *args, **kwargs)
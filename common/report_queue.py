@@ -0,0 +1,453 @@
+from typing import Callable, Dict, List, Union
+import collections
+import concurrent.futures
+import json
+import os
+import pathlib
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+from .worker_pool import *
+
+# reports generated at once by a consumer, and messages received ahead of a free worker. the
+# messages waiting in the prefetch buffer are the ones fair scheduling chooses from
+CONSUMER_CONCURRENCY = int(os.environ.get("CONSUMER_CONCURRENCY", os.cpu_count()))
+CONSUMER_PREFETCH = int(os.environ.get("CONSUMER_PREFETCH", 2 * CONSUMER_CONCURRENCY))
+
+# seconds a received message stays hidden from the other consumers. the messages a consumer holds
+# are hidden again before it runs out, for as long as their report takes
+CONSUMER_VISIBILITY_TIMEOUT = int(os.environ.get("CONSUMER_VISIBILITY_TIMEOUT", 120))
+
+# seconds a report may take before its worker is killed (and the message retried), and reports a
+# worker generates before it is replaced
+CONSUMER_REPORT_TIMEOUT = float(os.environ.get("CONSUMER_REPORT_TIMEOUT", 600))
+CONSUMER_MAX_REPORTS_PER_WORKER = int(os.environ.get("CONSUMER_MAX_REPORTS_PER_WORKER", 200))
+
+# seconds before a failed report is retried, times the number of times it was received
+CONSUMER_RETRY_DELAY = int(os.environ.get("CONSUMER_RETRY_DELAY", 30))
+
+# queue the messages that are not report requests are moved to, they are only deleted without one
+CONSUMER_DEAD_LETTER_QUEUE_URL = os.environ.get("CONSUMER_DEAD_LETTER_QUEUE_URL")
+
+# what a queued body that is not a report request raises when it is read
+malformed_message_errors = (ValueError, KeyError, IndexError, TypeError, AttributeError)
+
+# sqs returns at most 10 messages per receive, and waits at most 20 seconds for one
+SQS_MAX_MESSAGES = 10
+SQS_WAIT_SECONDS = 20
+
+
+class QueueMessage:
+    """
+    A report request received from a queue, with what is needed to hide it longer, delete it or
+    release it back to the queue
+    """
+
+    def __init__(self, message_id: str, receipt: str, body: Dict, receive_count: int = 1) -> None:
+        self.message_id, self.receipt, self.body = message_id, receipt, body
+        self.receive_count = receive_count
+        self.enterprise_id = str((body.get("video_data") or {}).get("enterprise_id") or "")
+        # time (monotonic) the message becomes visible to the other consumers again
+        self.deadline = 0.0
+
+
+def _handler_message(body: Union[str, Dict]) -> Dict:
+    """
+    Message of the handler from a queued body: an SNS notification delivered to the queue (raw or
+    not), an SNS event, or the message itself
+    """
+    body = json.loads(body) if isinstance(body, str) else body
+    if body.get("Type") == "Notification" and "Message" in body:
+        body = body["Message"]
+    elif "Records" in body:
+        body = body["Records"][0]["Sns"]["Message"]
+    return json.loads(body) if isinstance(body, str) else body
+
+
+class SqsQueue:
+    """
+    Report requests queued in sqs. A message whose body is not a report request would fail every
+    consumer that receives it, it is moved to the dead-letter queue (or deleted without one) and the
+    rest of its batch is processed
+
+    Args:
+        param1: the sqs client
+        param2(str): url of the queue
+        param3(str): url of the dead-letter queue, None to delete the malformed messages
+    """
+
+    def __init__(
+        self, sqs_client, queue_url: str, dead_letter_url: Union[str, None] = None
+    ) -> None:
+        self.sqs_client, self.queue_url = sqs_client, queue_url
+        self.dead_letter_url = dead_letter_url
+
+    def receive(self, max_messages: int, visibility_timeout: int, wait: bool) -> List[QueueMessage]:
+        response = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_messages, SQS_MAX_MESSAGES),
+            VisibilityTimeout=visibility_timeout,
+            WaitTimeSeconds=SQS_WAIT_SECONDS if wait else 0,
+            AttributeNames=["ApproximateReceiveCount"],
+        )
+        list_messages = []
+        for message in response.get("Messages", []):
+            try:
+                list_messages.append(
+                    QueueMessage(
+                        message["MessageId"],
+                        message["ReceiptHandle"],
+                        _handler_message(message["Body"]),
+                        int(message.get("Attributes", {}).get("ApproximateReceiveCount", 1)),
+                    )
+                )
+            except malformed_message_errors as error:
+                self._reject(message, error)
+        return list_messages
+
+    def _reject(self, message: Dict, error: Exception) -> None:
+        print(f"malformed message {message.get('MessageId')}: {type(error).__name__}: {error}")
+        if self.dead_letter_url:
+            self.sqs_client.send_message(
+                QueueUrl=self.dead_letter_url, MessageBody=message.get("Body", "")
+            )
+        self.sqs_client.delete_message(
+            QueueUrl=self.queue_url, ReceiptHandle=message["ReceiptHandle"]
+        )
+
+    def extend(self, message: QueueMessage, visibility_timeout: int) -> None:
+        self.sqs_client.change_message_visibility(
+            QueueUrl=self.queue_url,
+            ReceiptHandle=message.receipt,
+            VisibilityTimeout=visibility_timeout,
+        )
+
+    def release(self, message: QueueMessage, delay: int = 0) -> None:
+        self.extend(message, delay)
+
+    def delete(self, message: QueueMessage) -> None:
+        self.sqs_client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=message.receipt)
+
+
+class SqliteQueue:
+    """
+    Report requests queued in a sqlite file, with the visibility semantics of sqs, to run and
+    benchmark consumers without aws. Several consumer processes can share the file
+
+    Args:
+        param(Union[str, pathlib.Path]): path of the database, created if needed
+    """
+
+    def __init__(self, path: Union[str, pathlib.Path]) -> None:
+        self.connection = sqlite3.connect(
+            str(path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    body TEXT NOT NULL,
+                    receipt TEXT,
+                    visible_at REAL NOT NULL,
+                    receive_count INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS messages_visible_at ON messages (visible_at)"
+            )
+
+    def send(self, body: Dict) -> int:
+        """
+        Queues a report request
+
+        Args:
+            param(Dict): the message of the handler
+
+        Returns:
+            int: id of the message
+        """
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT INTO messages (body, visible_at) VALUES (?, ?)",
+                (json.dumps(body), time.time()),
+            )
+            return cursor.lastrowid
+
+    def receive(self, max_messages: int, visibility_timeout: int, wait: bool) -> List[QueueMessage]:
+        now = time.time()
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.connection.execute(
+                    "SELECT id, body, receive_count FROM messages WHERE visible_at <= ? "
+                    "ORDER BY id LIMIT ?",
+                    (now, max_messages),
+                ).fetchall()
+                list_messages = []
+                for message_id, body, receive_count in rows:
+                    try:
+                        message = QueueMessage(
+                            message_id, uuid.uuid4().hex, _handler_message(body), receive_count + 1
+                        )
+                    except malformed_message_errors as error:
+                        # there is no dead-letter queue, the message is dropped
+                        print(f"malformed message {message_id}: {type(error).__name__}: {error}")
+                        self.connection.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+                        continue
+                    self.connection.execute(
+                        "UPDATE messages SET receipt = ?, visible_at = ?, "
+                        "receive_count = receive_count + 1 WHERE id = ?",
+                        (message.receipt, now + visibility_timeout, message_id),
+                    )
+                    list_messages.append(message)
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+        # there is no long polling, an empty queue is polled again after a second
+        if not list_messages and wait:
+            time.sleep(1)
+        return list_messages
+
+    def extend(self, message: QueueMessage, visibility_timeout: int) -> None:
+        with self.lock:
+            self.connection.execute(
+                "UPDATE messages SET visible_at = ? WHERE id = ? AND receipt = ?",
+                (time.time() + visibility_timeout, message.message_id, message.receipt),
+            )
+
+    def release(self, message: QueueMessage, delay: int = 0) -> None:
+        self.extend(message, delay)
+
+    def delete(self, message: QueueMessage) -> None:
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM messages WHERE id = ? AND receipt = ?",
+                (message.message_id, message.receipt),
+            )
+
+    def count(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+
+class FairShareBuffer:
+    """
+    Messages received and waiting for a worker, by enterprise_id. The next message is taken from
+    the enterprise with the fewest reports running, the one served least recently among equals,
+    so that a bulk customer filling the queue only gets the workers the others leave free
+    """
+
+    def __init__(self) -> None:
+        self.messages = collections.OrderedDict()
+        self.running = collections.Counter()
+        self.last_served = {}
+        self.served = 0
+
+    def __len__(self) -> int:
+        return sum(len(messages) for messages in self.messages.values())
+
+    def __iter__(self):
+        return (message for messages in self.messages.values() for message in messages)
+
+    def add(self, message: QueueMessage) -> None:
+        self.messages.setdefault(message.enterprise_id, collections.deque()).append(message)
+
+    def pop(self) -> QueueMessage:
+        enterprise_id = min(
+            self.messages,
+            key=lambda key: (self.running[key], self.last_served.get(key, -1)),
+        )
+        messages = self.messages[enterprise_id]
+        message = messages.popleft()
+        if not messages:
+            del self.messages[enterprise_id]
+        self.served += 1
+        self.last_served[enterprise_id] = self.served
+        self.running[enterprise_id] += 1
+        return message
+
+    def done(self, message: QueueMessage) -> None:
+        self.running[message.enterprise_id] -= 1
+        if not self.running[message.enterprise_id]:
+            del self.running[message.enterprise_id]
+
+
+class QueueConsumer:
+    """
+    Generates the reports requested on a queue with a pool of warm worker processes. Messages are
+    received ahead of free workers (prefetch) and scheduled fairly across enterprise_id, the
+    visibility of every message held is extended while it waits and while its report runs, a
+    message is deleted once its report is done and released for a delayed retry when it fails.
+    A report only starts once its memory fits under the ceiling of the admission controller, so
+    fewer than concurrency may run at once on a small node
+
+    Args:
+        param1: the queue, a SqsQueue or a SqliteQueue
+        param2(Callable): generates the report of a message in a worker process
+        param3(int): number of reports generated at once
+        param4(int): number of messages received ahead of a free worker
+        param5(int): seconds a message held stays hidden from the other consumers
+        param6(Callable): called without arguments in every worker when it starts
+        param7(AdmissionController): admits the reports by their memory, a controller with the
+        default ceiling when None
+        param8(Callable[[int], None]): called with the pid of every worker once it has exited
+    """
+
+    def __init__(
+        self,
+        report_queue,
+        process: Callable[[Dict], object],
+        concurrency: int = CONSUMER_CONCURRENCY,
+        prefetch: int = CONSUMER_PREFETCH,
+        visibility_timeout: int = CONSUMER_VISIBILITY_TIMEOUT,
+        initializer: Union[Callable, None] = None,
+        admission: Union[AdmissionController, None] = None,
+        finalizer: Union[Callable[[int], None], None] = None,
+    ) -> None:
+        self.report_queue = report_queue
+        self.concurrency, self.prefetch = concurrency, prefetch
+        self.visibility_timeout = visibility_timeout
+        self.pool = WarmWorkerPool(
+            process,
+            concurrency,
+            concurrency,
+            timeout=CONSUMER_REPORT_TIMEOUT,
+            max_calls=CONSUMER_MAX_REPORTS_PER_WORKER,
+            initializer=initializer,
+            admission=admission or AdmissionController(),
+            finalizer=finalizer,
+        )
+        self.buffer = FairShareBuffer()
+        self.running: Dict[concurrent.futures.Future, QueueMessage] = {}
+        self.held_lock = threading.Lock()
+        self.stopping = threading.Event()
+        # set once no message is held any more, the messages held stay hidden until then
+        self.heartbeat_stopped = threading.Event()
+        self.stats = collections.Counter()
+        self.stats_by_enterprise = collections.defaultdict(collections.Counter)
+
+    def _held(self) -> List[QueueMessage]:
+        with self.held_lock:
+            return list(self.buffer) + list(self.running.values())
+
+    def _keep_hidden(self) -> None:
+        """
+        Hides every message held for another visibility timeout before the current one runs out
+        """
+        while not self.heartbeat_stopped.wait(self.visibility_timeout / 4):
+            now = time.monotonic()
+            for message in self._held():
+                if message.deadline - now < self.visibility_timeout / 2:
+                    try:
+                        self.report_queue.extend(message, self.visibility_timeout)
+                        message.deadline = now + self.visibility_timeout
+                    except Exception as error:
+                        print(f"could not extend message {message.message_id}: {error}")
+
+    def _receive(self) -> None:
+        missing = self.concurrency + self.prefetch - len(self.running) - len(self.buffer)
+        if missing <= 0:
+            return
+        # long polling only when there is nothing else to do
+        wait = not self.running and not len(self.buffer)
+        list_messages = self.report_queue.receive(missing, self.visibility_timeout, wait)
+        deadline = time.monotonic() + self.visibility_timeout
+        with self.held_lock:
+            for message in list_messages:
+                message.deadline = deadline
+                self.buffer.add(message)
+
+    def _dispatch(self) -> None:
+        with self.held_lock:
+            while len(self.running) < self.concurrency and len(self.buffer):
+                message = self.buffer.pop()
+                self.running[self.pool.submit(message.body)] = message
+
+    def _complete(self, future: concurrent.futures.Future) -> None:
+        with self.held_lock:
+            message = self.running.pop(future)
+            self.buffer.done(message)
+        counter = self.stats_by_enterprise[message.enterprise_id]
+        try:
+            _, seconds = future.result()
+            self.report_queue.delete(message)
+            self.stats["completed"] += 1
+            counter["completed"] += 1
+            print(f"report of message {message.message_id} done in {seconds:.3f}s")
+        except Exception as error:
+            delay = CONSUMER_RETRY_DELAY * message.receive_count
+            self.report_queue.release(message, delay)
+            self.stats["failed"] += 1
+            counter["failed"] += 1
+            print(f"report of message {message.message_id} failed, retried in {delay}s: {error}")
+
+    def stop(self, *_) -> None:
+        """
+        Stops receiving messages, the reports running are finished first
+        """
+        self.stopping.set()
+
+    def run(self, max_messages: int = 0) -> Dict:
+        """
+        Consumes the queue until stop is called (on SIGTERM or SIGINT when run from the main
+        thread), or once max_messages reports are done or the queue is empty when max_messages is
+        given. The messages still buffered are released back to the queue
+
+        Args:
+            param(int): number of reports after which the consumer stops, 0 for no limit
+
+        Returns:
+            Dict: the number of reports completed and failed, overall and by enterprise_id
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        heartbeat = threading.Thread(target=self._keep_hidden, daemon=True)
+        heartbeat.start()
+        start = time.perf_counter()
+        try:
+            while not self.stopping.is_set():
+                self._receive()
+                self._dispatch()
+                if max_messages and (
+                    self.stats["completed"] + self.stats["failed"] >= max_messages
+                    or not self.running
+                ):
+                    break
+                if self.running:
+                    done, _ = concurrent.futures.wait(
+                        list(self.running),
+                        timeout=1,
+                        return_when=concurrent.futures.FIRST_COMPLETED,
+                    )
+                    for future in done:
+                        self._complete(future)
+        finally:
+            self.stopping.set()
+            # the reports running are finished, and their messages deleted or released, before the
+            # heartbeat stops: a message that became visible meanwhile would be generated twice
+            for future in concurrent.futures.as_completed(list(self.running)):
+                self._complete(future)
+            for message in self._held():
+                self.report_queue.release(message)
+            self.heartbeat_stopped.set()
+            self.pool.close()
+
+        seconds = time.perf_counter() - start
+        summary = {
+            **self.stats,
+            "seconds": round(seconds, 3),
+            "reports_per_minute": round(60 * self.stats["completed"] / seconds, 2),
+            "by_enterprise_id": {
+                key: dict(value) for key, value in self.stats_by_enterprise.items()
+            },
+        }
+        print("consumer", summary)
+        return summary
@@ -0,0 +1,98 @@
+from typing import Dict, List, Union
+import hashlib
+import pathlib
+import threading
+import jinja2
+import weasyprint
+from .assets import *
+
+# laid out static page groups of every template version seen by this process. the documents are
+# kept with their pages because the pages reference the fonts of the document that laid them out
+static_documents = {}
+static_documents_lock = threading.Lock()
+
+
+def template_version(
+    template: jinja2.Template,
+    list_resources: List[Union[str, pathlib.Path]],
+    context: Union[Dict[str, str], None] = None,
+) -> str:
+    """
+    Identifies a version of a template by the content of its source and of the stylesheets and
+    images its static pages use, and by the variables they are rendered with, so that editing any
+    of them lays the static pages out again
+
+    Args:
+        param1(jinja2.Template): the template
+        param2(List[Union[str, pathlib.Path]]): the files the static pages depend on
+        param3(Dict[str, str]): the variables the static pages are rendered with
+
+    Returns:
+        str: hex digest of the template version
+    """
+    digest = hashlib.sha256(pathlib.Path(template.filename).read_bytes())
+    for path_resource in list_resources:
+        digest.update(pathlib.Path(path_resource).read_bytes())
+    digest.update(repr(sorted((context or {}).items())).encode())
+    return digest.hexdigest()
+
+
+def get_static_pages(
+    template: jinja2.Template,
+    list_resources: List[Union[str, pathlib.Path]],
+    page_offset: int,
+    context: Union[Dict[str, str], None] = None,
+) -> List[weasyprint.Page]:
+    """
+    Lays out the static page group of a template once per template version. The template is
+    rendered with page_group set to "static" and must then produce page_offset placeholder pages
+    followed by its static pages, so that the page counters of the static pages are the ones they
+    have in the final report
+
+    Args:
+        param1(jinja2.Template): the template
+        param2(List[Union[str, pathlib.Path]]): the files the static pages depend on
+        param3(int): number of pages that come before the static page group
+        param4(Dict[str, str]): other variables the static pages are rendered with, the directory
+        of their images for instance
+
+    Returns:
+        List[weasyprint.Page]: the laid out static pages
+    """
+    version = template_version(template, list_resources, context)
+    with static_documents_lock:
+        if version not in static_documents:
+            rendered_template = template.render({**(context or {}), "page_group": "static"})
+            static_documents[version] = weasyprint.HTML(
+                string=rendered_template,
+                base_url=str(pathlib.Path(template.filename).parent),
+                url_fetcher=asset_url_fetcher,
+            ).render()
+        return static_documents[version].pages[page_offset:]
+
+
+def merge_static_pages(
+    document: weasyprint.Document,
+    list_static_pages: List[weasyprint.Page],
+    page_offset: int,
+) -> weasyprint.Document:
+    """
+    Replaces the placeholder pages of a document laid out with page_group set to "dynamic" by the
+    static pages. The template must then produce one empty placeholder page per static page, after
+    page_offset pages, so that the pages that follow are numbered as in the full report
+
+    Args:
+        param1(weasyprint.Document): the laid out dynamic pages
+        param2(List[weasyprint.Page]): the static pages returned by get_static_pages
+        param3(int): number of pages that come before the static page group
+
+    Returns:
+        weasyprint.Document: the whole report, internal links between both page groups are
+        resolved when the document is written
+    """
+    pages = document.pages
+    return document.copy(
+        pages[:page_offset]
+        + list_static_pages
+        + pages[page_offset + len(list_static_pages) :]
+    )
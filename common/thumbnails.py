@@ -0,0 +1,133 @@
+from typing import List, Union
+import io
+import os
+import pathlib
+import weasyprint
+from PIL import Image
+from .deadline import *
+
+# preview of every report for the dashboard, painted from the laid out pages that write the pdf:
+# the first page, or a contact sheet of every page. an empty THUMBNAIL_MODE disables it
+thumbnail_modes = ["first_page", "contact_sheet"]
+THUMBNAIL_MODE = os.environ.get("THUMBNAIL_MODE", "first_page") or None
+
+# width (in pixels) of the preview of a page, and the number of pages per row of a contact sheet
+THUMBNAIL_WIDTH = int(os.environ.get("THUMBNAIL_WIDTH", 320))
+CONTACT_SHEET_COLUMNS = 4
+CONTACT_SHEET_GAP = 8
+
+
+def thumbnail_path(path_pdf: Union[str, pathlib.Path]) -> pathlib.Path:
+    """
+    Path of the preview of a report, next to its pdf
+
+    Args:
+        param(Union[str, pathlib.Path]): path of the pdf
+
+    Returns:
+        pathlib.Path: path of the png
+    """
+    return pathlib.Path(path_pdf).with_suffix(".png")
+
+
+def page_thumbnails(
+    document: weasyprint.Document, thumbnail_mode: str, page_offset: int = 0
+) -> List[bytes]:
+    """
+    Paints the pages of a laid out document that the preview of a report needs
+
+    Args:
+        param1(weasyprint.Document): the laid out pages, a chunk of the report or all of it
+        param2(str): first_page or contact_sheet
+        param3(int): index of the first page of the document within the report
+
+    Returns:
+        List[bytes]: the png of every page needed, none when the document has no page needed
+    """
+    if thumbnail_mode == "first_page":
+        list_pages = document.pages[:1] if page_offset == 0 else []
+    else:
+        list_pages = document.pages
+
+    list_pngs = []
+    for page in list_pages:
+        png, _, _ = document.copy([page]).write_png(
+            resolution=THUMBNAIL_WIDTH * 96 / page.width
+        )
+        list_pngs.append(png)
+    return list_pngs
+
+
+def save_thumbnail(
+    list_pngs: List[bytes],
+    path_pdf: Union[str, pathlib.Path],
+    thumbnail_mode: Union[str, None],
+) -> Union[pathlib.Path, None]:
+    """
+    Writes the preview of a report next to its pdf, from the pngs painted by page_thumbnails. The
+    preview of a previous report with the same name is removed when there is none for this report,
+    so that it is not uploaded in its place
+
+    Args:
+        param1(List[bytes]): the png of every page needed, in page order
+        param2(Union[str, pathlib.Path]): path of the pdf
+        param3(Union[str, None]): first_page, contact_sheet or None
+
+    Returns:
+        Union[pathlib.Path, None]: path of the png, None when the report has no preview
+    """
+    path_thumbnail = thumbnail_path(path_pdf)
+    if thumbnail_mode is None or not list_pngs:
+        path_thumbnail.unlink(missing_ok=True)
+        return None
+
+    if thumbnail_mode == "first_page":
+        path_thumbnail.write_bytes(list_pngs[0])
+        return path_thumbnail
+
+    list_images = [Image.open(io.BytesIO(png)) for png in list_pngs]
+    columns = min(CONTACT_SHEET_COLUMNS, len(list_images))
+    rows = [list_images[index : index + columns] for index in range(0, len(list_images), columns)]
+    list_heights = [max(image.height for image in row) for row in rows]
+    sheet = Image.new(
+        "RGB",
+        (
+            columns * THUMBNAIL_WIDTH + (columns + 1) * CONTACT_SHEET_GAP,
+            sum(list_heights) + (len(rows) + 1) * CONTACT_SHEET_GAP,
+        ),
+        "#E0E0E0",
+    )
+    y = CONTACT_SHEET_GAP
+    for row, height in zip(rows, list_heights):
+        for column, image in enumerate(row):
+            x = CONTACT_SHEET_GAP + column * (THUMBNAIL_WIDTH + CONTACT_SHEET_GAP)
+            # pages without a background are transparent
+            page = Image.new("RGBA", image.size, "white")
+            page.alpha_composite(image.convert("RGBA"))
+            sheet.paste(page.convert("RGB"), (x, y))
+        y += height + CONTACT_SHEET_GAP
+    sheet.save(path_thumbnail, format="PNG", optimize=True)
+    return path_thumbnail
+
+
+def write_thumbnail(
+    document: weasyprint.Document,
+    path_pdf: Union[str, pathlib.Path],
+    thumbnail_mode: Union[str, None],
+) -> Union[pathlib.Path, None]:
+    """
+    Writes the preview of a report from the document that wrote its pdf, the pages are painted
+    without being laid out again
+
+    Args:
+        param1(weasyprint.Document): the laid out report
+        param2(Union[str, pathlib.Path]): path of the pdf
+        param3(Union[str, None]): first_page, contact_sheet or None for no preview
+
+    Returns:
+        Union[pathlib.Path, None]: path of the png, None when the report has no preview
+    """
+    if not thumbnail_mode:
+        return save_thumbnail([], path_pdf, thumbnail_mode)
+    with render_stage("thumbnail"):
+        return save_thumbnail(page_thumbnails(document, thumbnail_mode), path_pdf, thumbnail_mode)
@@ -0,0 +1,229 @@
+from typing import Callable, List, Union
+import concurrent.futures
+import multiprocessing
+import queue
+import threading
+import time
+from .admission import *
+
+# fork, so that the workers start with everything the parent loaded before starting the pool
+# (modules, templates, fonts, static pages) and share it copy-on-write
+_fork_context = multiprocessing.get_context("fork")
+
+
+def _worker_loop(connection, function: Callable, initializer: Union[Callable, None]) -> None:
+    """
+    Runs in a worker process: calls the function with the arguments it receives until it receives
+    None, and sends back ("ok", result) or ("error", message) for every call
+    """
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            args = connection.recv()
+        except EOFError:
+            return
+        if args is None:
+            return
+        try:
+            connection.send(("ok", function(*args)))
+        except Exception as error:
+            connection.send(("error", f"{type(error).__name__}: {error}"))
+
+
+class _Worker:
+    def __init__(
+        self,
+        function: Callable,
+        initializer: Union[Callable, None],
+        finalizer: Union[Callable[[int], None], None] = None,
+    ) -> None:
+        self.connection, child_connection = _fork_context.Pipe()
+        self.process = _fork_context.Process(
+            target=_worker_loop, args=(child_connection, function, initializer), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.calls = 0
+        self.finalizer = finalizer
+
+    def stop(self, timeout: float = 5) -> None:
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+        if self.finalizer is not None:
+            finalizer, self.finalizer = self.finalizer, None
+            finalizer(self.process.pid)
+
+
+class WarmWorkerPool:
+    """
+    Pool of worker processes forked from a warmed-up parent, for a long-running service. Calls
+    wait in a bounded queue: when it is full, submit raises queue.Full so that the caller can turn
+    the request away instead of letting the queue (and the latency) grow. A call that runs longer
+    than its timeout gets its worker killed and replaced, and every worker is replaced after a
+    number of calls, so that a leak in one report does not accumulate for the life of the service.
+    With an admission controller, a call only goes to its worker once its memory fits, the other
+    workers wait meanwhile. The finalizer cleans up after every worker that exits, however it
+    exits, what the worker could not do itself when it was killed
+
+    Args:
+        param1(Callable): the function the workers call, its result must be picklable
+        param2(int): number of worker processes
+        param3(int): number of calls waiting for a worker before submit raises queue.Full
+        param4(float): seconds a call may run before its worker is killed, None for no limit
+        param5(int): calls a worker makes before it is replaced, 0 to keep it
+        param6(Callable): called without arguments in every worker when it starts
+        param7(AdmissionController): admits the calls by the memory of the report request they
+        are given as first argument, and learns from the peak_memory of their results
+        param8(Callable[[int], None]): called in this process with the pid of every worker once
+        it has exited
+    """
+
+    def __init__(
+        self,
+        function: Callable,
+        workers: int,
+        queue_size: int,
+        timeout: Union[float, None] = None,
+        max_calls: int = 0,
+        initializer: Union[Callable, None] = None,
+        admission: Union[AdmissionController, None] = None,
+        finalizer: Union[Callable[[int], None], None] = None,
+    ) -> None:
+        self.function, self.initializer, self.finalizer = function, initializer, finalizer
+        self.timeout, self.max_calls = timeout, max_calls
+        self.admission = admission
+        self._queue = queue.Queue(queue_size)
+        self.stats = {"completed": 0, "failed": 0, "timed_out": 0, "rejected": 0, "recycled": 0}
+        self._stats_lock = threading.Lock()
+        self._busy = 0
+        self._threads: List[threading.Thread] = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._serve, name=f"worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += delta
+
+    def _serve(self) -> None:
+        """
+        Feeds one worker process with calls from the queue, replacing it when it is killed, dies
+        or has made its number of calls. The process is forked before it is needed, so that
+        calls never wait for it
+        """
+        worker = _Worker(self.function, self.initializer, self.finalizer)
+        while True:
+            call = self._queue.get()
+            if call is None:
+                worker.stop()
+                return
+            future, args = call
+            if not future.set_running_or_notify_cancel():
+                continue
+            memory = 0
+            if self.admission is not None:
+                memory = self.admission.estimate(args[0])
+                self.admission.acquire(memory)
+            with self._stats_lock:
+                self._busy += 1
+            if not worker.process.is_alive():
+                worker.kill()
+                worker = _Worker(self.function, self.initializer, self.finalizer)
+            start = time.perf_counter()
+            try:
+                worker.connection.send(args)
+                if not worker.connection.poll(self.timeout):
+                    worker.kill()
+                    worker = _Worker(self.function, self.initializer, self.finalizer)
+                    self._count("timed_out")
+                    future.set_exception(
+                        TimeoutError(f"no result after {self.timeout} seconds, worker restarted")
+                    )
+                    continue
+                status, value = worker.connection.recv()
+            except (EOFError, BrokenPipeError, OSError):
+                # the worker died during the call, out of memory for instance
+                worker.kill()
+                exitcode = worker.process.exitcode
+                worker = _Worker(self.function, self.initializer, self.finalizer)
+                self._count("failed")
+                future.set_exception(RuntimeError(f"worker exited with code {exitcode}"))
+                continue
+            finally:
+                with self._stats_lock:
+                    self._busy -= 1
+                if self.admission is not None:
+                    self.admission.release(memory)
+
+            if status == "ok":
+                if self.admission is not None:
+                    self.admission.observe(args[0], value)
+                self._count("completed")
+                future.set_result((value, time.perf_counter() - start))
+            else:
+                self._count("failed")
+                future.set_exception(RuntimeError(value))
+            worker.calls += 1
+            if self.max_calls and worker.calls >= self.max_calls:
+                worker.stop()
+                worker = _Worker(self.function, self.initializer, self.finalizer)
+                self._count("recycled")
+
+    def submit(self, *args) -> concurrent.futures.Future:
+        """
+        Queues a call
+
+        Args:
+            *args: the arguments of the call, they must be picklable
+
+        Returns:
+            concurrent.futures.Future: the result of the call and the seconds it took in its worker
+
+        Raises:
+            queue.Full: when the queue is full
+        """
+        future = concurrent.futures.Future()
+        try:
+            self._queue.put_nowait((future, args))
+        except queue.Full:
+            self._count("rejected")
+            raise
+        return future
+
+    def status(self) -> dict:
+        """
+        Returns:
+            dict: the number of calls busy and queued, and how the calls so far ended
+        """
+        with self._stats_lock:
+            status = {
+                "workers": len(self._threads),
+                "busy": self._busy,
+                "queued": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                **self.stats,
+            }
+        if self.admission is not None:
+            status["admission"] = self.admission.status()
+        return status
+
+    def close(self) -> None:
+        """
+        Stops the workers once the calls already queued are done
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
@@ -0,0 +1,106 @@
+"""
+Generates the reports requested on a queue, on our own nodes instead of the SNS triggered lambda
+
+    python consumer.py sqs <queue_url> [--concurrency N] [--prefetch N] [--visibility-timeout S]
+                       [--dead-letter-url URL]
+    python consumer.py sqlite <file.db> [--concurrency N] [--no-upload] [--max-messages N]
+    python consumer.py enqueue <file.db> <directory|glob|file.jsonl>
+
+The queued messages are the messages of the handler, or the SNS notifications carrying them. The
+sqlite queue behaves like sqs (messages are hidden while they are processed and deleted once done)
+and lets the consumer run and be benchmarked without aws: enqueue fills it from the same inputs
+as batch.py, and --max-messages stops the consumer once the queue is drained
+"""
+import argparse
+import functools
+import gc
+import os
+import pathlib
+import shutil
+import index
+from batch import read_events
+from common.artifacts import *
+from common.deadline import *
+from common.report_queue import *
+
+
+def _worker_directory(pid: int) -> pathlib.Path:
+    return artifacts_directory() / f"consumer-worker-{pid}"
+
+
+def _start_worker() -> None:
+    """
+    Gives every worker its own artifacts directory, the file names of the reports are fixed
+    """
+    set_artifacts_directory(_worker_directory(os.getpid()))
+
+
+def _remove_worker(pid: int) -> None:
+    """
+    Removes the artifacts directory of a worker once it has exited
+    """
+    shutil.rmtree(_worker_directory(pid), ignore_errors=True)
+
+
+def _process(data, upload=True):
+    """
+    Generates the report of a message in a worker process, and uploads and emails it like the
+    handler does unless upload is False. The report is planned to be done before the worker is
+    killed at CONSUMER_REPORT_TIMEOUT
+    """
+    if not data.get("user_id"):
+        raise ValueError("no user id given")
+    with render_budget(RenderBudget(CONSUMER_REPORT_TIMEOUT)), report_artifacts(
+        str(data["user_id"]), str(data.get("video_id"))
+    ) as directory:
+        payload, generate_pdf = index._generate_report(data)
+        if upload:
+            index.deliver_report(payload, generate_pdf)
+            # the files of a delivered report are named after the candidate, they would pile up
+            shutil.rmtree(directory, ignore_errors=True)
+    # the peak memory of the report corrects the estimates of the admission controller
+    return {"pdf": str(generate_pdf), "peak_memory": payload["peak_memory"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates the reports requested on a queue")
+    parser.add_argument("queue", choices=["sqs", "sqlite", "enqueue"])
+    parser.add_argument("location", help="url of the sqs queue or path of the sqlite queue")
+    parser.add_argument("source", nargs="?", help="the requests to enqueue, see batch.py")
+    parser.add_argument("--concurrency", type=int, default=CONSUMER_CONCURRENCY)
+    parser.add_argument("--prefetch", type=int, default=None)
+    parser.add_argument("--visibility-timeout", type=int, default=CONSUMER_VISIBILITY_TIMEOUT)
+    parser.add_argument("--max-messages", type=int, default=0)
+    parser.add_argument("--no-upload", action="store_true")
+    parser.add_argument(
+        "--dead-letter-url",
+        default=CONSUMER_DEAD_LETTER_QUEUE_URL,
+        help="sqs queue the malformed messages are moved to, they are deleted without one",
+    )
+    args = parser.parse_args()
+
+    if args.queue == "enqueue":
+        report_queue = SqliteQueue(args.location)
+        count = sum(1 for data in read_events(args.source) if report_queue.send(data))
+        print(f"queued {count} messages, {report_queue.count()} in the queue")
+        raise SystemExit(0)
+
+    if args.queue == "sqs":
+        report_queue = SqsQueue(index.AwsConfig.sqs_client, args.location, args.dead_letter_url)
+    else:
+        report_queue = SqliteQueue(args.location)
+    # loaded once and shared copy-on-write by the workers, see service.py
+    index.warm_up()
+    gc.collect()
+    gc.freeze()
+    consumer = QueueConsumer(
+        report_queue,
+        functools.partial(_process, upload=not args.no_upload),
+        concurrency=args.concurrency,
+        prefetch=2 * args.concurrency if args.prefetch is None else args.prefetch,
+        visibility_timeout=args.visibility_timeout,
+        initializer=_start_worker,
+        finalizer=_remove_worker,
+    )
+    summary = consumer.run(args.max_messages)
+    raise SystemExit(1 if summary.get("failed") else 0)
@@ -1,14 +1,45 @@
 import sys
 import os
 import json
+import shutil
+import threading
+import time
+import asyncio
+import datetime as dt
 from talentinsights_assessment.scripts.talentinsights_pdf_report import *
 from leadership_assessment.scripts.leadership_pdf_report import *
+from common.bundle_export import *
+from common.admission import *
+from talentinsights_assessment.scripts import talentinsights_pdf_report
+from leadership_assessment.scripts import leadership_pdf_report
 
 pdf = {
     "leadership_assessment": leadership_report,
     "talentinsights_assessment": talentinsights_report,
 }
 
+# pdf backend of the report types that can also be written directly, without html layout
+report_backends = {
+    "talentinsights_assessment": os.environ.get("TALENTINSIGHTS_PDF_BACKEND", "html"),
+}
+
+# reports generate_reports renders at once. rendering holds the gil, so the uploads, emails and
+# downloads of the other reports are what it overlaps with, more than one only helps when the
+# rendering waits itself (on the parallel pdf workers for instance)
+RENDER_CONCURRENCY = int(os.environ.get("RENDER_CONCURRENCY", 1))
+
+
+def warm_up():
+    """
+    Prepares what every report of a warm container reuses (the resampled images and the laid out
+    static pages), so that long-running runners do it once before their first report
+
+    Returns:
+        None
+    """
+    leadership_pdf_report._save_background_pic()
+    talentinsights_pdf_report.get_report_static_pages()
+
 
 def _upload_to_s3(payload):
     local_file, bucket_name, blob_name = (
@@ -16,7 +47,19 @@ def _upload_to_s3(payload):
         payload["bucket_name"],
         payload["blob_name"],
     )
-    AwsConfig.s3_client.upload_file(local_file, bucket_name, blob_name)
+    # a report that gave something up to meet its deadline says what in its metadata, s3 only
+    # takes ascii and 2 KB of it
+    extra_args = (
+        {"Metadata": {"degraded": payload["degradations"][:1024]}}
+        if payload.get("degradations")
+        else None
+    )
+    AwsConfig.s3_client.upload_file(local_file, bucket_name, blob_name, ExtraArgs=extra_args)
+    # the preview of the report goes next to it, for the dashboard
+    if payload.get("thumbnail_file"):
+        AwsConfig.s3_client.upload_file(
+            payload["thumbnail_file"], bucket_name, payload["thumbnail_blob_name"]
+        )
 
 
 def _send_email_to_candidate(payload):
@@ -51,13 +94,8 @@ def after_pdf_generated(payload):
             print(task, data["function"](payload))
 
 
-def handler(event, context):
-    print("starting generate_pdf")
-    Message = event["Records"][0]["Sns"]["Message"]
-    data = Message if type(Message) == type({}) else json.loads(Message)
+def _generate_report(data):
     user_id = data.get("user_id")
-    if not user_id:
-        return "no user id given"
     video_id = data.get("video_id")
     video_data = data.get("video_data")
     reference_no = data.get("reference_no")
@@ -78,20 +116,224 @@ def handler(event, context):
         "Job Fitment": job_fitment,
     }
     assessment_type = payload.get("assessment_type")
-    generate_pdf = pdf[assessment_type](payload.copy())
+    quality_profile = data.get("quality_profile", DEFAULT_QUALITY_PROFILE)
+    report_options = {
+        "quality_profile": quality_profile,
+        "thumbnail": data.get("thumbnail", THUMBNAIL_MODE),
+    }
+    if assessment_type == "leadership_assessment":
+        # a re-score of the same video only redraws the charts and pages whose inputs changed. the
+        # graph is shared by the renders of the video, it is held by one render at a time and the
+        # others (identical requests of generate_reports, a redelivered message) render in full
+        # in their own directory, see open_report_graph
+        report_options["incremental"] = data.get(
+            "incremental", bool(os.environ.get("REPORT_ARTIFACTS_DIR"))
+        )
+        report_options["optional_charts"] = data.get("optional_charts", True)
+    if assessment_type in report_backends:
+        report_options["backend"] = data.get("pdf_backend", report_backends[assessment_type])
+    # the caller's deadline, if it set one, or none, in which case the stages are only measured
+    budget = current_budget() or RenderBudget(None)
+    report_options = budget.plan(assessment_type, report_options)
+    with render_budget(budget), track_report_memory(
+        f"{assessment_type} {user_id}/{video_id}"
+    ) as memory:
+        generate_pdf = pdf[assessment_type](payload.copy(), **report_options)
+    # what the report added to the process at its peak, the runners admit reports by it. None when
+    # other reports ran in the process meanwhile, the peak was not the report's alone
+    payload["peak_memory"] = (
+        None if memory["peak_rss"] is None else memory["peak_rss"] - memory["rss_before"]
+    )
+    if budget.degradations:
+        payload["degradations"] = budget.summary()
+    return payload, generate_pdf
+
 
+def deliver_report(payload, generate_pdf):
+    """
+    Uploads a generated report (and its preview) to the report bucket and emails it
+
+    Args:
+        param1(Dict): the payload of the report, returned by _generate_report
+        param2(pathlib.Path): path of the pdf
+
+    Returns:
+        Dict: the payload, with the files uploaded and their keys
+    """
+    user_id, video_id = payload["Candidate"]["user_id"], payload["Candidate"]["video_id"]
     payload["local_file"] = generate_pdf
     payload["bucket_name"] = leadership_assessment_pdf_bucket
     payload["blob_name"] = f"{user_id}/{video_id}.pdf"
+    path_thumbnail = thumbnail_path(generate_pdf)
+    if path_thumbnail.is_file():
+        payload["thumbnail_file"] = path_thumbnail
+        payload["thumbnail_blob_name"] = f"{user_id}/{video_id}.png"
+
+    with render_stage("upload"):
+        after_pdf_generated(payload)
+    return payload
 
-    after_pdf_generated(payload)
 
-    return f"pdf generated for user_id - {user_id} video_id - {video_id}   " + str(
+def handler(event, context):
+    print("starting generate_pdf")
+    Message = event["Records"][0]["Sns"]["Message"]
+    data = Message if type(Message) == type({}) else json.loads(Message)
+    user_id = data.get("user_id")
+    if not user_id:
+        return "no user id given"
+    video_id = data.get("video_id")
+    # the report is planned to be uploaded before the invocation times out, rather than being
+    # killed with nothing uploaded and retried from scratch
+    with render_budget(RenderBudget.from_context(context)):
+        payload, generate_pdf = _generate_report(data)
+        deliver_report(payload, generate_pdf)
+
+    response = f"pdf generated for user_id - {user_id} video_id - {video_id}   " + str(
         generate_pdf
     )
+    if payload.get("degradations"):
+        response += f"   degraded - {payload['degradations']}"
+    return response
+
+
+async def _generate_and_deliver(data, render_slots, deliver, admission):
+    result = {"user_id": data.get("user_id"), "video_id": data.get("video_id")}
+    start = time.perf_counter()
+    try:
+        if not data.get("user_id"):
+            raise ValueError("no user id given")
+        # the directory of the report stays its own until it is delivered and removed, the threads
+        # the report runs in get a copy of the context that points to it
+        with report_artifacts(str(data["user_id"]), str(data["video_id"])) as directory:
+            async with render_slots:
+                memory = admission.estimate(data)
+                await asyncio.to_thread(admission.acquire, memory)
+                try:
+                    payload, generate_pdf = await asyncio.to_thread(_generate_report, data)
+                finally:
+                    admission.release(memory)
+            # the peak of a report rendered alongside others is None and not learnt from
+            admission.observe(data, payload)
+            result["peak_memory"] = payload["peak_memory"]
+            result["render_seconds"] = round(time.perf_counter() - start, 3)
+            if payload.get("degradations"):
+                result["degradations"] = payload["degradations"]
+            if deliver:
+                await asyncio.to_thread(deliver_report, payload, generate_pdf)
+                await asyncio.to_thread(shutil.rmtree, directory, True)
+            else:
+                result["pdf"] = generate_pdf
+                result["directory"] = directory
+        result["ok"] = True
+    except Exception as error:
+        result["ok"] = False
+        result["error"] = f"{type(error).__name__}: {error}"
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+async def generate_reports_async(
+    list_data, render_concurrency=RENDER_CONCURRENCY, deliver=True, admission=None
+):
+    """
+    Same as generate_reports, from a running event loop
+    """
+    render_slots = asyncio.Semaphore(render_concurrency)
+    admission = admission or AdmissionController()
+    return await asyncio.gather(
+        *(_generate_and_deliver(data, render_slots, deliver, admission) for data in list_data)
+    )
+
+
+def generate_reports(
+    list_data, render_concurrency=RENDER_CONCURRENCY, deliver=True, admission=None
+):
+    """
+    Generates several reports in this process, overlapping the uploads and emails of the reports
+    already rendered with the rendering of the next ones. Every report is rendered in a thread with
+    its own artifacts directory (see report_artifacts, under the artifacts directory) and draws its
+    charts on figures of its own, with the style of its report type. Identical requests rendered at
+    once never share the incremental graph of their video either. At most render_concurrency
+    reports are rendered at once, fewer when their memory would not fit under the ceiling of the
+    admission controller
+
+    Args:
+        param1(Iterable[Dict]): the report requests (the messages of the handler)
+        param2(int): number of reports rendered at once
+        param3(bool): whether the reports are uploaded and emailed like the handler does, their
+        directory is removed once they are. Otherwise the pdf is left in its directory
+        param4(AdmissionController): admits the reports by their memory, a controller with the
+        default ceiling when None, and learns from the peaks the reports measured
+
+    Returns:
+        List[Dict]: the result of every request, in order: whether it succeeded (or its error), the
+        seconds it took, its peak memory, and the pdf and its directory when the report is not
+        delivered
+    """
+    return asyncio.run(generate_reports_async(list_data, render_concurrency, deliver, admission))
+
+
+# reports generated for a bundle are generated one at a time, while the others are fetched
+_bundle_generation_lock = threading.Lock()
+
+
+def _in_bundle(data, enterprise_id, date_from, date_to):
+    video_data = data.get("video_data", {})
+    if enterprise_id is not None and video_data.get("enterprise_id") != enterprise_id:
+        return False
+    if date_from is None and date_to is None:
+        return True
+    date = dt.datetime.strptime(video_data["date"], "%b %d, %Y").date()
+    return (date_from is None or date >= date_from) and (date_to is None or date <= date_to)
+
+
+def _bundle_fetcher(data, generate_missing):
+    blob_name = f"{data['user_id']}/{data['video_id']}.pdf"
+    fetch = s3_fetcher(AwsConfig.s3_client, leadership_assessment_pdf_bucket, blob_name)
+
+    def fetch_or_generate():
+        content = fetch()
+        if content is None and generate_missing:
+            with _bundle_generation_lock:
+                _, generate_pdf = _generate_report(data)
+            content = pathlib.Path(generate_pdf).read_bytes()
+        return content
+
+    return fetch_or_generate
+
+
+def export_report_bundle(
+    list_data, blob_name, enterprise_id=None, date_from=None, date_to=None, generate_missing=True
+):
+    """
+    Exports the reports of an enterprise and/or a date range as a zip archive in the report bucket,
+    streamed as a multipart upload. The reports are fetched from the bucket, the ones that were
+    never generated are generated unless generate_missing is False
+
+    Args:
+        param1(Iterable[Dict]): the report requests (the messages of the handler) to select from
+        param2(str): key of the archive
+        param3(str): only the reports of this enterprise_id, all of them when None
+        param4(datetime.date): only the reports of videos recorded on or after this date
+        param5(datetime.date): only the reports of videos recorded on or before this date
+        param6(bool): whether the reports missing from the bucket are generated
+
+    Returns:
+        Dict: the summary of the export, see export_bundle
+    """
+    entries = (
+        (f"{data['user_id']}/{data['video_id']}.pdf", _bundle_fetcher(data, generate_missing))
+        for data in list_data
+        if _in_bundle(data, enterprise_id, date_from, date_to)
+    )
+    return export_bundle(
+        entries, AwsConfig.s3_client, leadership_assessment_pdf_bucket, blob_name
+    )
 
 
-path_data = pathlib.Path(__file__).parent / "data" / "sample_video_data.json"
-with open(path_data, encoding="utf8") as file:
-    dict_data = json.load(file)
-print(handler(dict_data, ""))
+# renders the sample report, python batch.py runs any number of them
+if __name__ == "__main__":
+    path_data = pathlib.Path(__file__).parent / "data" / "sample_video_data.json"
+    with open(path_data, encoding="utf8") as file:
+        dict_data = json.load(file)
+    print(handler(dict_data, ""))
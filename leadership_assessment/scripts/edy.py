@@ -7,6 +7,7 @@ send_email_topic = "arn:aws:sns:us-east-1:380665605337:send_email"
 import boto3
 import datetime as dt
 import pandas as pd
+from common.artifacts import *
 
 date_today_string = dt.date.today().strftime("%Y-%m-%d")
 
@@ -22,6 +23,7 @@ class AwsConfigs:
         endpoint_url="https://q25wbt2lc.mediaconvert.us-east-1.amazonaws.com",
     )
     sns_client = aws_session.client("sns")
+    sqs_client = aws_session.client("sqs")
     ses_client = aws_session.client("ses")
 
 
@@ -134,7 +136,7 @@ def email_template(payload):
     return email_types[assessment_type]
 
 def get_skills_resources():
-    skills_csv = '/tmp/Leadership Assessment Report Content.csv'
+    skills_csv = artifact_path('Leadership Assessment Report Content.csv')
     AwsConfig.s3_client.download_file(edy_csvs_bucket, 'Leadership Assessment Report Content.csv', skills_csv)
     skills_csv_df = pd. read_csv(skills_csv)
     focus_areas = skills_csv_df["Focus Area"].unique()
@@ -1,4 +1,4 @@
-from typing import Dict, Union, List
+from typing import Dict, Union, List, Tuple
 from textwrap import wrap
 import pathlib
 from statistics import mean
@@ -11,71 +11,110 @@ matplotlib.use("Agg")
 from matplotlib import pyplot as plt
 import matplotlib.ticker as ticker
 import matplotlib.colors as mcolors
-from PIL import Image
+from matplotlib.collections import LineCollection
 from sklearn.preprocessing import MinMaxScaler
 from .edy import *
+from .timeseries import *
+from common.quality import *
+from common.encoding import *
+from common.figures import *
+from common.chart_cache import *
+from common.artifacts import *
 
 dict_focus_area, dict_skills_text, skills_csv_df = get_skills_resources()
 
+# width (in inches) that each chart occupies in the pilot.html template
+chart_placement_widths = {
+    "skill_bar_chart": PAGE_CONTENT_WIDTH,
+    "focus_area_spider_plot": 0.8 * PAGE_CONTENT_WIDTH,
+    "skill_gauge": 6 / 2.54,
+    "color_bar": PAGE_CONTENT_WIDTH,
+    "line_chart": PAGE_CONTENT_WIDTH,
+    "pauses_stacked_bar_chart": PAGE_CONTENT_WIDTH,
+}
+
+# rc parameters every chart of the report is drawn with, see chart_style
+leadership_chart_style = {
+    "font.family": "sans-serif",
+    "font.sans-serif": "Helvetica",
+    "axes.edgecolor": "#333F4B",
+    "axes.linewidth": 0.8,
+    "xtick.color": "#333F4B",
+}
+
+# codec used to encode each chart, palette png for flat colors and jpeg for gradients. charts saved
+# through save_chart can also be kept as svg, python -m common.benchmark compares the formats
+chart_codecs = {
+    "skill_bar_chart": "png",
+    "focus_area_spider_plot": "png",
+    "skill_gauge": "png",
+    "color_bar": "png",
+    "line_chart": "jpeg",
+    "pauses_stacked_bar_chart": "png",
+}
+
 def generate_skill_score_bar_charts(
-    dict_scores: Dict[str, Dict[str, Union[float, int]]]
-) -> None:
+    dict_scores: Dict[str, Dict[str, Union[float, int]]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> Dict[str, pathlib.Path]:
     """
     Creates bar graphs for all focus areas based on the individual's self-assessment and save the
     static image to the tmp folder
 
     Args:
         param1(Dict[str, Dict[str, int | str]]): The candidate's profile and assessment results
+        param2(str): name of the render-quality profile (draft, screen or print)
 
     Returns:
-        None
+        Dict[str, pathlib.Path]: path of the bar chart of each focus area
     """
+    dict_paths = {}
     for focus_area, dict_skills in dict_scores.items():
         print(focus_area, dict_skills)
-        filename_ending = focus_area + ".jpg"
-        path_focus_area = pathlib.Path(f"/tmp/{filename_ending}")#.parent.parent / "tmp" / filename_ending
+        path_focus_area = artifact_path(focus_area)#.parent.parent / "tmp" / focus_area
 
         categories = ["\n".join(category.split(" ")) for category in dict_skills.keys()]
         values = [np.round(1.0 * x, 1) for x in dict_skills.values()]
 
-        fig, ax = plt.subplots(figsize=(20, 10))
-        ax_bar = ax.bar(categories, values, alpha=0.2)
-
-        ax.spines["top"].set_visible(False)
-        ax.spines["right"].set_visible(False)
-        ax.spines["left"].set_visible(False)
-        ax.spines["bottom"].set_position(("outward", 5))
-        ax.bar_label(ax_bar, fontsize=16, padding=5, fmt="%.1f")
-        ax.set_ylim(1, 10)
-
-        plt.rcParams["font.family"] = "sans-serif"
-        plt.rcParams["font.sans-serif"] = "Helvetica"
-        plt.rcParams["axes.edgecolor"] = "#333F4B"
-        plt.rcParams["axes.linewidth"] = 0.8
-        plt.rcParams["xtick.color"] = "#333F4B"
-
-        plt.title(focus_area, fontsize=35)
-        plt.xticks(fontsize=17)
-        plt.yticks([])
-        plt.tight_layout()
-        plt.savefig(path_focus_area, format="jpg")
-        plt.clf()
+        with managed_subplots(figsize=(20, 10)) as (fig, ax):
+            ax_bar = ax.bar(categories, values, alpha=0.2)
+
+            ax.spines["top"].set_visible(False)
+            ax.spines["right"].set_visible(False)
+            ax.spines["left"].set_visible(False)
+            ax.spines["bottom"].set_position(("outward", 5))
+            ax.bar_label(ax_bar, fontsize=16, padding=5, fmt="%.1f")
+            ax.set_ylim(1, 10)
+
+            ax.set_title(focus_area, fontsize=35)
+            ax.tick_params(axis="x", labelsize=17)
+            ax.set_yticks([])
+            fig.tight_layout()
+            dict_paths[focus_area] = save_chart(
+                fig,
+                path_focus_area,
+                chart_codecs["skill_bar_chart"],
+                quality_profile,
+                chart_placement_widths["skill_bar_chart"],
+            )
 
-    matplotlib.pyplot.close()
+    return dict_paths
 
 
 def generate_focus_area_spider_plot(
-    dict_scores: Dict[str, Dict[str, Union[float, int]]]
-) -> None:
+    dict_scores: Dict[str, Dict[str, Union[float, int]]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> pathlib.Path:
     """
     Creates spidersplot graph that displays the self-assessment scores
 
     Args:
-        param(Dict[str, Dict[str, Union[float, int]]]): a nested dictionary that corresponds to
+        param1(Dict[str, Dict[str, Union[float, int]]]): a nested dictionary that corresponds to
         the score receieved for each focus area/skill
+        param2(str): name of the render-quality profile (draft, screen or print)
 
     Returns:
-        None
+        pathlib.Path: path of the spider plot
     """
     categories = ["\n".join(wrap(category, 15)) for category in dict_scores.keys()]
 
@@ -91,88 +130,160 @@ def generate_focus_area_spider_plot(
     angles = [n / float(N) * 2 * PI for n in range(N)]
     angles += angles[:1]
 
-    plt.rc("figure", figsize=(10, 10))
-
-    ax = plt.subplot(1, 1, 1, polar=True)
-
-    ax.set_theta_offset(PI / 2)
-    ax.set_theta_direction(-1)
-    ax.set_ylim(0, 10)
-
-    plt.xticks(angles[:-1], categories, color="black", size=16)
-    ax.tick_params(axis="x", pad=24)
-
-    ax.set_rlabel_position(0)
-    plt.yticks([1, 10], ["1", "10"], color="black", size=10)
-    plt.ylim(0, 10)
-
-    ax.plot(angles, list_scores, color=color, linewidth=1, linestyle="solid")
-    ax.fill(angles, list_scores, color=color, alpha=0.3)
-
-    for i, (angle, radius) in enumerate(zip(angles[:-1], list_scores[:-1])):
-        x = angle
-        y = radius
-
-        if x >= 0 and x <= 1.5:
-            xytext = (0, 8)
-        elif x <= 3:
-            xytext = (8, 0)
-        elif x < 4.5:
-            xytext = (0, -8)
-        else:
-            xytext = (-8, 0)
+    with managed_figure(figsize=(10, 10)) as fig:
+        ax = fig.add_subplot(1, 1, 1, polar=True)
+
+        ax.set_theta_offset(PI / 2)
+        ax.set_theta_direction(-1)
+        ax.set_ylim(0, 10)
+
+        ax.set_xticks(angles[:-1], categories, color="black", size=16)
+        ax.tick_params(axis="x", pad=24)
+
+        ax.set_rlabel_position(0)
+        ax.set_yticks([1, 10], ["1", "10"], color="black", size=10)
+        ax.set_ylim(0, 10)
+
+        ax.plot(angles, list_scores, color=color, linewidth=1, linestyle="solid")
+        ax.fill(angles, list_scores, color=color, alpha=0.3)
+
+        for i, (angle, radius) in enumerate(zip(angles[:-1], list_scores[:-1])):
+            x = angle
+            y = radius
+
+            if x >= 0 and x <= 1.5:
+                xytext = (0, 8)
+            elif x <= 3:
+                xytext = (8, 0)
+            elif x < 4.5:
+                xytext = (0, -8)
+            else:
+                xytext = (-8, 0)
+
+            ax.annotate(
+                np.round(list_scores[i], 1),
+                xy=(x, y),
+                xytext=xytext,
+                textcoords="offset points",
+                ha="center",
+                va="center",
+            )
 
-        ax.annotate(
-            np.round(list_scores[i], 1),
-            xy=(x, y),
-            xytext=xytext,
-            textcoords="offset points",
-            ha="center",
-            va="center",
+        path_spiderplot_graph = (
+            artifact_path("focus_area_spider_plot")#.parent.parent / "tmp" / "focus_area_spider_plot"
         )
 
-    path_spiderplot_graph = (
-        pathlib.Path(f"/tmp/focus_area_spider_plot.jpg")#.parent.parent / "tmp" / "focus_area_spider_plot.jpg"
-    )
-    plt.savefig(path_spiderplot_graph, format="jpg")
-
-    # crop the left and right sides of the image
-    image = Image.open(path_spiderplot_graph)
-    width, height = image.size
-    crop_width = int(width * 0.25)
-    left = crop_width
-    top = 0
-    right = width - crop_width
-    bottom = height
-    cropped_image = image.crop((left, top, right, bottom))
-    cropped_image.save(path_spiderplot_graph)
+        # crop the left and right sides of the image, only the middle half of the figure is kept
+        path_spiderplot_graph = save_chart(
+            fig,
+            path_spiderplot_graph,
+            chart_codecs["focus_area_spider_plot"],
+            quality_profile,
+            chart_placement_widths["focus_area_spider_plot"] / 0.5,
+            crop=(0.25, 0, 0.75, 1),
+        )
 
-    matplotlib.pyplot.close()
+    return path_spiderplot_graph
 
 
 def generate_skill_score_colorbar_plots(
-    dict_scores: Dict[str, Dict[str, Union[float, int]]]
-) -> None:
+    dict_scores: Dict[str, Dict[str, Union[float, int]]],
+    atlas: bool = False,
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> Dict[str, Union[str, int, pathlib.Path, Dict[str, float]]]:
     """
     Creates horizontal gauge charts based on the individual's scores.
 
+    When atlas is set, the gauges are stacked into a single sprite sheet instead of one image
+    per skill, so that the pdf only has to decode and embed one image for the whole skill loop
+
     Args:
-        param(Dict[str, Dict[str, Union[float, int]]]): a nested dictionary that corresponds
+        param1(Dict[str, Dict[str, Union[float, int]]]): a nested dictionary that corresponds
         to the score receieved for each focus area/skill
+        param2(bool): whether to save the gauges as a single sprite sheet
+        param3(str): name of the render-quality profile (draft, screen or print)
 
     Returns:
-        None
+        Dict[str, Union[str, int, pathlib.Path, Dict[str, float]]]: the path of the sprite sheet, the
+        number of rows and the vertical background position (in percent) of each skill when atlas
+        is set, otherwise the path of the gauge of each skill
     """
     # path_skill_range = (
     #     pathlib.Path(__file__).parent.parent / "resources" / "skill_range.csv"
     # )
     df_skill_range = skills_csv_df
 
-    fig = plt.figure(figsize=(8, 2))
-    ax = fig.add_axes([0.1, 0.2, 0.8, 0.4])
-    ax2 = fig.add_axes([0.1, 0.1, 0.8, 0.1])
-    ax3 = fig.add_axes([0.1, 0.6, 0.8, 0.1])
+    list_atlas_skills, list_atlas_frames = [], []
+    dict_paths = {}
+    for skill_dict in dict_scores.values():
+        for skill, score in skill_dict.items():
+            min_gauge_value = df_skill_range.loc[
+                df_skill_range["Skills (Competencies)"] == skill, "Min"
+            ].values[0]
+            max_gauge_value = df_skill_range.loc[
+                df_skill_range["Skills (Competencies)"] == skill, "Max"
+            ].values[0]
+
+            # the gauge only depends on the score and the range, skills sharing both share a gauge
+            pixels = _render_skill_gauge(
+                score, min_gauge_value, max_gauge_value, quality_profile
+            )
+            path_skill_gauge_chart = artifact_path(skill)#.parent.parent / "tmp" / skill
+
+            if atlas:
+                list_atlas_skills.append(skill)
+                list_atlas_frames.append(pixels)
+            else:
+                dict_paths[skill] = encode_chart(
+                    pixels,
+                    path_skill_gauge_chart,
+                    chart_codecs["skill_gauge"],
+                    quality_profile,
+                )
+
+    if not atlas:
+        return dict_paths
+
+    # stack the gauges vertically, each row is later shown through a clipped background
+    path_skill_gauge_atlas = artifact_path("skill_gauge_atlas")
+    if list_atlas_frames:
+        path_skill_gauge_atlas = encode_chart(
+            np.vstack(list_atlas_frames),
+            path_skill_gauge_atlas,
+            chart_codecs["skill_gauge"],
+            quality_profile,
+        )
+
+    rows = len(list_atlas_skills)
+    return {
+        "path": path_skill_gauge_atlas,
+        "rows": rows,
+        "tiles": {
+            skill: np.round(100 * index / max(rows - 1, 1), 4)
+            for index, skill in enumerate(list_atlas_skills)
+        },
+    }
+
+
+@memoize_chart()
+def _render_skill_gauge(
+    score: Union[float, int],
+    min_gauge_value: Union[float, int],
+    max_gauge_value: Union[float, int],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> np.ndarray:
+    """
+    Draws the horizontal gauge of a single skill
+
+    Args:
+        param1(Union[float, int]): the score of the skill
+        param2(Union[float, int]): the lowest score of the gauge
+        param3(Union[float, int]): the highest score of the gauge
+        param4(str): name of the render-quality profile (draft, screen or print)
 
+    Returns:
+        np.ndarray: the RGB pixels of the gauge
+    """
     left_color = "#FCBEC1"
     right_color = "#D9FBC8"
     center_color = "#F4F4F4"
@@ -197,91 +308,78 @@ def generate_skill_score_colorbar_plots(
         (cmap_left(np.linspace(0, 1, 256)), cmap_right(np.linspace(0, 1, 256)))
     )
     cmap_custom = mcolors.ListedColormap(colors)
-    for skill_dict in dict_scores.values():
-        for skill, score in skill_dict.items():
-            min_gauge_value = df_skill_range.loc[
-                df_skill_range["Skills (Competencies)"] == skill, "Min"
-            ].values[0]
-            max_gauge_value = df_skill_range.loc[
-                df_skill_range["Skills (Competencies)"] == skill, "Max"
-            ].values[0]
-            r1_gauge_value = df_skill_range.loc[
-                df_skill_range["Skills (Competencies)"] == skill, "R1"
-            ].values[0]
-            r2_gauge_value = df_skill_range.loc[
-                df_skill_range["Skills (Competencies)"] == skill, "R2"
-            ].values[0]
 
-            guage_range = np.linspace(min_gauge_value, max_gauge_value, 512)
+    with managed_figure(figsize=(8, 2)) as fig:
+        ax = fig.add_axes([0.1, 0.2, 0.8, 0.4])
+        ax2 = fig.add_axes([0.1, 0.1, 0.8, 0.1])
+        ax3 = fig.add_axes([0.1, 0.6, 0.8, 0.1])
 
-            norm = matplotlib.colors.Normalize(
-                vmin=guage_range[0], vmax=guage_range[-1]
-            )
+        guage_range = np.linspace(min_gauge_value, max_gauge_value, 512)
 
-            cbar = matplotlib.colorbar.ColorbarBase(
-                ax,
-                cmap=cmap_custom,
-                norm=norm,
-                orientation="horizontal",
-                boundaries=guage_range,
-            )
-
-            cbar2 = matplotlib.colorbar.ColorbarBase(
-                ax2,
-                cmap=cmap_white,
-                norm=norm,
-                orientation="horizontal",
-                boundaries=guage_range,
-            )
+        norm = matplotlib.colors.Normalize(
+            vmin=guage_range[0], vmax=guage_range[-1]
+        )
 
-            cbar3 = matplotlib.colorbar.ColorbarBase(
-                ax3,
-                cmap=cmap_white,
-                norm=norm,
-                orientation="horizontal",
-                boundaries=guage_range,
-            )
+        cbar = matplotlib.colorbar.ColorbarBase(
+            ax,
+            cmap=cmap_custom,
+            norm=norm,
+            orientation="horizontal",
+            boundaries=guage_range,
+        )
 
-            cbar.outline.set_visible(False)
-            cbar2.outline.set_visible(False)
-            cbar3.outline.set_visible(False)
+        cbar2 = matplotlib.colorbar.ColorbarBase(
+            ax2,
+            cmap=cmap_white,
+            norm=norm,
+            orientation="horizontal",
+            boundaries=guage_range,
+        )
 
-            ax.axvspan(score - 0.1, score + 0.1, 0, 1, facecolor="#000000")
-            ax2.axvspan(score - 0.1, score + 0.1, 0, 1, facecolor="#000000")
-            ax3.axvspan(score - 0.1, score + 0.1, 0, 1, facecolor="#000000")
+        cbar3 = matplotlib.colorbar.ColorbarBase(
+            ax3,
+            cmap=cmap_white,
+            norm=norm,
+            orientation="horizontal",
+            boundaries=guage_range,
+        )
 
-            file_name = skill + ".jpg"
-            path_skill_gauge_chart = pathlib.Path(f"/tmp/{file_name}")#.parent.parent / "tmp" / file_name
+        cbar.outline.set_visible(False)
+        cbar2.outline.set_visible(False)
+        cbar3.outline.set_visible(False)
 
-            ax.set_xticks([])
-            ax2.set_xticks([])
-            ax3.set_xticks([])
+        ax.axvspan(score - 0.1, score + 0.1, 0, 1, facecolor="#000000")
+        ax2.axvspan(score - 0.1, score + 0.1, 0, 1, facecolor="#000000")
+        ax3.axvspan(score - 0.1, score + 0.1, 0, 1, facecolor="#000000")
 
-            annotation = plt.annotate(
-                "1", xy=(0.1, 0.1), xycoords="figure fraction", ha="center", fontsize=14
-            )
-            annotation2 = plt.annotate(
-                "10",
-                xy=(0.9, 0.1),
-                xycoords="figure fraction",
-                ha="center",
-                fontsize=14,
-            )
-            annotation3 = plt.annotate(
-                str(np.round(score, 1)),
-                xy=(score / 11, 0.75),
-                xycoords="figure fraction",
-                ha="center",
-                fontsize=14,
-            )
+        ax.set_xticks([])
+        ax2.set_xticks([])
+        ax3.set_xticks([])
 
-            plt.savefig(path_skill_gauge_chart, format="jpg")
+        ax3.annotate(
+            "1", xy=(0.1, 0.1), xycoords="figure fraction", ha="center", fontsize=14
+        )
+        ax3.annotate(
+            "10",
+            xy=(0.9, 0.1),
+            xycoords="figure fraction",
+            ha="center",
+            fontsize=14,
+        )
+        ax3.annotate(
+            str(np.round(score, 1)),
+            xy=(score / 11, 0.75),
+            xycoords="figure fraction",
+            ha="center",
+            fontsize=14,
+        )
 
-            annotation.remove()
-            annotation2.remove()
-            annotation3.remove()
+        return render_figure(
+            fig, quality_profile, chart_placement_widths["skill_gauge"]
+        )
 
 
+@memoize_chart(rounding={"metric_average": 0}, codec=lambda: chart_codecs["color_bar"])
 def generate_color_bar_plot(
     metric_name: str,
     metric_unit_measurement: str,
@@ -293,7 +391,8 @@ def generate_color_bar_plot(
     bar_annotations: Dict[str, str],
     colorbar_range: List[int],
     colorbar_colors: List[str],
-) -> None:
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> pathlib.Path:
     """
     Generate a colorbar based on custom specific arguments provided
 
@@ -308,164 +407,162 @@ def generate_color_bar_plot(
         bar_annotations(Dict[str, str]): the labels used to define the intervals
         color_range(List[int]): the position where the colors change along the interval
         colorbar_colors(List[str]): hexademical colors for each point given
+        quality_profile(str): name of the render-quality profile (draft, screen or print)
 
     Returns:
-        None
+        pathlib.Path: path of the colorbar
     """
-    fig = plt.figure(figsize=(8, 2))
-    ax = fig.add_axes([0.1, 0.2, 0.8, 0.4])
-    ax2 = fig.add_axes([0.1, 0.6, 0.8, 0.1])
-    ax3 = fig.add_axes([0.1, 0.1, 0.8, 0.1])
-
-    scale_colorbar_range = MinMaxScaler()
-    scale_colorbar_range = scale_colorbar_range.fit_transform(
-        np.array(colorbar_range).reshape(-1, 1)
-    )
-
-    cmap_custom = mcolors.LinearSegmentedColormap.from_list(
-        "custom_cmap", list(zip(scale_colorbar_range, colorbar_colors)), N=256
-    )
-
-    cmap_white = mcolors.LinearSegmentedColormap.from_list(
-        "WhiteCmap", ["white", "white"]
-    )
+    with managed_figure(figsize=(8, 2)) as fig:
+        ax = fig.add_axes([0.1, 0.2, 0.8, 0.4])
+        ax2 = fig.add_axes([0.1, 0.6, 0.8, 0.1])
+        ax3 = fig.add_axes([0.1, 0.1, 0.8, 0.1])
+
+        scale_colorbar_range = MinMaxScaler()
+        scale_colorbar_range = scale_colorbar_range.fit_transform(
+            np.array(colorbar_range).reshape(-1, 1)
+        )
 
-    guage_range = np.linspace(bar_min, bar_max, 512)
+        cmap_custom = mcolors.LinearSegmentedColormap.from_list(
+            "custom_cmap", list(zip(scale_colorbar_range, colorbar_colors)), N=256
+        )
 
-    norm = matplotlib.colors.Normalize(vmin=guage_range[0], vmax=guage_range[-1])
+        cmap_white = mcolors.LinearSegmentedColormap.from_list(
+            "WhiteCmap", ["white", "white"]
+        )
 
-    cbar = matplotlib.colorbar.ColorbarBase(
-        ax,
-        cmap=cmap_custom,
-        norm=norm,
-        orientation="horizontal",
-        boundaries=guage_range,
-    )
+        guage_range = np.linspace(bar_min, bar_max, 512)
 
-    cbar2 = matplotlib.colorbar.ColorbarBase(
-        ax2,
-        cmap=cmap_white,
-        norm=norm,
-        orientation="horizontal",
-        boundaries=guage_range,
-    )
+        norm = matplotlib.colors.Normalize(vmin=guage_range[0], vmax=guage_range[-1])
 
-    cbar3 = matplotlib.colorbar.ColorbarBase(
-        ax3,
-        cmap=cmap_white,
-        norm=norm,
-        orientation="horizontal",
-        boundaries=guage_range,
-    )
+        cbar = matplotlib.colorbar.ColorbarBase(
+            ax,
+            cmap=cmap_custom,
+            norm=norm,
+            orientation="horizontal",
+            boundaries=guage_range,
+        )
 
-    cbar.outline.set_visible(False)
-    cbar2.outline.set_visible(False)
-    cbar3.outline.set_visible(False)
+        cbar2 = matplotlib.colorbar.ColorbarBase(
+            ax2,
+            cmap=cmap_white,
+            norm=norm,
+            orientation="horizontal",
+            boundaries=guage_range,
+        )
 
-    # middle range
-    ax.axvspan(
-        metric_middle_min - 0.15, metric_middle_min + 0.15, 0, 1, facecolor="#000000"
-    )
-    ax.axvspan(
-        metric_middle_max - 0.15, metric_middle_max + 0.15, 0, 1, facecolor="#000000"
-    )
+        cbar3 = matplotlib.colorbar.ColorbarBase(
+            ax3,
+            cmap=cmap_white,
+            norm=norm,
+            orientation="horizontal",
+            boundaries=guage_range,
+        )
 
-    ax.set_xticks([])
-    ax2.set_xticks([])
-    ax3.set_xticks([])
+        cbar.outline.set_visible(False)
+        cbar2.outline.set_visible(False)
+        cbar3.outline.set_visible(False)
 
-    # user metric conversion to location fraction
-    if metric_average < bar_min:
-        metric_value_annotation_location = 0.1
-    elif metric_average > bar_max:
-        metric_value_annotation_location = 0.9
-    else:
-        metric_value_annotation_location = (
-            0.1 + (metric_average - bar_min) / (bar_max - bar_min) * 0.8
+        # middle range
+        ax.axvspan(
+            metric_middle_min - 0.15, metric_middle_min + 0.15, 0, 1, facecolor="#000000"
+        )
+        ax.axvspan(
+            metric_middle_max - 0.15, metric_middle_max + 0.15, 0, 1, facecolor="#000000"
         )
 
-    low_annotation_location = 0.1 + 0.8 * (metric_middle_min - bar_min) / 2 / (
-        bar_max - bar_min
-    )
-    middle_annotation_location = 0.1 + 0.8 * (
-        (metric_middle_max + metric_middle_min) / 2 - bar_min
-    ) / (bar_max - bar_min)
-    high_annotation_location = 0.1 + 0.8 * (
-        (bar_max + metric_middle_max) / 2 - bar_min
-    ) / (bar_max - bar_min)
-    middle_low_annotation_location = 0.1 + 0.8 * (metric_middle_min - bar_min) / (
-        bar_max - bar_min
-    )
-    middle_high_annotation_location = 0.1 + 0.8 * (metric_middle_max - bar_min) / (
-        bar_max - bar_min
-    )
+        ax.set_xticks([])
+        ax2.set_xticks([])
+        ax3.set_xticks([])
 
-    plt.annotate(
-        bar_annotations["low"],
-        xy=(low_annotation_location, 0.375),
-        xycoords="figure fraction",
-        ha="center",
-        fontsize=10,
-    )
+        # user metric conversion to location fraction
+        if metric_average < bar_min:
+            metric_value_annotation_location = 0.1
+        elif metric_average > bar_max:
+            metric_value_annotation_location = 0.9
+        else:
+            metric_value_annotation_location = (
+                0.1 + (metric_average - bar_min) / (bar_max - bar_min) * 0.8
+            )
 
-    plt.annotate(
-        bar_annotations["middle"],
-        xy=(middle_annotation_location, 0.375),
-        xycoords="figure fraction",
-        ha="center",
-        fontsize=10,
-    )
+        low_annotation_location = 0.1 + 0.8 * (metric_middle_min - bar_min) / 2 / (
+            bar_max - bar_min
+        )
+        middle_annotation_location = 0.1 + 0.8 * (
+            (metric_middle_max + metric_middle_min) / 2 - bar_min
+        ) / (bar_max - bar_min)
+        high_annotation_location = 0.1 + 0.8 * (
+            (bar_max + metric_middle_max) / 2 - bar_min
+        ) / (bar_max - bar_min)
+        middle_low_annotation_location = 0.1 + 0.8 * (metric_middle_min - bar_min) / (
+            bar_max - bar_min
+        )
+        middle_high_annotation_location = 0.1 + 0.8 * (metric_middle_max - bar_min) / (
+            bar_max - bar_min
+        )
 
-    plt.annotate(
-        bar_annotations["high"],
-        xy=(high_annotation_location, 0.375),
-        xycoords="figure fraction",
-        ha="center",
-        fontsize=10,
-    )
+        ax3.annotate(
+            bar_annotations["low"],
+            xy=(low_annotation_location, 0.375),
+            xycoords="figure fraction",
+            ha="center",
+            fontsize=10,
+        )
 
-    plt.annotate(
-        str(int(np.round(metric_average, 0))) + metric_unit_measurement,
-        xy=(metric_value_annotation_location, 0.525),
-        xytext=(metric_value_annotation_location, 0.8),
-        xycoords="figure fraction",
-        ha="center",
-        fontsize=10,
-        arrowprops={"arrowstyle": "->", "linewidth": 1.5, "edgecolor": "black"},
-        va="center",
-    )
+        ax3.annotate(
+            bar_annotations["middle"],
+            xy=(middle_annotation_location, 0.375),
+            xycoords="figure fraction",
+            ha="center",
+            fontsize=10,
+        )
 
-    plt.annotate(
-        str(metric_middle_min),
-        xy=(middle_low_annotation_location, 0.075),
-        xycoords="figure fraction",
-        ha="center",
-        fontsize=10,
-    )
+        ax3.annotate(
+            bar_annotations["high"],
+            xy=(high_annotation_location, 0.375),
+            xycoords="figure fraction",
+            ha="center",
+            fontsize=10,
+        )
 
-    plt.annotate(
-        str(metric_middle_max),
-        xy=(middle_high_annotation_location, 0.075),
-        xycoords="figure fraction",
-        ha="center",
-        fontsize=10,
-    )
+        ax3.annotate(
+            str(int(np.round(metric_average, 0))) + metric_unit_measurement,
+            xy=(metric_value_annotation_location, 0.525),
+            xytext=(metric_value_annotation_location, 0.8),
+            xycoords="figure fraction",
+            ha="center",
+            fontsize=10,
+            arrowprops={"arrowstyle": "->", "linewidth": 1.5, "edgecolor": "black"},
+            va="center",
+        )
 
-    file_name = metric_name + "_colorbar.jpg"
-    path_color_bar = pathlib.Path(f"/tmp/{file_name}")#.parent.parent / "tmp" / file_name
+        ax3.annotate(
+            str(metric_middle_min),
+            xy=(middle_low_annotation_location, 0.075),
+            xycoords="figure fraction",
+            ha="center",
+            fontsize=10,
+        )
 
-    plt.savefig(path_color_bar, format="jpg")
+        ax3.annotate(
+            str(metric_middle_max),
+            xy=(middle_high_annotation_location, 0.075),
+            xycoords="figure fraction",
+            ha="center",
+            fontsize=10,
+        )
 
-    # crop the top and bottom sides of the image
-    image = Image.open(path_color_bar)
-    width, height = image.size
-    crop_height = int(height * 0.1)
-    left = 0
-    top = crop_height
-    right = width
-    bottom = height - crop_height * 0.5
-    cropped_image = image.crop((left, top, right, bottom))
-    cropped_image.save(path_color_bar)
+        file_name = metric_name + "_colorbar"
+        path_color_bar = artifact_path(file_name)#.parent.parent / "tmp" / file_name
+
+        # crop the top and bottom sides of the image
+        return save_chart(
+            fig,
+            path_color_bar,
+            chart_codecs["color_bar"],
+            quality_profile,
+            chart_placement_widths["color_bar"],
+            crop=(0, 0.1, 1, 0.95),
+        )
 
 
 def generate_line_chart(
@@ -476,10 +573,11 @@ def generate_line_chart(
     metric_middle_min: Union[int, float],
     colorbar_min: Union[int, float],
     colorbar_max: Union[int, float],
-    metric_time_series_x_y: Dict[str, Union[int, float]],
+    metric_time_series_x_y: Dict[str, np.ndarray],
     colorbar_range: List[int],
     colorbar_colors: list[str],
-) -> None:
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> pathlib.Path:
     """
     Generate a line chart that graphs the pace over time and compares it to the middle range
 
@@ -493,183 +591,281 @@ def generate_line_chart(
         colorbar_max(Union[int, float]): the maximum value for the metric
         colorbar_min(Union[int, float]): the minimum value for the metric
         bar_annotations(Dict[str, str]): the labels used to define the intervals
-        metric_timer_series_x_y(Dict[str, Union[int, float]]): time series data for the particular metric
+        metric_timer_series_x_y(Dict[str, np.ndarray]): time series data for the particular metric, as
+        returned by ingest_time_series
         color_range(List[int]): the position where the colors change along the interval
         colorbar_colors(List[str]): hexademical colors for each point given
+        quality_profile(str): name of the render-quality profile (draft, screen or print)
 
     Returns:
-        None
+        pathlib.Path: path of the line chart
     """
-    # interpolate data in order to populate scatterplot
-    pace_time_series_x = [
-        np.round(x["millisec"] / 60000, 2) for x in metric_time_series_x_y
-    ]
-    pace_time_series_y = [np.round(x["value"], 0) for x in metric_time_series_x_y]
-
-    segments =  0 if len(pace_time_series_x) == 0 else len(pace_time_series_x) - 1
-    points_per_segment = 100
-    pace_time_series_x_scatter = np.linspace(
-        min(pace_time_series_x, default=0), max(pace_time_series_x, default=0), segments * points_per_segment
-    )
-    pace_time_series_y_scatter = np.array(
-        [
-            np.linspace(
-                pace_time_series_y[x], pace_time_series_y[x + 1], points_per_segment
-            )
-            for x in range(segments)
-        ]
-    ).flatten()
+    with managed_subplots(1, 2, width_ratios=[20, 1]) as (fig, ax):
+        fig.set_figwidth(12)
+        fig.set_figheight(6)
+        fig.subplots_adjust(wspace=0.1, hspace=0)
+
+        # measure the plot area at the resolution render_figure saves the chart with
+        fig.set_dpi(
+            get_quality_profile(quality_profile)["dpi"]
+            * chart_placement_widths["line_chart"]
+            / fig.get_figwidth()
+        )
 
-    # create custom color map based on color range list
-    scale_colorbar_range = MinMaxScaler()
-    scale_colorbar_range = scale_colorbar_range.fit_transform(
-        np.array(colorbar_range).reshape(-1, 1)
-    )
-    cmap = mcolors.LinearSegmentedColormap.from_list(
-        "custom_cmap", list(zip(scale_colorbar_range, colorbar_colors)), N=256
-    )
+        metric_time_series_x_y = ingest_time_series(metric_time_series_x_y)
+        pace_time_series_x = np.round(metric_time_series_x_y["time"] / 60000, 2)
+        pace_time_series_y = np.round(metric_time_series_x_y["value"], 0)
 
-    fig, ax = plt.subplots(1, 2, width_ratios=[20, 1])
-    fig.set_figwidth(12)
-    fig.set_figheight(6)
+        # long recordings carry far more points than the plot area has pixels
+        pace_time_series_x, pace_time_series_y = downsample_time_series(
+            pace_time_series_x,
+            pace_time_series_y,
+            int(ax[0].get_window_extent().width),
+        )
 
-    ax[0].scatter(
-        x=pace_time_series_x_scatter,
-        y=pace_time_series_y_scatter,
-        c=pace_time_series_y_scatter,
-        cmap=cmap,
-        vmin=colorbar_min,
-        vmax=colorbar_max,
-    )
-    ax[0].set_ylim(colorbar_min, colorbar_max)
-    ax[0].set_xlim(0, max(pace_time_series_x_scatter, default=0))
+        # create custom color map based on color range list
+        scale_colorbar_range = MinMaxScaler()
+        scale_colorbar_range = scale_colorbar_range.fit_transform(
+            np.array(colorbar_range).reshape(-1, 1)
+        )
+        cmap = mcolors.LinearSegmentedColormap.from_list(
+            "custom_cmap", list(zip(scale_colorbar_range, colorbar_colors)), N=256
+        )
+
+        add_gradient_line(
+            ax[0],
+            pace_time_series_x,
+            pace_time_series_y,
+            cmap=cmap,
+            vmin=colorbar_min,
+            vmax=colorbar_max,
+        )
+        ax[0].set_ylim(colorbar_min, colorbar_max)
 
-    ax[0].spines["right"].set_color("none")
-    ax[0].spines["top"].set_color("none")
+        ax[0].spines["right"].set_color("none")
+        ax[0].spines["top"].set_color("none")
 
-    ax[0].xaxis.set_ticks_position("bottom")
-    ax[0].yaxis.set_ticks_position("left")
+        ax[0].xaxis.set_ticks_position("bottom")
+        ax[0].yaxis.set_ticks_position("left")
 
-    # remove origin ticker
-    func = lambda x, pos: "" if np.isclose(x, 0) else x
-    ax[0].xaxis.set_major_formatter(ticker.FuncFormatter(func))
-    ax[0].yaxis.set_major_formatter(ticker.FuncFormatter(func))
+        # remove origin ticker
+        func = lambda x, pos: "" if np.isclose(x, 0) else x
+        ax[0].xaxis.set_major_formatter(ticker.FuncFormatter(func))
+        ax[0].yaxis.set_major_formatter(ticker.FuncFormatter(func))
 
-    # remove decimals from y axis ticker
-    ax[0].yaxis.set_major_formatter(ticker.FormatStrFormatter("%.0f"))
+        # remove decimals from y axis ticker
+        ax[0].yaxis.set_major_formatter(ticker.FormatStrFormatter("%.0f"))
     
-    ax[0].xaxis.set_major_formatter(ticker.FormatStrFormatter("%.2f"))
+        ax[0].xaxis.set_major_formatter(ticker.FormatStrFormatter("%.2f"))
     
-    ax[0].tick_params(axis="both", which="major", labelsize=14)
-    ax[0].set_xlim(min(pace_time_series_x_scatter, default=0), max(pace_time_series_x_scatter, default=0))
-
-    # plot average pace value
-    y_mean = [metric_average] * len(pace_time_series_x_scatter)
-    ax[0].plot(
-        pace_time_series_x_scatter,
-        y_mean,
-        linestyle="-",
-        color="red"
-        if metric_average > metric_middle_max or metric_average < metric_middle_min
-        else "green",
-    )
+        ax[0].tick_params(axis="both", which="major", labelsize=14)
+        ax[0].set_xlim(min(pace_time_series_x, default=0), max(pace_time_series_x, default=0))
+
+        # plot average pace value
+        if len(pace_time_series_x) > 1:
+            ax[0].plot(
+                [pace_time_series_x[0], pace_time_series_x[-1]],
+                [metric_average, metric_average],
+                linestyle="-",
+                color="red"
+                if metric_average > metric_middle_max or metric_average < metric_middle_min
+                else "green",
+            )
 
-    ax[0].set_xlabel("Minutes", fontsize=14)
-    ax[0].set_ylabel(metric_unit_measurement, fontsize=14)
+        ax[0].set_xlabel("Minutes", fontsize=14)
+        ax[0].set_ylabel(metric_unit_measurement, fontsize=14)
 
-    ax[0].set_facecolor("#EEEFEE")
-    ax[0].grid(linestyle="--", linewidth=1)
+        ax[0].set_facecolor("#EEEFEE")
+        ax[0].grid(linestyle="--", linewidth=1)
 
-    # create colorbar
-    guage_range = np.linspace(colorbar_min, colorbar_max, 512)
+        # create colorbar
+        guage_range = np.linspace(colorbar_min, colorbar_max, 512)
 
-    norm = matplotlib.colors.Normalize(vmin=guage_range[0], vmax=guage_range[-1])
+        norm = matplotlib.colors.Normalize(vmin=guage_range[0], vmax=guage_range[-1])
 
-    cbar = matplotlib.colorbar.ColorbarBase(
-        ax[1],
-        cmap=cmap,
-        norm=norm,
-        orientation="vertical",
-        boundaries=guage_range,
-    )
+        cbar = matplotlib.colorbar.ColorbarBase(
+            ax[1],
+            cmap=cmap,
+            norm=norm,
+            orientation="vertical",
+            boundaries=guage_range,
+        )
+
+        cbar.outline.set_visible(False)
+
+        ax[1].set_yticks([])
+
+        file_name = metric_name + "_line_chart"
+        path_line_chart = artifact_path(file_name)#.parent.parent / "tmp" / file_name
+
+        # crop the top and bottom sides of the image
+        return save_chart(
+            fig,
+            path_line_chart,
+            chart_codecs["line_chart"],
+            quality_profile,
+            chart_placement_widths["line_chart"],
+            crop=(0, 0.075, 1, 1 - 0.075 * 0.3),
+        )
+
+
+def add_gradient_line(
+    ax: matplotlib.axes.Axes,
+    x: np.ndarray,
+    y: np.ndarray,
+    cmap: mcolors.Colormap,
+    vmin: Union[int, float],
+    vmax: Union[int, float],
+    linewidth: Union[int, float] = 6,
+    subdivisions: int = 16,
+) -> Union[LineCollection, None]:
+    """
+    Draw a line whose color follows its value as a single collection of short segments. Every
+    segment between two points is split into evenly spaced sub-segments so the color changes
+    gradually along steep segments
+
+    Args:
+        ax(matplotlib.axes.Axes): the axes to draw on
+        x(np.ndarray): the x coordinate of each point
+        y(np.ndarray): the y coordinate of each point
+        cmap(mcolors.Colormap): the colormap used to color the line by value
+        vmin(Union[int, float]): the value mapped to the bottom of the colormap
+        vmax(Union[int, float]): the value mapped to the top of the colormap
+        linewidth(Union[int, float]): the width of the line in points
+        subdivisions(int): the number of sub-segments drawn between two consecutive points
 
-    cbar.outline.set_visible(False)
+    Returns:
+        Union[LineCollection, None]: the collection added to the axes, None if there is no segment
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if len(x) < 2:
+        return None
 
-    ax[1].set_yticks([])
+    # (segments, subdivisions + 1) grid of points interpolated along every segment
+    steps = np.linspace(0, 1, subdivisions + 1)
+    x_fine = x[:-1, None] + np.diff(x)[:, None] * steps
+    y_fine = y[:-1, None] + np.diff(y)[:, None] * steps
 
-    plt.subplots_adjust(wspace=0.1, hspace=0)
+    points = np.stack([x_fine, y_fine], axis=-1)
+    sub_segments = np.stack([points[:, :-1], points[:, 1:]], axis=2).reshape(-1, 2, 2)
+    sub_segment_values = ((y_fine[:, :-1] + y_fine[:, 1:]) / 2).ravel()
 
-    file_name = metric_name + "_line_chart.jpg"
-    path_line_chart = pathlib.Path(f"/tmp/{file_name}")#.parent.parent / "tmp" / file_name
+    line_collection = LineCollection(
+        sub_segments,
+        cmap=cmap,
+        norm=mcolors.Normalize(vmin=vmin, vmax=vmax),
+        linewidth=linewidth,
+        capstyle="round",
+        joinstyle="round",
+    )
+    line_collection.set_array(sub_segment_values)
+    ax.add_collection(line_collection)
+    return line_collection
 
-    plt.savefig(path_line_chart, format="jpg")
 
-    # crop the top and bottom sides of the image
-    image = Image.open(path_line_chart)
-    width, height = image.size
-    crop_height = int(height * 0.075)
-    left = 0
-    top = crop_height
-    right = width
-    bottom = height - crop_height * 0.3
-    cropped_image = image.crop((left, top, right, bottom))
-    cropped_image.save(path_line_chart)
+def downsample_time_series(
+    x: np.ndarray, y: np.ndarray, threshold: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce a time series to roughly threshold points while preserving its shape. The interior points
+    are split into evenly sized buckets and only the minimum and maximum of every bucket are kept,
+    along with the first and last points, so peaks and dips survive the reduction
 
+    Args:
+        x(np.ndarray): the time of each point, sorted in ascending order
+        y(np.ndarray): the value of each point
+        threshold(int): the maximum number of points to keep, usually the pixel width of the plot
 
-def generate_stacked_bar_chart_pauses(dict_pauses: Dict) -> None:
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the downsampled time and value arrays
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    number_points = len(x)
+    number_buckets = (threshold - 2) // 2
+    if number_buckets < 1 or number_points <= threshold:
+        return x, y
+
+    # bucket boundaries over the interior points, the first and last points are always kept
+    bucket_edges = np.linspace(1, number_points - 1, number_buckets + 1).astype(int)
+    bucket_ids = np.repeat(np.arange(number_buckets), np.diff(bucket_edges))
+    interior_index = np.arange(1, number_points - 1)
+    interior_y = y[1:-1]
+
+    list_keep = [np.array([0, number_points - 1])]
+    for reducer in [np.minimum, np.maximum]:
+        bucket_extreme = reducer.reduceat(interior_y, bucket_edges[:-1] - 1)
+        is_extreme = interior_y == bucket_extreme[bucket_ids]
+        _, first_extreme = np.unique(bucket_ids[is_extreme], return_index=True)
+        list_keep.append(interior_index[is_extreme][first_extreme])
+
+    index_keep = np.unique(np.concatenate(list_keep))
+    return x[index_keep], y[index_keep]
+
+
+def generate_stacked_bar_chart_pauses(
+    dict_pauses: Dict, quality_profile: str = DEFAULT_QUALITY_PROFILE
+) -> pathlib.Path:
     """
     Create the stacked bar chart based on actual pauses relative to the recommended min and max pauses
 
     Args:
         param1(Dict[]): The candidate's profile and assessment results
+        param2(str): name of the render-quality profile (draft, screen or print)
 
     Returns:
-        None
+        pathlib.Path: path of the stacked bar chart
     """
 
-    fig = plt.figure(figsize=(10, 4))
-
-    keys_categories = [
-        "pauses_count_sensory",
-        "pauses_count_sentence",
-        "pauses_count_transition",
-        "pauses_count_strategic",
-        "pauses_count_long",
-    ]
-
-    categories = [
-        (x.replace("pauses_count_", "") + " pause").title() for x in keys_categories
-    ]
-    values_min = [
-        max(dict_pauses[key]["data"]["recommended"]["min"], 0)
-        for key in keys_categories
-    ]
-    values_max = [
-        dict_pauses[key]["data"]["recommended"]["max"] for key in keys_categories
-    ]
-    values_count = [
-        dict_pauses[key]["data"]["inference"]["count"] for key in keys_categories
-    ]
+    with managed_figure(figsize=(10, 4)) as fig:
+
+        keys_categories = [
+            "pauses_count_sensory",
+            "pauses_count_sentence",
+            "pauses_count_transition",
+            "pauses_count_strategic",
+            "pauses_count_long",
+        ]
+
+        categories = [
+            (x.replace("pauses_count_", "") + " pause").title() for x in keys_categories
+        ]
+        values_min = [
+            max(dict_pauses[key]["data"]["recommended"]["min"], 0)
+            for key in keys_categories
+        ]
+        values_max = [
+            dict_pauses[key]["data"]["recommended"]["max"] for key in keys_categories
+        ]
+        values_count = [
+            dict_pauses[key]["data"]["inference"]["count"] for key in keys_categories
+        ]
     
-    values_max_greater_than_min = [max(0, x[1] - x[0]) for x in zip(values_min, values_max)]
-    values_gap = [max(0, x[1] - x[0]) for x in zip(values_max, values_count)]
+        values_max_greater_than_min = [max(0, x[1] - x[0]) for x in zip(values_min, values_max)]
+        values_gap = [max(0, x[1] - x[0]) for x in zip(values_max, values_count)]
     
-    bar1 = plt.barh(categories, values_min, color="#ACF387")
-    bar2 = plt.barh(categories, values_max_greater_than_min, left=values_min, color="#F9F096")
-    bar3 = plt.barh(categories, values_gap, left=values_max, color="#FC6157")
-    scatter = plt.scatter(x=values_count, y=categories, marker="x", color="#000000")
-
-    plt.legend(
-        [bar1, bar2, bar3, scatter],
-        ["Recommended Min", "Recommended Max", "Gap", "Actual"],
-        loc="upper center",
-        bbox_to_anchor=(0.5, 1.15),
-        ncol=4,
-    )
-    plt.xlabel("Number Of Pauses")
-    plt.tight_layout()
+        ax = fig.add_subplot()
+        bar1 = ax.barh(categories, values_min, color="#ACF387")
+        bar2 = ax.barh(categories, values_max_greater_than_min, left=values_min, color="#F9F096")
+        bar3 = ax.barh(categories, values_gap, left=values_max, color="#FC6157")
+        scatter = ax.scatter(x=values_count, y=categories, marker="x", color="#000000")
+
+        ax.legend(
+            [bar1, bar2, bar3, scatter],
+            ["Recommended Min", "Recommended Max", "Gap", "Actual"],
+            loc="upper center",
+            bbox_to_anchor=(0.5, 1.15),
+            ncol=4,
+        )
+        ax.set_xlabel("Number Of Pauses")
+        fig.tight_layout()
 
-    path_stack_bar_chart = (
-        pathlib.Path("/tmp/pauses_stacked_bar_chart.jpg")#.parent.parent / "tmp" / "pauses_stacked_bar_chart.jpg"
-    )
-    plt.savefig(path_stack_bar_chart)
+        path_stack_bar_chart = (
+            artifact_path("pauses_stacked_bar_chart")#.parent.parent / "tmp" / "pauses_stacked_bar_chart"
+        )
+        return save_chart(
+            fig,
+            path_stack_bar_chart,
+            chart_codecs["pauses_stacked_bar_chart"],
+            quality_profile,
+            chart_placement_widths["pauses_stacked_bar_chart"],
+        )
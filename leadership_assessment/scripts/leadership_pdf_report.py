@@ -1,16 +1,41 @@
 from .graphing import *
 from .edy import *
+from .timeseries import *
+from common.parallel_pdf import *
+from common.fragments import *
+from common.assets import *
+from common.pdf_optimize import *
+from common.thumbnails import *
+from common.artifacts import *
+from common.deadline import *
 from typing import Dict, Union, List
+import contextlib
 import pathlib
 import json
 import os
-import shutil
 import datetime as dt
 import weasyprint
 from jinja2 import Environment, FileSystemLoader
 
-
-def leadership_report(payload: Dict) -> None:
+# fragment template of the narrative section of a skill, by position of the skill
+skill_fragment_templates = {
+    "top_skills": "fragments/top_skill.html",
+    "bottom_skills": "fragments/bottom_skill.html",
+}
+
+# parsed sections of the payload the charts are drawn from, the source nodes of the report graph
+charted_sections = ["skills", "pace", "eye_contact", "sentiment", "smile", "volume", "pause"]
+
+
+def leadership_report(
+    payload: Dict,
+    skill_atlas: bool = True,
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+    parallel_pages: int = 0,
+    incremental: bool = False,
+    thumbnail: Union[str, None] = THUMBNAIL_MODE,
+    optional_charts: bool = True,
+) -> None:
     """
     Generate the interviewer assessment report by parsing the payload
 
@@ -18,23 +43,55 @@ def leadership_report(payload: Dict) -> None:
 
     Args:
         param1(Dict): The candidate's profile and assessment results
+        param2(bool): whether the per-skill gauges are embedded as a single sprite sheet
+        param3(str): name of the render-quality profile used for every chart (draft, screen or print)
+        param4(int): number of worker processes the pages are laid out with, 0 or 1 lays the whole
+        report out in this process
+        param5(bool): whether the charts and pages are kept with the report under
+        REPORT_ARTIFACTS_DIR/<user_id>/<video_id>, so that a re-score of the same video only
+        redraws the charts and lays out the pages whose inputs changed. The report is rendered in
+        full when another render of the same video holds them, see open_report_graph
+        param6(Union[str, None]): preview of the report written next to the pdf (first_page or
+        contact_sheet), painted from the pages that write the pdf. None for no preview
+        param7(bool): whether the line charts of pace and volume are drawn, they are given up
+        anyway when the report runs short of time before its deadline, see common.deadline
 
     Returns:
         None
 
     Raises:
         TypeError: Must receieve nested dictionaries as an argument
+        ValueError: unknown thumbnail mode
 
     Notes:
         The PDF report generated is stored in the results directory
     """
 
+    if thumbnail is not None and thumbnail not in thumbnail_modes:
+        raise ValueError(f"unknown thumbnail mode {thumbnail}, expected one of {thumbnail_modes}")
+
     _validate_payload(payload)
     dict_payload = _parse_payload(payload)
     dict_payload["skills"] = _modify_scores(dict_payload["skills"])
-    _generate_all_graphics(dict_payload)
-    _save_background_pic()
-    report = _generate_final_report(dict_payload)
+    with (
+        open_report_graph(
+            dict_payload["candidate_profile"]["user_id"],
+            dict_payload["candidate_profile"]["video_id"],
+        )
+        if incremental
+        else contextlib.nullcontext()
+    ) as graph:
+        with render_stage("charts", quality_profile):
+            _generate_all_graphics(
+                dict_payload, skill_atlas, quality_profile, graph, optional_charts
+            )
+            dict_payload["asset_directory"] = str(
+                _save_background_pic(quality_profile=quality_profile)
+            )
+        with render_stage("layout", quality_profile):
+            report = _generate_final_report(dict_payload, parallel_pages, graph, thumbnail)
+        if graph is not None:
+            graph.save()
     print(dict_payload["candidate_profile"])
     return report
     # _delete_temp_files()
@@ -222,6 +279,9 @@ def _parse_payload(payload: Dict) -> Dict:
     dict_parsed_data["pace"] = {
         key: payload["speech_rate"][key] for key in list_pace_keys
     }
+    dict_parsed_data["pace"]["timestamp_graph_data"] = ingest_time_series(
+        dict_parsed_data["pace"]["timestamp_graph_data"]
+    )
 
     # pause
     list_pause_keys = [
@@ -279,6 +339,9 @@ def _parse_payload(payload: Dict) -> Dict:
     dict_parsed_data["eye_contact"] = {
         key: payload["looking_at_camera"][key] for key in list_eye_contact_keys
     }
+    dict_parsed_data["eye_contact"]["data"] = ingest_time_series(
+        dict_parsed_data["eye_contact"]["data"]
+    )
 
     # smile
     list_smile_keys = [
@@ -292,6 +355,9 @@ def _parse_payload(payload: Dict) -> Dict:
     dict_parsed_data["smile"] = {
         key: payload["smiling"][key] for key in list_smile_keys
     }
+    dict_parsed_data["smile"]["data"] = ingest_time_series(
+        dict_parsed_data["smile"]["data"]
+    )
 
     # sentiment
     list_sentiment_keys = ["assessment", "measured", "inference", "recommended"]
@@ -304,6 +370,16 @@ def _parse_payload(payload: Dict) -> Dict:
     dict_parsed_data["volume"] = {
         key: payload["power_db"][key] for key in list_volume_keys
     }
+    dict_parsed_data["volume"]["data"] = ingest_time_series(
+        dict_parsed_data["volume"]["data"]
+    )
+
+    # pitch (optional)
+    if "pitch_data" in payload and "data" in payload["pitch_data"]:
+        dict_parsed_data["pitch"] = dict(payload["pitch_data"])
+        dict_parsed_data["pitch"]["data"] = ingest_time_series(
+            dict_parsed_data["pitch"]["data"]
+        )
 
     # skills
     # path_focus_area = (
@@ -355,29 +431,82 @@ def _modify_scores(
     return dict_modified_scores
 
 
-def _generate_all_graphics(paylaod):
+@chart_style(leadership_chart_style)
+def _generate_all_graphics(
+    paylaod,
+    skill_atlas: bool = True,
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+    graph: Union[ReportGraph, None] = None,
+    optional_charts: bool = True,
+):
     """
-    Create all graphics for the report and save them to the /tmp folder for future use. Graphing
+    Create all graphics for the report and save them to the artifacts folder for future use. Graphing
     functions are imported from the graphing.py module
 
     Args:
         param1(Dict):
+        param2(bool): whether the per-skill gauges are saved as a single sprite sheet. The sprite
+        sheet layout is stored in the payload under "skill_atlas"
+        param3(str): name of the render-quality profile used for every chart
+        param4(ReportGraph): graph of the report when it is built incrementally, every chart is
+        then a node that depends on the parsed sections it draws and is only drawn again when they
+        changed
+        param5(bool): whether the line charts are drawn, when there is time left for them
+
+    Notes:
+        The path of every chart is stored in the payload under "charts", the extension of each
+        file depends on the codec chosen for the chart
 
     Returns:
         None
     """
 
+    dict_charts = {}
+    paylaod["charts"] = dict_charts
+
+    if graph is not None:
+        for section in charted_sections:
+            graph.source(f"section_{section}", paylaod[section])
+
     # generate bar chart for focus area/skills
-    generate_skill_score_bar_charts(paylaod["skills"])
+    dict_charts["focus_area_bar_charts"] = run_node(
+        graph,
+        "focus_area_bar_charts",
+        ["section_skills"],
+        generate_skill_score_bar_charts,
+        paylaod["skills"],
+        quality_profile,
+    )
 
     # generate spider plot for focus area
-    generate_focus_area_spider_plot(paylaod["skills"])
+    dict_charts["focus_area_spider_plot"] = run_node(
+        graph,
+        "focus_area_spider_plot",
+        ["section_skills"],
+        generate_focus_area_spider_plot,
+        paylaod["skills"],
+        quality_profile,
+    )
 
     # generate color bar for all skills
-    generate_skill_score_colorbar_plots(paylaod["skills"])
+    skill_gauges = run_node(
+        graph,
+        "skill_gauges",
+        ["section_skills"],
+        generate_skill_score_colorbar_plots,
+        paylaod["skills"],
+        atlas=skill_atlas,
+        quality_profile=quality_profile,
+    )
+    paylaod["skill_atlas"] = skill_gauges if skill_atlas else None
+    dict_charts["skill_gauges"] = {} if skill_atlas else skill_gauges
 
     # generate color bar for pace
-    generate_color_bar_plot(
+    dict_charts["pace_colorbar"] = run_node(
+        graph,
+        "pace_colorbar",
+        ["section_pace"],
+        generate_color_bar_plot,
         metric_name="pace",
         metric_unit_measurement=" words/min",
         metric_average=paylaod["pace"]["measured"]["average"],
@@ -395,31 +524,15 @@ def _generate_all_graphics(paylaod):
             "#FADDB6",
             "#FAC2B6",
         ],
-    )
-
-    # generate line chart for pace
-    generate_line_chart(
-        metric_name="pace",
-        metric_unit_measurement="words/min",
-        metric_average=paylaod["pace"]["measured"]["average"],
-        metric_middle_max=150,
-        metric_middle_min=120,
-        colorbar_min=60,
-        colorbar_max=210,
-        metric_time_series_x_y=paylaod["pace"]["timestamp_graph_data"],
-        colorbar_range=[60, 100, 120, 150, 170, 210],
-        colorbar_colors=[
-            "#FAC2B6",
-            "#FADDB6",
-            "#BBFAB6",
-            "#BBFAB6",
-            "#FADDB6",
-            "#FAC2B6",
-        ],
+        quality_profile=quality_profile,
     )
 
     # generate colorbar for eye contact
-    generate_color_bar_plot(
+    dict_charts["eye_contact_colorbar"] = run_node(
+        graph,
+        "eye_contact_colorbar",
+        ["section_eye_contact"],
+        generate_color_bar_plot,
         metric_name="eye_contact",
         metric_unit_measurement="%",
         metric_average=paylaod["eye_contact"]["average_percentage"],
@@ -430,10 +543,15 @@ def _generate_all_graphics(paylaod):
         bar_annotations={"high": "High", "middle": "Optimal", "low": "Low"},
         colorbar_range=[0, 30, 50, 70, 100],
         colorbar_colors=["#FAC2B6", "#FADDB6", "#BBFAB6", "#BBFAB6", "#FADDB6"],
+        quality_profile=quality_profile,
     )
 
     # generate colorbar for sentiment
-    generate_color_bar_plot(
+    dict_charts["sentiment_colorbar"] = run_node(
+        graph,
+        "sentiment_colorbar",
+        ["section_sentiment"],
+        generate_color_bar_plot,
         metric_name="sentiment",
         metric_unit_measurement="%",
         metric_average=100 * paylaod["sentiment"]["measured"]["average"]
@@ -446,10 +564,15 @@ def _generate_all_graphics(paylaod):
         bar_annotations={"high": "Positive", "middle": "Neutral", "low": "Negative"},
         colorbar_range=[0, 30, 50, 85, 100],
         colorbar_colors=["#FAC2B6", "#FADDB6", "#FADDB6", "#BBFAB6", "#BBFAB6"],
+        quality_profile=quality_profile,
     )
 
     # generate colorbar for smile
-    generate_color_bar_plot(
+    dict_charts["smile_colorbar"] = run_node(
+        graph,
+        "smile_colorbar",
+        ["section_smile"],
+        generate_color_bar_plot,
         metric_name="smile",
         metric_unit_measurement="%",
         metric_average=100 * paylaod["smile"]["average_percentage"]
@@ -462,10 +585,15 @@ def _generate_all_graphics(paylaod):
         bar_annotations={"high": "Positive", "middle": "Neutral", "low": "Negative"},
         colorbar_range=[0, 30, 50, 85, 100],
         colorbar_colors=["#FAC2B6", "#FADDB6", "#FADDB6", "#BBFAB6", "#BBFAB6"],
+        quality_profile=quality_profile,
     )
 
     # generate colorbar for volume
-    generate_color_bar_plot(
+    dict_charts["volume_colorbar"] = run_node(
+        graph,
+        "volume_colorbar",
+        ["section_volume"],
+        generate_color_bar_plot,
         metric_name="volume",
         metric_unit_measurement=" dB",
         metric_average=paylaod["volume"]["inference"]["result"]["average_power"],
@@ -485,44 +613,93 @@ def _generate_all_graphics(paylaod):
             "#FAC2B6",
             "#FB9993",
         ],
+        quality_profile=quality_profile,
     )
 
-    # generate line chart for volume
-    generate_line_chart(
-        metric_name="volume",
-        metric_unit_measurement="Decibels",
-        metric_average=paylaod["volume"]["inference"]["result"]["average_power"],
-        metric_middle_max=80,
-        metric_middle_min=60,
-        colorbar_min=0,
-        colorbar_max=150,
-        metric_time_series_x_y=paylaod["volume"]["data"],
-        colorbar_range=[0, 30, 50, 60, 80, 90, 100, 150],
-        colorbar_colors=[
-            "#FB9993",
-            "#FAC2B6",
-            "#FADDB6",
-            "#BBFAB6",
-            "#BBFAB6",
-            "#FADDB6",
-            "#FAC2B6",
-            "#FB9993",
-        ],
+    # generate bar chart for pauses
+    dict_charts["pauses_stacked_bar_chart"] = run_node(
+        graph,
+        "pauses_stacked_bar_chart",
+        ["section_pause"],
+        generate_stacked_bar_chart_pauses,
+        paylaod["pause"],
+        quality_profile,
     )
 
-    # generate bar chart for pauses
-    generate_stacked_bar_chart_pauses(paylaod["pause"])
+    # the line charts are the first charts a report short of time gives up, the color bars
+    # above them carry the result
+    if not optional_charts or not deadline_allows("optional_charts", quality_profile):
+        return
+    with render_stage("optional_charts", quality_profile):
+        # generate line chart for pace
+        dict_charts["pace_line_chart"] = run_node(
+            graph,
+            "pace_line_chart",
+            ["section_pace"],
+            generate_line_chart,
+            metric_name="pace",
+            metric_unit_measurement="words/min",
+            metric_average=paylaod["pace"]["measured"]["average"],
+            metric_middle_max=150,
+            metric_middle_min=120,
+            colorbar_min=60,
+            colorbar_max=210,
+            metric_time_series_x_y=paylaod["pace"]["timestamp_graph_data"],
+            colorbar_range=[60, 100, 120, 150, 170, 210],
+            colorbar_colors=[
+                "#FAC2B6",
+                "#FADDB6",
+                "#BBFAB6",
+                "#BBFAB6",
+                "#FADDB6",
+                "#FAC2B6",
+            ],
+            quality_profile=quality_profile,
+        )
+
+        # generate line chart for volume
+        dict_charts["volume_line_chart"] = run_node(
+            graph,
+            "volume_line_chart",
+            ["section_volume"],
+            generate_line_chart,
+            metric_name="volume",
+            metric_unit_measurement="Decibels",
+            metric_average=paylaod["volume"]["inference"]["result"]["average_power"],
+            metric_middle_max=80,
+            metric_middle_min=60,
+            colorbar_min=0,
+            colorbar_max=150,
+            metric_time_series_x_y=paylaod["volume"]["data"],
+            colorbar_range=[0, 30, 50, 60, 80, 90, 100, 150],
+            colorbar_colors=[
+                "#FB9993",
+                "#FAC2B6",
+                "#FADDB6",
+                "#BBFAB6",
+                "#BBFAB6",
+                "#FADDB6",
+                "#FAC2B6",
+                "#FB9993",
+            ],
+            quality_profile=quality_profile,
+        )
 
 
-def _save_background_pic(old_path_background_pic=None) -> None:
+def _save_background_pic(
+    old_path_background_pic=None, quality_profile: str = DEFAULT_QUALITY_PROFILE
+) -> pathlib.Path:
     """
-    Save the background picture to the /tmp folder in order to be referenced by the html file
+    Save the background picture to the directory of the quality profile in order to be referenced
+    by the html file. The picture is resampled to the letter page it covers at the resolution of
+    the quality profile, and only written again when its source changed
 
     Args:
         optional_arg (pathlib.Path): path to background picture
+        optional_arg (str): name of the render-quality profile
 
     Returns:
-        None
+        pathlib.Path: the directory the html file references the picture in
     """
     # provide a path to the background pic or I'll just assume it's in the resources folder
     if old_path_background_pic is None:
@@ -530,26 +707,31 @@ def _save_background_pic(old_path_background_pic=None) -> None:
             pathlib.Path(__file__).parent.parent / "resources" / "background.jpg"
         )
 
-    new_path_background_pic = pathlib.Path(
-        "/tmp/background.jpg"
-    )  # .parent.parent / "tmp" / "background.jpg"
-    shutil.copy(old_path_background_pic, new_path_background_pic)
+    return prepare_static_assets(
+        {"background.jpg": (old_path_background_pic, (8.5, 11))}, quality_profile
+    )
 
 
-def _generate_final_report(dict_payload) -> None:
+def _generate_final_report(
+    dict_payload,
+    parallel_pages: int = 0,
+    graph: Union[ReportGraph, None] = None,
+    thumbnail: Union[str, None] = None,
+) -> None:
     """
     Generate final report by first generating the html code and then the corresponding pdf report
 
     Args:
         param1(Dict[str, str]): a dictionary representing the candidate's scores
-        param2(Dict[str, Dict[str, Union[float, int]]]): a nested dictionary that corresponds to
-        the score receieved for each focus area/skill
+        param2(int): number of worker processes the pages are laid out with
+        param3(ReportGraph): graph of the report when it is built incrementally
+        param4(Union[str, None]): preview of the report written next to the pdf
 
     Returns:
         None
     """
     _generate_html(dict_payload)
-    return _generate_pdf(dict_payload)
+    return _generate_pdf(dict_payload, parallel_pages, graph, thumbnail)
 
 
 def _generate_html(dict_payload: Dict) -> None:
@@ -568,20 +750,39 @@ def _generate_html(dict_payload: Dict) -> None:
     template = env.get_template("pilot.html")
 
     dict_bottom_top_skills = _get_bottom_and_top_skills(dict_payload["skills"])
+    dict_bottom_top_skills_text = _get_text_for_top_and_bottom_skills(
+        dict_bottom_top_skills
+    )
+
+    # the narrative section of a skill only depends on the text of the skill, it is rendered
+    # once per content version and the template only stitches the sections together
+    dict_skill_fragments = {
+        skill_position: {
+            skill: render_fragment(
+                path_templates,
+                skill_fragment_templates[skill_position],
+                {"skill": skill, "text": dict_text},
+            )
+            for skill, dict_text in dict_skills.items()
+        }
+        for skill_position, dict_skills in dict_bottom_top_skills_text.items()
+    }
 
     payload = {
         "dict_payload": dict_payload,
         "dict_bottom_top_skills": dict_bottom_top_skills,
-        "dict_bottom_top_skills_text": _get_text_for_top_and_bottom_skills(
-            dict_bottom_top_skills
-        ),
+        "dict_bottom_top_skills_text": dict_bottom_top_skills_text,
+        "dict_skill_fragments": dict_skill_fragments,
         "dict_all_skills_description": _get_all_skills_description(dict_payload["skills"]),
+        "dict_skill_atlas": dict_payload.get("skill_atlas"),
+        "dict_charts": dict_payload["charts"],
         "date": dt.date.today().strftime("%Y-%b-%d"),
+        "asset_directory": dict_payload.get("asset_directory", str(asset_directory())),
     }
     rendered_template = template.render(payload)
 
-    path_rendered_template = pathlib.Path(
-        "/tmp/rendered_template.html"
+    path_rendered_template = artifact_path(
+        "rendered_template.html"
     )  # .parent.parent / "tmp" / "rendered_template.html"
 
     with open(path_rendered_template, "w") as file:
@@ -675,12 +876,23 @@ def _get_all_skills_description(payload_skills: Dict[str, List[str]]) -> Dict[st
     return dict_skills_text_cleaned
 
 
-def _generate_pdf(dict_payload: Dict) -> None:
+def _generate_pdf(
+    dict_payload: Dict,
+    parallel_pages: int = 0,
+    graph: Union[ReportGraph, None] = None,
+    thumbnail: Union[str, None] = None,
+) -> None:
     """
-    Creates the final PDF file and saves to the results folder
+    Creates the final PDF file, optimized for size by optimize_pdf, and saves to the results folder
 
     Args:
         param1(Dict[str, int | str]]): The candidate's profile
+        param2(int): number of worker processes the pages are laid out with. The html is split at
+        its page breaks and the pages of every chunk are merged back in order
+        param3(ReportGraph): graph of the report when it is built incrementally, every article is
+        then a node that is only laid out again when its html, its charts or its page offset changed
+        param4(Union[str, None]): preview of the report written next to the pdf (first_page or
+        contact_sheet), painted from the same layout as the pdf
 
     Returns:
         None
@@ -696,14 +908,30 @@ def _generate_pdf(dict_payload: Dict) -> None:
     report_filename = f"{video_id}"  # "_".join([name, company, date_today_string])
     report_filename += ".pdf"
 
-    path_html_file = pathlib.Path(
-        "/tmp/rendered_template.html"
+    path_html_file = artifact_path(
+        "rendered_template.html"
     )  # .parent.parent / "tmp" / "rendered_template.html"
-    path_pdf_report = pathlib.Path(
-        f"/tmp/{report_filename}"
+    path_pdf_report = artifact_path(
+        report_filename
     )  # .parent.parent / "results" / report_filename
 
-    weasyprint.HTML(path_html_file).write_pdf(path_pdf_report)
+    if graph is not None:
+        write_pdf_incremental(
+            path_html_file.read_text(), path_pdf_report, str(path_html_file), graph, thumbnail
+        )
+    elif parallel_pages > 1:
+        write_pdf_parallel(
+            path_html_file.read_text(),
+            path_pdf_report,
+            str(path_html_file),
+            parallel_pages,
+            thumbnail,
+        )
+    else:
+        document = weasyprint.HTML(path_html_file, url_fetcher=asset_url_fetcher).render()
+        document.write_pdf(path_pdf_report)
+        write_thumbnail(document, path_pdf_report, thumbnail)
+    optimize_pdf(path_pdf_report)
     return path_pdf_report
 
 
@@ -717,7 +945,7 @@ def _delete_temp_files() -> None:
     Returns:
         None
     """
-    directory = pathlib.Path("/tmp")  # .parent.parent / "tmp"
+    directory = artifacts_directory()  # .parent.parent / "tmp"
 
     # Get a list of all files in the directory
     file_list = os.listdir(directory)
@@ -0,0 +1,47 @@
+from typing import Dict, List, Union
+import numpy as np
+
+# name of the time field of each metric in the payload and its unit in milliseconds
+time_fields = {"millisec": 1, "sec": 1000}
+
+
+def ingest_time_series(
+    list_points: Union[List[Dict[str, Union[int, float, str]]], Dict[str, np.ndarray]]
+) -> Dict[str, np.ndarray]:
+    """
+    Converts a metric time series from a list of small dictionaries into contiguous arrays, one
+    per field. The time field is always stored under "time" in milliseconds and the measurement
+    under "value", any other field keeps its name. Numeric fields are stored as float arrays and
+    text fields (e.g. the assessment of each point) as string arrays
+
+    Args:
+        param(Union[List[Dict[str, Union[int, float, str]]], Dict[str, np.ndarray]]): the time series
+        as found in the payload, a series that was already ingested is returned as is
+
+    Returns:
+        Dict[str, np.ndarray]: the time series with one array per field
+    """
+    if isinstance(list_points, dict):
+        return list_points
+
+    number_points = len(list_points)
+    list_fields = list(list_points[0].keys()) if number_points else []
+    time_field = next((field for field in time_fields if field in list_fields), None)
+
+    dict_series = {
+        "time": np.zeros(number_points, dtype=float),
+        "value": np.zeros(number_points, dtype=float),
+    }
+    for field in list_fields:
+        column = [point.get(field, np.nan) for point in list_points]
+        try:
+            array = np.fromiter(column, dtype=float, count=number_points)
+        except (TypeError, ValueError):
+            array = np.array([str(value) for value in column])
+
+        if field == time_field:
+            dict_series["time"] = array * time_fields[time_field]
+        else:
+            dict_series[field] = array
+
+    return dict_series
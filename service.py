@@ -0,0 +1,206 @@
+"""
+Serves the reports over http from a long-running container, for the tenants whose volume makes the
+cold starts of the lambda handler too costly
+
+    python service.py [--host HOST] [--port PORT]
+
+Everything the reports load (modules, templates, fonts, catalogs, static pages, resampled images)
+is loaded once, then SERVICE_WORKERS worker processes are forked and share it copy-on-write. A
+report is requested by posting the message of the handler:
+
+    POST /generate_pdf            returns the pdf
+    POST /generate_pdf?upload=1   uploads and emails the report like the handler, returns its key
+
+At most SERVICE_QUEUE_SIZE requests wait for a worker, the others get a 429 to retry later. A
+report that is not done SERVICE_REPORT_TIMEOUT seconds after its request arrived (the wait for a
+worker and for memory included) gets a 504, its worker is replaced when it runs longer than that,
+and every worker is replaced after SERVICE_MAX_REPORTS_PER_WORKER reports, reports are planned to
+finish within that timeout the way the handler plans them within the lambda's (see common.deadline).
+Reports only start while the memory they are expected to use fits under ADMISSION_MEMORY_CEILING
+(see common.admission), so the number rendering at once follows the memory of the node. GET
+/health returns the state of the workers
+"""
+import argparse
+import concurrent.futures
+import gc
+import json
+import os
+import pathlib
+import queue
+import shutil
+import time
+from flask import Flask, Response, jsonify, request
+import index
+from common.admission import *
+from common.artifacts import *
+from common.deadline import *
+from common.worker_pool import *
+
+SERVICE_WORKERS = int(os.environ.get("SERVICE_WORKERS", os.cpu_count()))
+SERVICE_QUEUE_SIZE = int(os.environ.get("SERVICE_QUEUE_SIZE", 2 * SERVICE_WORKERS))
+SERVICE_REPORT_TIMEOUT = float(os.environ.get("SERVICE_REPORT_TIMEOUT", 120))
+SERVICE_MAX_REPORTS_PER_WORKER = int(os.environ.get("SERVICE_MAX_REPORTS_PER_WORKER", 200))
+
+# seconds a client turned away is told to wait before retrying
+SERVICE_RETRY_AFTER = 5
+
+app = Flask(__name__)
+pool = None
+
+
+def _worker_directory(pid: int) -> pathlib.Path:
+    return artifacts_directory() / f"service-worker-{pid}"
+
+
+def _start_worker() -> None:
+    """
+    Gives every worker its own artifacts directory, the file names of the reports are fixed
+    """
+    set_artifacts_directory(_worker_directory(os.getpid()))
+
+
+def _remove_worker(pid: int) -> None:
+    """
+    Removes the artifacts directory of a worker once it has exited, along with the files of the
+    report it was killed in the middle of
+    """
+    shutil.rmtree(_worker_directory(pid), ignore_errors=True)
+
+
+def _render_report(data, upload, arrival):
+    """
+    Generates a report in a worker process, planned to be done SERVICE_REPORT_TIMEOUT seconds
+    after its request arrived, the time it waited for a worker and for memory included
+
+    Args:
+        param1(Dict): the message of the handler
+        param2(bool): whether the report is uploaded and emailed like the handler does
+        param3(float): when the request arrived, time.time()
+
+    Returns:
+        Dict: the key of the uploaded report, or the file name and content of the pdf, and what
+        the report gave up to meet its deadline
+    """
+    # the files of the report (named after the candidate) are removed once it is sent
+    remaining = SERVICE_REPORT_TIMEOUT - (time.time() - arrival)
+    with render_budget(RenderBudget(remaining)), report_artifacts(
+        str(data["user_id"]), str(data.get("video_id"))
+    ) as directory:
+        try:
+            payload, generate_pdf = index._generate_report(data)
+            if upload:
+                payload = index.deliver_report(payload, generate_pdf)
+                return {
+                    "bucket_name": payload["bucket_name"],
+                    "blob_name": payload["blob_name"],
+                    "degradations": payload.get("degradations", ""),
+                    "peak_memory": payload["peak_memory"],
+                }
+            path_pdf = pathlib.Path(generate_pdf)
+            return {
+                "filename": path_pdf.name,
+                "pdf": path_pdf.read_bytes(),
+                "degradations": payload.get("degradations", ""),
+                "peak_memory": payload["peak_memory"],
+            }
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def start_pool(workers=SERVICE_WORKERS, queue_size=SERVICE_QUEUE_SIZE):
+    """
+    Loads everything the reports share and forks the workers
+
+    Args:
+        param1(int): number of worker processes
+        param2(int): number of requests that wait for a worker before the others are turned away
+
+    Returns:
+        WarmWorkerPool: the pool
+    """
+    global pool
+    index.warm_up()
+    # what was loaded so far is never freed, moving it out of the garbage collector keeps the
+    # collections of the workers from writing to (and so copying) the pages they share
+    gc.collect()
+    gc.freeze()
+    pool = WarmWorkerPool(
+        _render_report,
+        workers,
+        queue_size,
+        timeout=SERVICE_REPORT_TIMEOUT,
+        max_calls=SERVICE_MAX_REPORTS_PER_WORKER,
+        initializer=_start_worker,
+        admission=AdmissionController(),
+        finalizer=_remove_worker,
+    )
+    return pool
+
+
+def _error(message, status_code):
+    error = jsonify({"error": message})
+    error.status_code = status_code
+    return error
+
+
+@app.route("/generate_pdf", methods=["POST"])
+@app.route("/leadership_reporting/generate_interview_questions_pdf", methods=["POST"])
+@app.route("/recruitment_reporting/generate_interview_questions_pdf", methods=["POST"])
+def generate_pdf_endpoint():
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and "Records" in data:
+        data = data["Records"][0]["Sns"]["Message"]
+        data = data if isinstance(data, dict) else json.loads(data)
+    if not isinstance(data, dict) or not data.get("user_id"):
+        return _error("no user id given", 400)
+    upload = request.args.get("upload", "").lower() in ("1", "true")
+
+    # the timeout runs from the arrival of the request, waiting for a worker and memory included.
+    # wall-clock time, the worker compares it with its own clock
+    arrival = time.time()
+    try:
+        future = pool.submit(data, upload, arrival)
+    except queue.Full:
+        error = _error("too many reports in progress, retry later", 429)
+        error.headers["Retry-After"] = str(SERVICE_RETRY_AFTER)
+        return error
+    try:
+        result, seconds = future.result(
+            timeout=max(0.0, SERVICE_REPORT_TIMEOUT - (time.time() - arrival))
+        )
+    except concurrent.futures.TimeoutError as e:
+        # the report is dropped when it is still waiting, when it is running its worker is
+        # replaced at its own timeout
+        future.cancel()
+        return _error(str(e) or f"no report after {SERVICE_REPORT_TIMEOUT} seconds", 504)
+    except Exception as e:
+        return _error(str(e), 500)
+
+    if upload:
+        return jsonify({**result, "seconds": round(seconds, 3)})
+    return Response(
+        result["pdf"],
+        mimetype="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="{result["filename"]}"',
+            "X-Render-Seconds": f"{seconds:.3f}",
+            "X-Report-Degraded": result["degradations"],
+        },
+    )
+
+
+@app.route("/health", methods=["GET"])
+def health_endpoint():
+    if pool is None:
+        return _error("starting", 503)
+    return jsonify(pool.status())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves the reports over http")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8080)))
+    args = parser.parse_args()
+    start_pool()
+    # the requests only wait for the workers, a thread each is enough
+    app.run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,354 @@
+from typing import Dict, List, Union
+import datetime as dt
+import pathlib
+from common.direct_pdf import *
+
+# colors of pilot.css
+COLOR_BLUE = "#106ba8"
+COLOR_HEADING = "#0d0c0c"
+COLOR_RULE = "#cbd5e0"
+COLOR_CHECKLIST = "#487fe4"
+
+# table of contents of the report, with the anchor each entry links to
+contents_entries = [
+    ("ADMINISTRATOR CHECKLIST", "page1"),
+    ("SUMMARY", "page2"),
+    ("POTENTIAL STRENGTHS", "page3"),
+    ("DEVELOPMENT CONSIDERATIONS", "page4"),
+    ("BEHAVIORAL INSIGHTS AND SUGGESTIONS", "page5"),
+    ("DISCLAIMER AND COPYRIGHT", "page7"),
+]
+
+checklist_text = {
+    "introduction": "This report is designed to help you gain insights into the technical and "
+    "behavioral skills of the candidate in the context of the job description. It assists the "
+    "Administrator in probing more deeply into specific areas",
+    "before": [
+        "Review job requirements, the candidate's resume and this Talent Insights Report",
+        "Review the resume and screen the candidate to clarify skills and match",
+        "Review the insights and understand nature of responses you expect",
+    ],
+    "after": "Review the insights in this Report, skills’ scores, strengths and improvement "
+    "opportunities, and your observations.",
+}
+
+# the intellectual property paragraph of pilot.html names the company through a variable that the
+# template is never given, the same words are left empty here
+disclaimer_text = {
+    "disclaimer": "This report is a property of {company} and the information provided in the "
+    "report is to be used only by the individual or entity to which it is addressed, else you are "
+    "hereby notified that any dissemination, distribution or copying of this communication is "
+    "strictly prohibited. The interpretive information contained in this report should be viewed "
+    "as only one source of hypotheses about the individual/ group being evaluated. No decisions "
+    "should be based solely on the information contained in this report. Any interpretation of "
+    "this report should take into account ALL relevant input such as actual experience, skills, "
+    "interests, abilities, the market being addressed and product being sold. This material "
+    "should be integrated with all other sources of information in reaching professional "
+    "decisions about this individual. This report is confidential and intended for use by "
+    "qualified professionals only.",
+    "intellectual_property": "The content and services of {company}, as well as their selection "
+    "and arrangement, are protected by copyright, trademark, patent, and/or other intellectual "
+    "property laws, and any unauthorized use of the Content or Services may violate such laws "
+    "and these Terms of Use. Except as expressly implied in these Terms of Use, {unnamed} does "
+    "not grant any express rights to use the Content and/or Services. You have agreed not to "
+    "copy, republish, frame, download, transmit, modify, rent, lease, loan, sell, assign, "
+    "distribute, license, sublicense, reverse engineer, or create derivative works based on the "
+    "Site, its Content, or its Services or their selection and arrangement, except as expressly "
+    "authorized in these Terms of Use. In addition, you have agreed not to use any data mining, "
+    "robots, or similar data gathering and extraction methods in connection with the {unnamed} "
+    "database.",
+}
+
+# font size (pt) and bottom margin (px) of the headings of pilot.css
+heading_styles = {1: (16, 0), 2: (14, 10), 3: (12, 0), 4: (10, 0)}
+
+
+def _heading(
+    document: DirectPdf,
+    text: str,
+    level: int,
+    color: str = COLOR_HEADING,
+    anchor: Union[str, None] = None,
+    size: Union[float, None] = None,
+    align: str = "left",
+) -> None:
+    """
+    Heading of pilot.css: bold, h1 in upper case, h1 and h2 underlined by a light rule
+    """
+    heading_size, margin_bottom = heading_styles[level]
+    size = size or heading_size
+    document.ensure_space(2 * size * 1.25)
+    if anchor:
+        document.anchor(anchor)
+    document.paragraph(text.upper() if level == 1 else text, size, True, color, align)
+    if level <= 2:
+        document.rule(COLOR_RULE, 2 * CSS_PX)
+    document.space(margin_bottom * CSS_PX)
+
+
+def _text(document: DirectPdf, text: str, color: Union[str, None] = None, bold: bool = False) -> None:
+    """
+    Paragraph of pilot.css, separated from its neighbours by one em
+    """
+    document.space(10)
+    document.paragraph(text, 10, bold, color)
+    document.space(10)
+
+
+def _line_break(document: DirectPdf) -> None:
+    document.space(10 * 1.25)
+
+
+def _bullets(document: DirectPdf, list_items: List[str]) -> None:
+    document.space(10)
+    for item in list_items:
+        document.paragraph(item, 10, indent=40 * CSS_PX, bullet="•")
+    document.space(10)
+
+
+def _end_section(document: DirectPdf) -> None:
+    # every section of pilot.css has a 2cm bottom margin
+    document.space(20 * MM)
+
+
+def _break_page(document: DirectPdf) -> None:
+    """
+    Forced page break, a break right after another one does not leave an empty page
+    """
+    if document.y > document.margin:
+        document.new_page()
+
+
+def _cover(document: DirectPdf, dict_candidate: Dict[str, str], path_front_page: str) -> None:
+    document.new_page(footer=False, margin=0)
+    document.background(path_front_page)
+
+    x = 6.4 * 10 * MM
+    width = document.width - x
+    document.y = 14 * 10 * MM
+    for index, (text, size) in enumerate(
+        [
+            ("Talent Insights Report", 30),
+            (dict_candidate["name"].upper(), 18),
+            (str(dt.date.today()), 18),
+        ]
+    ):
+        document.space(size if index != 2 else 0)
+        for line in wrap_text(text, size, width, True):
+            document.draw_text(x, document.y, line, size, True, COLOR_BLUE)
+            document.y += size * 1.25
+        document.space(size)
+        if index == 0:
+            _line_break(document)
+
+
+def _contents(document: DirectPdf) -> None:
+    _break_page(document)
+    _heading(document, "Contents", 2, COLOR_BLUE)
+    document.space(10)
+    for label, anchor in contents_entries:
+        width = text_width(label, 12, True)
+        document.link(document.left, document.y, width, 12 * 1.25, anchor)
+        document.paragraph(label, 12, True, "#010101")
+        _line_break(document)
+    _end_section(document)
+
+
+def _checklist(document: DirectPdf, path_tips: str, path_after_interview: str) -> None:
+    _break_page(document)
+    _heading(document, "ADMINISTRATOR CHECKLIST", 1, COLOR_BLUE, anchor="page1")
+    _text(document, checklist_text["introduction"])
+
+    _heading(document, "Before The Interaction", 2, COLOR_BLUE)
+    column_width = document.content_width / len(checklist_text["before"])
+    padding = 3 * MM
+    top, bottom = document.y, document.y
+    for index, text in enumerate(checklist_text["before"]):
+        document.y = top + padding
+        indent = index * column_width + padding
+        document.paragraph(
+            str(index + 1), 14, True, COLOR_CHECKLIST, "center", indent, column_width - 2 * padding
+        )
+        document.space(10)
+        document.paragraph(text, 10, indent=indent, width=column_width - 2 * padding)
+        bottom = max(bottom, document.y + 10 + padding)
+    document.y = bottom
+
+    _heading(document, "Tips For the Administrator", 2, COLOR_BLUE)
+    document.space(5 * MM)
+    document.image(path_tips, width=0.7 * document.content_width)
+    document.space(5 * MM)
+    _heading(document, "After The Interaction", 2, COLOR_BLUE)
+    _text(document, checklist_text["after"])
+    document.space(5 * MM)
+    document.image(path_after_interview, width=0.7 * document.content_width)
+    document.space(5 * MM)
+    _end_section(document)
+
+
+def _summary(document: DirectPdf, dict_charts: Dict) -> None:
+    _break_page(document)
+    _heading(document, "SUMMARY", 1, COLOR_BLUE, anchor="page2")
+    _line_break(document)
+    _heading(document, "Requirement Match", 3, COLOR_BLUE)
+    _text(document, "Resume match to the requirement", COLOR_BLUE)
+    document.image(dict_charts["job_fitment_graphic"], width=0.9 * document.content_width)
+    _text(document, "S - Candidate's match score", COLOR_BLUE)
+    _line_break(document)
+    _line_break(document)
+    _heading(document, "Behavioral Skills Assessment Summary", 3, COLOR_BLUE)
+    document.image(dict_charts["baseline_assessment"], width=0.7 * document.content_width)
+    _end_section(document)
+
+
+def _skill_summaries(
+    document: DirectPdf,
+    title: str,
+    anchor: str,
+    list_skills: List[str],
+    dict_report_text: Dict,
+    section: str,
+) -> None:
+    _break_page(document)
+    if list_skills:
+        _heading(document, title, 1, COLOR_BLUE, anchor=anchor)
+        _line_break(document)
+        _heading(document, "Behavioral Skills", 3, COLOR_BLUE)
+        _line_break(document)
+    for skill in list_skills:
+        _heading(document, skill, 4, COLOR_BLUE)
+        _text(document, dict_report_text[skill][section]["Summary"], COLOR_BLUE)
+        _bullets(document, dict_report_text[skill][section]["Details"])
+    _end_section(document)
+
+
+def _skill_questions(
+    document: DirectPdf,
+    list_skills: List[str],
+    level: str,
+    dict_report_text: Dict,
+    dict_gauges: Dict[str, pathlib.Path],
+) -> None:
+    """
+    One page per skill: the skill and its gauge side by side, followed by the interview questions
+    """
+    for skill in list_skills:
+        # the header is a flex row with space-around, both items vertically centered
+        label = f"{skill.upper()}: {level}"
+        gauge_height = 35 * MM
+        pixel_width, pixel_height = image_size(dict_gauges[skill])
+        gauge_width = gauge_height * pixel_width / pixel_height
+        label_width = min(text_width(label, 12, True), document.content_width - gauge_width)
+        gap = (document.content_width - label_width - gauge_width) / 4
+        document.ensure_space(gauge_height)
+        top = document.y
+        document.y = top + (gauge_height - 12 * 1.25) / 2
+        document.paragraph(label, 12, True, COLOR_HEADING, indent=gap, width=label_width)
+        document.draw_image(
+            dict_gauges[skill],
+            document.left + 3 * gap + label_width,
+            top,
+            gauge_width,
+            gauge_height,
+        )
+        document.y = top + gauge_height
+
+        for index, questions in enumerate(dict_report_text[skill]["Interview Questions"], start=1):
+            _text(document, f"{index}. {questions['Initial']}")
+            _text(document, "Probing Questions", bold=True)
+            _bullets(document, questions["Details"])
+            _line_break(document)
+        _end_section(document)
+        _break_page(document)
+
+
+def _disclaimer(document: DirectPdf, dict_candidate: Dict[str, str]) -> None:
+    _break_page(document)
+    document.anchor("page7")
+    document.paragraph("Disclaimer and Copyright", 12, True, COLOR_BLUE)
+    document.rule(COLOR_BLUE, 0.75, text_width("Disclaimer and Copyright", 12, True))
+    _line_break(document)
+    _heading(document, "Disclaimer", 4)
+    _text(document, disclaimer_text["disclaimer"].format(company=dict_candidate["company"]))
+    _line_break(document)
+    _heading(document, "Intellectual Property", 4)
+    _text(
+        document,
+        disclaimer_text["intellectual_property"].format(
+            company=dict_candidate["company"], unnamed=""
+        ),
+    )
+    _end_section(document)
+
+
+def layout_direct_report(
+    dict_candidate: Dict[str, str],
+    list_top_skills: List[str],
+    list_bottom_skills: List[str],
+    dict_report_text: Dict,
+    dict_charts: Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]],
+    path_resources: Union[str, pathlib.Path],
+) -> DirectPdf:
+    """
+    Lays the talentinsights report out with absolute positioning, following the layout of
+    pilot.html and pilot.css without going through html and css layout. The standard helvetica
+    fonts stand in for the fonts of the stylesheet
+
+    Args:
+        param1(Dict[str, str]): the candidate's profile
+        param2(List[str]): the top skills, in score order
+        param3(List[str]): the bottom skills, in score order
+        param4(Dict): the text of every top and bottom skill
+        param5(Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]]): the path of every chart,
+        which must be raster images
+        param6(Union[str, pathlib.Path]): directory of the pictures of the report, the directory
+        of its quality profile
+
+    Returns:
+        DirectPdf: the laid out report, ready to be written
+
+    Raises:
+        ValueError: a chart is a vector image
+    """
+    list_charts = [
+        dict_charts["job_fitment_graphic"],
+        dict_charts["baseline_assessment"],
+        *dict_charts["skill_gauges"].values(),
+    ]
+    if any(pathlib.Path(path_chart).suffix == ".svg" for path_chart in list_charts):
+        raise ValueError("the direct pdf backend can only embed raster charts")
+
+    path_resources = pathlib.Path(path_resources)
+    document = DirectPdf("letter")
+    _cover(document, dict_candidate, path_resources / "front_page.jpg")
+    _contents(document)
+    _checklist(
+        document, path_resources / "tips.jpg", path_resources / "after_interview_pic.jpg"
+    )
+    _summary(document, dict_charts)
+    _skill_summaries(
+        document, "Potential Strengths", "page3", list_top_skills, dict_report_text, "Potential Strength"
+    )
+    _skill_summaries(
+        document,
+        "Developmental Considerations",
+        "page4",
+        list_bottom_skills,
+        dict_report_text,
+        "Development Considerations",
+    )
+
+    _break_page(document)
+    _heading(document, "BEHAVIORAL INSIGHTS AND SUGGESTIONS", 1, COLOR_BLUE, anchor="page5")
+    _line_break(document)
+    _heading(document, "Strength Analysis", 3, COLOR_BLUE)
+    _skill_questions(
+        document, list_top_skills, "HIGH", dict_report_text, dict_charts["skill_gauges"]
+    )
+    _heading(document, "Gap Analysis", 3, COLOR_BLUE)
+    _skill_questions(
+        document, list_bottom_skills, "LOW", dict_report_text, dict_charts["skill_gauges"]
+    )
+
+    _disclaimer(document, dict_candidate)
+    return document
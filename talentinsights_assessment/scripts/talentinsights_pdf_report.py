@@ -1,10 +1,14 @@
-from typing import Dict, Union, List, Tuple
+from typing import Dict, Iterator, Union, List, Tuple
 import pathlib
 import json
 import os
 import shutil
 import datetime as dt
-from PIL import Image
+import collections
+import functools
+import html.parser
+import re
+import time
 import pandas as pd
 import numpy as np
 import matplotlib
@@ -12,19 +16,90 @@ import matplotlib.colors as mcolors
 
 matplotlib.use("Agg")
 from matplotlib import pyplot as plt
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, Template
 
 import weasyprint
+from common.quality import *
+from common.encoding import *
+from common.figures import *
+from common.chart_cache import *
+from common.static_pages import *
+from common.fragments import *
+from common.assets import *
+from common.pdf_optimize import *
+from common.thumbnails import *
+from common.cohort_pdf import *
+from common.artifacts import *
+from common.deadline import *
+from .direct_report import *
+
+# stylesheets copied next to the images of every quality profile, their urls are relative to it
+resources = ["pilot.css"]
+
+# box (width and height in inches, None when only the width constrains it) that each static image
+# is placed in by pilot.css, they are resampled to that size at the resolution of the report
+image_placements = {
+    "front_page.jpg": (8.5, 11),
+    "after_interview_pic.jpg": (0.7 * PAGE_CONTENT_WIDTH, None),
+    "score.jpg": (PAGE_CONTENT_WIDTH, None),
+    "tips.jpg": (0.7 * PAGE_CONTENT_WIDTH, None),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _prepare_images(quality_profile: str = DEFAULT_QUALITY_PROFILE) -> pathlib.Path:
+    """
+    Makes the stylesheet and the static images of the report available in the directory of a
+    quality profile, the images sized to their placement. Done once per process and profile, the
+    first time a report of the profile is laid out (or by index.warm_up), not on import
+
+    Returns:
+        pathlib.Path: the directory the template references them in
+    """
+    path_resources = pathlib.Path(__file__).parent.parent / "resources"
+    prepare_static_files([path_resources / resource for resource in resources], quality_profile)
+    return prepare_static_assets(
+        {
+            image: (path_resources / image, placement)
+            for image, placement in image_placements.items()
+        },
+        quality_profile,
+    )
+
+
+# files (in the directory of the quality profile) the static page group of pilot.html depends on,
+# and the number of pages (the cover) before it
+static_page_resources = ["pilot.css", "tips.jpg", "after_interview_pic.jpg"]
+STATIC_PAGE_OFFSET = 1
 
-resources = ["pilot.css", "front_page.jpg", "after_interview_pic.jpg", "score.jpg", "tips.jpg"]
+# rc parameters every chart of the report is drawn with, see chart_style. the matplotlib defaults
+talentinsights_chart_style = {}
 
-for resource in resources:
-    resource_file = pathlib.Path(__file__).parent.parent / "resources" / resource
-    shutil.copy(resource_file, f"/tmp/{resource}")
+# backends that can write the pdf: the html template laid out by weasyprint, or the pdf written
+# directly with the fixed layout of direct_report.py, see backend_parity_check
+pdf_backends = ["html", "direct"]
+
+# width (in inches) that each chart occupies in the pilot.html template
+chart_placement_widths = {
+    "job_fitment_bar": 0.9 * PAGE_CONTENT_WIDTH,
+    "skill_gauge": 35 / 25.4 * 1.5,
+    "spider_plot": 0.7 * PAGE_CONTENT_WIDTH,
+}
+
+# codec used to encode each chart, palette png for flat colors and jpeg for gradients. charts saved
+# through save_chart can also be kept as svg, python -m common.benchmark compares the formats
+chart_codecs = {
+    "job_fitment_bar": "png",
+    "skill_gauge": "png",
+    "spider_plot": "png",
+}
 
 
 def talentinsights_report(
-    payload: Dict[str, Dict[str, Union[float, int, str]]]
+    payload: Dict[str, Dict[str, Union[float, int, str]]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+    backend: str = "html",
+    thumbnail: Union[str, None] = THUMBNAIL_MODE,
 ) -> None:
     """
     Generate the interviewer assessment report by parsing the payload
@@ -33,17 +108,29 @@ def talentinsights_report(
 
     Args:
         param1(Dict[str, Dict[str, int | str]]): The candidate's profile and assessment results
+        param2(str): name of the render-quality profile used for every chart (draft, screen or print)
+        param3(str): html to lay the template out with weasyprint, direct to write the pdf
+        directly with the fixed layout of the report
+        param4(Union[str, None]): preview of the report written next to the pdf (first_page or
+        contact_sheet), painted from the pages that write the pdf. None for no preview, the direct
+        backend has none either since weasyprint does not lay its pages out
 
     Returns:
         None
 
     Raises:
         TypeError: Must receieve nested dictionaries as an argument
+        ValueError: unknown backend or thumbnail mode
 
     Notes:
         The PDF report generated is stored in the results directory
     """
 
+    if backend not in pdf_backends:
+        raise ValueError(f"unknown pdf backend {backend}, expected one of {pdf_backends}")
+    if thumbnail is not None and thumbnail not in thumbnail_modes:
+        raise ValueError(f"unknown thumbnail mode {thumbnail}, expected one of {thumbnail_modes}")
+
     _validate_payload(payload)
     (
         dict_candidate,
@@ -51,13 +138,79 @@ def talentinsights_report(
         df_all_scores,
         list_series_agent_scores,
     ) = _parse_payload(payload)
-    _generate_job_fitment_bar(dict_job_fitment)
-    _generate_gauge_charts(df_all_scores["Self"])
-    _generate_spider_plot(*list_series_agent_scores)
-    return _generate_final_report(dict_candidate, df_all_scores["Self"])
+    with render_stage("charts", quality_profile):
+        dict_charts = _generate_charts(
+            dict_job_fitment, df_all_scores, list_series_agent_scores, quality_profile
+        )
+        _prepare_images(quality_profile)
+    if backend == "direct":
+        with render_stage("direct_layout", quality_profile):
+            return _generate_pdf_direct(
+                dict_candidate, df_all_scores["Self"], dict_charts, quality_profile
+            )
+    with render_stage("layout", quality_profile):
+        return _generate_final_report(
+            dict_candidate, df_all_scores["Self"], dict_charts, thumbnail, quality_profile
+        )
     # _delete_temp_files()
 
 
+def talentinsights_cohort_report(
+    list_payloads: List[Dict[str, Dict[str, Union[float, int, str]]]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+    cohort_name: str = "cohort",
+) -> pathlib.Path:
+    """
+    Generate the reports of every candidate of a requisition into a single PDF file. Every
+    candidate gets an outline entry, the images and fonts the reports have in common are embedded
+    once, and the candidates are laid out one at a time so that memory does not grow with the
+    size of the cohort
+
+    Args:
+        param1(List[Dict[str, Dict[str, int | str]]]): the profile and assessment results of every
+        candidate, in the order of the pdf
+        param2(str): name of the render-quality profile used for every chart (draft, screen or print)
+        param3(str): name of the pdf, before the date
+
+    Returns:
+        pathlib.Path: path of the pdf
+
+    Raises:
+        TypeError: Must receieve nested dictionaries as an argument
+    """
+    # a malformed payload fails the cohort before any report is laid out
+    for payload in list_payloads:
+        _validate_payload(payload)
+
+    _prepare_images(quality_profile)
+    date_today_string = dt.date.today().strftime("%Y-%m-%d")
+    return write_cohort_pdf(
+        _layout_cohort(list_payloads, quality_profile),
+        artifact_path(f"{cohort_name.replace(' ', '_')}_{date_today_string}.pdf"),
+    )
+
+
+def _layout_cohort(
+    list_payloads: List[Dict[str, Dict[str, Union[float, int, str]]]], quality_profile: str
+) -> Iterator[Tuple[str, weasyprint.Document]]:
+    """
+    Lays the report of every candidate out, one at a time, when write_cohort_pdf asks for it
+    """
+    for payload in list_payloads:
+        (
+            dict_candidate,
+            dict_job_fitment,
+            df_all_scores,
+            list_series_agent_scores,
+        ) = _parse_payload(payload.copy())
+        dict_charts = _generate_charts(
+            dict_job_fitment, df_all_scores, list_series_agent_scores, quality_profile
+        )
+        yield dict_candidate["name"], _layout_report(
+            dict_candidate, df_all_scores["Self"], dict_charts, quality_profile
+        )
+
+
 def _validate_payload(payload: Dict[str, Dict[str, Union[float, int, str]]]) -> None:
     """
     Data validation step to make sure that the input is of the right type
@@ -122,152 +275,188 @@ def _parse_payload(
     return (dict_candidate, dict_job_fitment, df_all_scores, list_series_agent_scores)
 
 
-def _generate_job_fitment_bar(dict_scores: Dict[str, Union[float, int]]) -> None:
+@chart_style(talentinsights_chart_style)
+def _generate_charts(
+    dict_job_fitment: Dict[str, Union[float, int]],
+    df_all_scores: pd.DataFrame,
+    list_series_agent_scores: List[pd.Series],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]]:
     """
-    Creates horizontal gauge chart to show how the employee's resume compared to the job description.
+    Creates every chart of the report
 
     Args:
-        param(Dict[str, Union[float, int]]): a dictionary that corresponds to how close the candidate's
-        resume and the population's resumes compared to the job descriptino
+        param1(Dict[str, Union[float, int]]): how the candidate's resume compared to the job description
+        param2(pd.DataFrame): the scores of every skill
+        param3(List[pd.Series]): the scores of every agent
+        param4(str): name of the render-quality profile (draft, screen or print)
 
     Returns:
-        None
+        Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]]: the path of every chart
     """
+    return {
+        "job_fitment_graphic": _generate_job_fitment_bar(dict_job_fitment, quality_profile),
+        "skill_gauges": _generate_gauge_charts(df_all_scores["Self"], quality_profile),
+        "baseline_assessment": _generate_spider_plot(
+            *list_series_agent_scores, quality_profile=quality_profile
+        ),
+    }
 
-    R1, R2, score = dict_scores["R1"], dict_scores["R2"], dict_scores["S"]
 
-    fig = plt.figure(figsize=(8, 2))
-    ax = fig.add_axes([0.1, 0.35, 0.8, 0.4])
-    ax2 = fig.add_axes([0.1, 0.1, 0.8, 0.25])
-    ax3 = fig.add_axes([0.1, 0.7, 0.8, 0.1])
+@memoize_chart(codec=lambda: chart_codecs["job_fitment_bar"])
+def _generate_job_fitment_bar(
+    dict_scores: Dict[str, Union[float, int]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> pathlib.Path:
+    """
+    Creates horizontal gauge chart to show how the employee's resume compared to the job description.
 
-    left_color = "#FCBEC1"
-    right_color = "#D9FBC8"
-    center_color = "#F4F4F4"
+    Args:
+        param1(Dict[str, Union[float, int]]): a dictionary that corresponds to how close the candidate's
+        resume and the population's resumes compared to the job descriptino
+        param2(str): name of the render-quality profile (draft, screen or print)
 
-    # Create a colormap for the left half (green to white)
-    cmap_left = mcolors.LinearSegmentedColormap.from_list(
-        "LeftCmap", [left_color, center_color]
-    )
+    Returns:
+        pathlib.Path: path of the job fitment bar
+    """
 
-    # Create a colormap for the right half (white to red)
-    cmap_right = mcolors.LinearSegmentedColormap.from_list(
-        "RightCmap", [center_color, right_color]
-    )
+    R1, R2, score = dict_scores["R1"], dict_scores["R2"], dict_scores["S"]
 
-    # white cmap
-    cmap_white = mcolors.LinearSegmentedColormap.from_list(
-        "WhiteCmap", ["white", "white"]
-    )
+    with managed_figure(figsize=(8, 2)) as fig:
+        ax = fig.add_axes([0.1, 0.35, 0.8, 0.4])
+        ax2 = fig.add_axes([0.1, 0.1, 0.8, 0.25])
+        ax3 = fig.add_axes([0.1, 0.7, 0.8, 0.1])
 
-    # Combine the left and right colormaps
-    colors = np.vstack(
-        (cmap_left(np.linspace(0, 1, 256)), cmap_right(np.linspace(0, 1, 256)))
-    )
-    cmap_custom = mcolors.ListedColormap(colors)
+        left_color = "#FCBEC1"
+        right_color = "#D9FBC8"
+        center_color = "#F4F4F4"
 
-    guage_range = np.linspace(0, 100, 512)
+        # Create a colormap for the left half (green to white)
+        cmap_left = mcolors.LinearSegmentedColormap.from_list(
+            "LeftCmap", [left_color, center_color]
+        )
 
-    norm = matplotlib.colors.Normalize(vmin=guage_range[0], vmax=guage_range[-1])
+        # Create a colormap for the right half (white to red)
+        cmap_right = mcolors.LinearSegmentedColormap.from_list(
+            "RightCmap", [center_color, right_color]
+        )
 
-    cbar = matplotlib.colorbar.ColorbarBase(
-        ax,
-        cmap=cmap_custom,
-        norm=norm,
-        orientation="horizontal",
-        boundaries=guage_range,
-    )
+        # white cmap
+        cmap_white = mcolors.LinearSegmentedColormap.from_list(
+            "WhiteCmap", ["white", "white"]
+        )
 
-    cbar2 = matplotlib.colorbar.ColorbarBase(
-        ax2,
-        cmap=cmap_white,
-        norm=norm,
-        orientation="horizontal",
-        boundaries=guage_range,
-    )
+        # Combine the left and right colormaps
+        colors = np.vstack(
+            (cmap_left(np.linspace(0, 1, 256)), cmap_right(np.linspace(0, 1, 256)))
+        )
+        cmap_custom = mcolors.ListedColormap(colors)
 
-    cbar3 = matplotlib.colorbar.ColorbarBase(
-        ax3,
-        cmap=cmap_white,
-        norm=norm,
-        orientation="horizontal",
-        boundaries=guage_range,
-    )
+        guage_range = np.linspace(0, 100, 512)
 
-    cbar.outline.set_visible(False)
-    cbar2.outline.set_visible(False)
-    cbar3.outline.set_visible(False)
+        norm = matplotlib.colors.Normalize(vmin=guage_range[0], vmax=guage_range[-1])
 
-    # R1 to R2 grey haze
-    # ax.axvspan(R1, R2, 0, 1, facecolor="#ECECEC")
-    # ax2.axvspan(R1, R2, 0.85, 1, facecolor="#ECECEC")
-    # ax3.axvspan(R1, R2, 0, 0.3, facecolor="#ECECEC")
+        cbar = matplotlib.colorbar.ColorbarBase(
+            ax,
+            cmap=cmap_custom,
+            norm=norm,
+            orientation="horizontal",
+            boundaries=guage_range,
+        )
 
-    # score tick
-    ax.axvspan(score - 0.5, score + 0.5, 0, 1, facecolor="#000000")
-    ax2.axvspan(score - 0.5, score + 0.5, 0.6, 1, facecolor="#000000")
-    ax3.axvspan(score - 0.5, score + 0.5, 0, 1, facecolor="#000000")
+        cbar2 = matplotlib.colorbar.ColorbarBase(
+            ax2,
+            cmap=cmap_white,
+            norm=norm,
+            orientation="horizontal",
+            boundaries=guage_range,
+        )
 
-    path_skill_gauge_chart = (
-        pathlib.Path("/tmp/job_fitment_graphic.jpg")#.parent.parent / "tmp" / "job_fitment_graphic.jpg"
-    )
+        cbar3 = matplotlib.colorbar.ColorbarBase(
+            ax3,
+            cmap=cmap_white,
+            norm=norm,
+            orientation="horizontal",
+            boundaries=guage_range,
+        )
 
-    ax.set_xticks([])
-    ax2.set_xticks([])
-    ax3.set_xticks([])
+        cbar.outline.set_visible(False)
+        cbar2.outline.set_visible(False)
+        cbar3.outline.set_visible(False)
 
-    annotation = plt.annotate(
-        "0%", xy=(0.1, 0.15), xycoords="figure fraction", ha="center", fontsize=10
-    )
-    annotation2 = plt.annotate(
-        "100%",
-        xy=(0.9, 0.15),
-        xycoords="figure fraction",
-        ha="center",
-        fontsize=10,
-    )
-    annotation3 = plt.annotate(
-        str(score) + "%",
-        xy=(score / 125 + 0.1, 0.85),
-        xycoords="figure fraction",
-        ha="center",
-        fontsize=10,
-    )
+        # R1 to R2 grey haze
+        # ax.axvspan(R1, R2, 0, 1, facecolor="#ECECEC")
+        # ax2.axvspan(R1, R2, 0.85, 1, facecolor="#ECECEC")
+        # ax3.axvspan(R1, R2, 0, 0.3, facecolor="#ECECEC")
+
+        # score tick
+        ax.axvspan(score - 0.5, score + 0.5, 0, 1, facecolor="#000000")
+        ax2.axvspan(score - 0.5, score + 0.5, 0.6, 1, facecolor="#000000")
+        ax3.axvspan(score - 0.5, score + 0.5, 0, 1, facecolor="#000000")
 
-    # annotation4 = plt.annotate(
-    #     "R1",
-    #     xy=(R1 / 125 + 0.1, 0.15),
-    #     xycoords="figure fraction",
-    #     ha="center",
-    #     fontsize=10,
-    # )
+        path_skill_gauge_chart = (
+            artifact_path("job_fitment_graphic")#.parent.parent / "tmp" / "job_fitment_graphic"
+        )
 
-    # annotation5 = plt.annotate(
-    #     "R2",
-    #     xy=(R2 / 125 + 0.1, 0.15),
-    #     xycoords="figure fraction",
-    #     ha="center",
-    #     fontsize=10,
-    # )
+        ax.set_xticks([])
+        ax2.set_xticks([])
+        ax3.set_xticks([])
 
-    plt.savefig(path_skill_gauge_chart, format="jpg")
+        ax3.annotate(
+            "0%", xy=(0.1, 0.15), xycoords="figure fraction", ha="center", fontsize=10
+        )
+        ax3.annotate(
+            "100%",
+            xy=(0.9, 0.15),
+            xycoords="figure fraction",
+            ha="center",
+            fontsize=10,
+        )
+        ax3.annotate(
+            str(score) + "%",
+            xy=(score / 125 + 0.1, 0.85),
+            xycoords="figure fraction",
+            ha="center",
+            fontsize=10,
+        )
 
-    annotation.remove()
-    annotation2.remove()
-    annotation3.remove()
-    # annotation4.remove()
-    # annotation5.remove()
+        # annotation4 = plt.annotate(
+        #     "R1",
+        #     xy=(R1 / 125 + 0.1, 0.15),
+        #     xycoords="figure fraction",
+        #     ha="center",
+        #     fontsize=10,
+        # )
+
+        # annotation5 = plt.annotate(
+        #     "R2",
+        #     xy=(R2 / 125 + 0.1, 0.15),
+        #     xycoords="figure fraction",
+        #     ha="center",
+        #     fontsize=10,
+        # )
+
+        return save_chart(
+            fig,
+            path_skill_gauge_chart,
+            chart_codecs["job_fitment_bar"],
+            quality_profile,
+            chart_placement_widths["job_fitment_bar"],
+        )
 
 
-def _generate_gauge_charts(series_scores: pd.Series) -> None:
+def _generate_gauge_charts(
+    series_scores: pd.Series, quality_profile: str = DEFAULT_QUALITY_PROFILE
+) -> Dict[str, pathlib.Path]:
     """
     Creates gauge graphs for all skills from the individual's self-assessment and save the static image to the tmp folder
 
     Args:
-        param(pd.Series): a pandas series that corresponds to the score receieved for each skill
+        param1(pd.Series): a pandas series that corresponds to the score receieved for each skill
+        param2(str): name of the render-quality profile (draft, screen or print)
 
     Returns:
-        None
+        Dict[str, pathlib.Path]: path of the gauge of each top and bottom skill
     """
 
     # make guage charts for only top and bottom skills
@@ -277,6 +466,36 @@ def _generate_gauge_charts(series_scores: pd.Series) -> None:
     list_all_skills = list_top_skills + list_bottom_skills
     series_scores = series_scores[list_all_skills]
 
+    dict_paths = {}
+    for category in series_scores.index:
+        category_string = str(category)
+        path_category = artifact_path(category_string)#.parent.parent / "tmp" / category_string
+
+        # the gauge only depends on the score, skills with the same score share a gauge
+        dict_paths[category] = encode_chart(
+            _render_gauge_chart(series_scores[category], quality_profile),
+            path_category,
+            chart_codecs["skill_gauge"],
+            quality_profile,
+        )
+
+    return dict_paths
+
+
+@memoize_chart()
+def _render_gauge_chart(
+    score: Union[float, int], quality_profile: str = DEFAULT_QUALITY_PROFILE
+) -> np.ndarray:
+    """
+    Draws the gauge of a single skill
+
+    Args:
+        param1(Union[float, int]): the self-assessment score of the skill
+        param2(str): name of the render-quality profile (draft, screen or print)
+
+    Returns:
+        np.ndarray: the RGB pixels of the gauge
+    """
     colors = ["lightgreen", "lightblue", "navajowhite", "salmon"]
 
     values = range(11)
@@ -284,12 +503,8 @@ def _generate_gauge_charts(series_scores: pd.Series) -> None:
     x_axis_values_polar_coords = [0, (2 / 11) * PI, (4 / 11) * PI, (7 / 11) * PI]
     x_axis_tickers = [(x + 0.5) / 11 * PI for x in range(10, -1, -1)]
 
-    for category in series_scores.index:
-        category_string = str(category) + ".jpeg"
-        path_category = pathlib.Path(f"/tmp/{category_string}")#.parent.parent / "tmp" / category_string
-
-        plt.figure(figsize=(10, 10))
-        ax = plt.subplot(1, 1, 1, polar=True)
+    with managed_figure(figsize=(10, 10)) as fig:
+        ax = fig.add_subplot(1, 1, 1, polar=True)
 
         ax.bar(
             x=x_axis_values_polar_coords,
@@ -303,14 +518,14 @@ def _generate_gauge_charts(series_scores: pd.Series) -> None:
         )
 
         for loc, val in zip(x_axis_tickers, values):
-            plt.annotate(
+            ax.annotate(
                 val, xy=(loc, 2.25), ha="center", fontsize=25, fontweight="bold"
             )
 
-        plt.annotate(
-            str(series_scores[category]),
+        ax.annotate(
+            str(score),
             xytext=(0, 0),
-            xy=(PI - ((series_scores[category] + 0.5) / 11) * PI, 2),
+            xy=(PI - ((score + 0.5) / 11) * PI, 2),
             arrowprops={"arrowstyle": "wedge", "color": "black", "shrinkA": 0},
             bbox={"boxstyle": "circle", "facecolor": "black", "linewidth": 1.0},
             fontsize=30,
@@ -320,43 +535,27 @@ def _generate_gauge_charts(series_scores: pd.Series) -> None:
 
         ax.set_axis_off()
 
-        plt.savefig(path_category, format="jpg")
-        _crop_guage_chart_image(path_category)
-        plt.clf()
-
-
-def _crop_guage_chart_image(path: pathlib.Path) -> None:
-    """
-    Crops the image of the guage chart to improve image quality
-
-    Args:
-        param(path): path to the static image
-
-    Returns:
-        None
-    """
-    graph = Image.open(path)
-
-    # Calculate the crop dimensions
-    width, height = graph.size
-    crop_region = (0, 0, width, height // 1.5)
-
-    # Crop the image
-    cropped_image = graph.crop(crop_region)
-
-    # Save the cropped image
-    cropped_image.save(path)
+        # only the upper half of the polar axes carries the gauge
+        return render_figure(
+            fig,
+            quality_profile,
+            chart_placement_widths["skill_gauge"],
+            crop=(0, 0, 1, 1 / 1.5),
+        )
 
 
-def _generate_spider_plot(*args: pd.Series) -> None:
+def _generate_spider_plot(
+    *args: pd.Series, quality_profile: str = DEFAULT_QUALITY_PROFILE
+) -> pathlib.Path:
     """
     Creates spidersplot graph that displays the self-assessment scores and any other comparison scores if provided
 
     Args:
-        param(*pd.Series): an indefinite list of series that correspond to each assessor's perception of the individual's abilities
+        param1(*pd.Series): an indefinite list of series that correspond to each assessor's perception of the individual's abilities
+        param2(str): name of the render-quality profile (draft, screen or print)
 
     Returns:
-        None
+        pathlib.Path: path of the spider plot
     """
 
     categories = _choose_skills_for_spider_plot(args[0])
@@ -381,53 +580,58 @@ def _generate_spider_plot(*args: pd.Series) -> None:
     angles = [n / float(N) * 2 * PI for n in range(N)]
     angles += angles[:1]
 
-    plt.rc("figure", figsize=(10, 10))
-
-    ax = plt.subplot(1, 1, 1, polar=True)
-
-    ax.set_theta_offset(PI / 2)
-    ax.set_theta_direction(-1)
-
-    plt.xticks(angles[:-1], categories, color="black", size=10)
-    ax.tick_params(axis="x", pad=30)
-
-    ax.set_rlabel_position(0)
-    plt.yticks([2, 4, 6, 8, 10], ["2", "4", "6", "8", "10"], color="black", size=10)
-    plt.ylim(0, 10)
-    print(list_scores)
-    for index, series in enumerate(list_scores):
-        ax.plot(angles, list_scores[index], color=colors[index], linewidth=1, linestyle="solid")
-        # ax.fill(angles, series, color = colors[index], alpha = 0.5)
-        for i, (angle, radius) in enumerate(zip(angles, series)):
-            x = angle
-            y = radius
-            if x >= 0 and x <= 1.5:
-                xytext = (0, 8)
-            elif x <= 3:
-                xytext = (8, 0)
-            elif x < 4.5:
-                xytext = (0, -8)
-            else:
-                xytext = (-8, 0)
-            print(x,y, xytext)
-
-            ax.annotate(
-                np.round(y, 1),
-                xy=(x, y),
-                xytext=xytext,
-                textcoords="offset points",
-                ha="center",
-                va="center",
-            )
+    with managed_figure(figsize=(10, 10)) as fig:
+        ax = fig.add_subplot(1, 1, 1, polar=True)
+
+        ax.set_theta_offset(PI / 2)
+        ax.set_theta_direction(-1)
+
+        ax.set_xticks(angles[:-1], categories, color="black", size=10)
+        ax.tick_params(axis="x", pad=30)
+
+        ax.set_rlabel_position(0)
+        ax.set_yticks([2, 4, 6, 8, 10], ["2", "4", "6", "8", "10"], color="black", size=10)
+        ax.set_ylim(0, 10)
+        print(list_scores)
+        for index, series in enumerate(list_scores):
+            ax.plot(angles, list_scores[index], color=colors[index], linewidth=1, linestyle="solid")
+            # ax.fill(angles, series, color = colors[index], alpha = 0.5)
+            for i, (angle, radius) in enumerate(zip(angles, series)):
+                x = angle
+                y = radius
+                if x >= 0 and x <= 1.5:
+                    xytext = (0, 8)
+                elif x <= 3:
+                    xytext = (8, 0)
+                elif x < 4.5:
+                    xytext = (0, -8)
+                else:
+                    xytext = (-8, 0)
+                print(x,y, xytext)
+
+                ax.annotate(
+                    np.round(y, 1),
+                    xy=(x, y),
+                    xytext=xytext,
+                    textcoords="offset points",
+                    ha="center",
+                    va="center",
+                )
 
-    ax.legend(
-        [series.name for series in args], bbox_to_anchor=(-0.15, 1.1), loc="upper left"
-    )
+        ax.legend(
+            [series.name for series in args], bbox_to_anchor=(-0.15, 1.1), loc="upper left"
+        )
 
-    path_spiderplot_graph = (
-        pathlib.Path(f"/tmp/baseline_assessment.jpg")#.parent.parent / "tmp" / "baseline_assessment.jpg"
-    )
-    plt.savefig(path_spiderplot_graph, format="jpg")
+        path_spiderplot_graph = (
+            artifact_path("baseline_assessment")#.parent.parent / "tmp" / "baseline_assessment"
+        )
+        return save_chart(
+            fig,
+            path_spiderplot_graph,
+            chart_codecs["spider_plot"],
+            quality_profile,
+            chart_placement_widths["spider_plot"],
+        )
 
 
 def _choose_skills_for_spider_plot(series_self_score: pd.Series) -> List[str]:
@@ -448,7 +652,11 @@ def _choose_skills_for_spider_plot(series_self_score: pd.Series) -> List[str]:
 
 
 def _generate_final_report(
-    dict_candidate: Dict[str, str], series_self_score: pd.Series
+    dict_candidate: Dict[str, str],
+    series_self_score: pd.Series,
+    dict_charts: Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]],
+    thumbnail: Union[str, None] = None,
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
 ) -> None:
     """
     Generate final report by first generating the html code and then the corresponding pdf report
@@ -456,27 +664,161 @@ def _generate_final_report(
     Args:
         param1(Dict[str, str]): a dictionary representing the candidate's profile
         param2(pd.Series): a pandas series representing the self-assessment scores
+        param3(Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]]): the path of every chart
+        param4(Union[str, None]): preview of the report written next to the pdf
+        param5(str): name of the quality profile of the static images
 
     Returns:
         None
     """
-    _generate_html(dict_candidate, series_self_score)
-    return _generate_pdf(dict_candidate)
+    document = _layout_report(dict_candidate, series_self_score, dict_charts, quality_profile)
+    return _generate_pdf(dict_candidate, document, thumbnail)
+
+
+def _layout_report(
+    dict_candidate: Dict[str, str],
+    series_self_score: pd.Series,
+    dict_charts: Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> weasyprint.Document:
+    """
+    Lays the report out: the dynamic pages are rendered from the template and the static pages,
+    laid out once per template version and quality profile, are merged in
+
+    Args:
+        param1(Dict[str, str]): a dictionary representing the candidate's profile
+        param2(pd.Series): a pandas series representing the self-assessment scores
+        param3(Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]]): the path of every chart
+        param4(str): name of the quality profile of the static images
+
+    Returns:
+        weasyprint.Document: the laid out report
+    """
+    list_static_pages = get_report_static_pages(quality_profile)
+    _generate_html(
+        dict_candidate,
+        series_self_score,
+        dict_charts,
+        len(list_static_pages),
+        quality_profile,
+    )
+
+    name, company = dict_candidate["name"].replace(" ", "_"), dict_candidate[
+        "company_name"
+    ].replace(" ", "_")
+    date_today_string = dt.date.today().strftime("%Y-%m-%d")
+    report_filename_html = "_".join([name, company, date_today_string]) + ".html"
+
+    document = weasyprint.HTML(
+        artifact_path(report_filename_html), url_fetcher=asset_url_fetcher
+    ).render()
+    return merge_static_pages(document, list_static_pages, STATIC_PAGE_OFFSET)
+
+
+def get_report_static_pages(
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> List[weasyprint.Page]:
+    """
+    Lays out the static pages of the report with the images of a quality profile, see
+    get_static_pages
+
+    Args:
+        param(str): name of the quality profile
+
+    Returns:
+        List[weasyprint.Page]: the laid out static pages
+    """
+    path_assets = _prepare_images(quality_profile)
+    return get_static_pages(
+        _get_template(),
+        [path_assets / resource for resource in static_page_resources],
+        STATIC_PAGE_OFFSET,
+        {"asset_directory": str(path_assets)},
+    )
+
+
+def _get_template() -> Template:
+    """
+    Loads the pilot.html template
+
+    Returns:
+        Template: the jinja2 template of the report
+    """
+    path_templates = pathlib.Path(__file__).parent.parent / "templates"
+    env = Environment(loader=FileSystemLoader(path_templates))
+    return env.get_template("pilot.html")
 
 
 def _generate_html(
-    dict_candidate: Dict[str, str], series_self_score: pd.Series
+    dict_candidate: Dict[str, str],
+    series_self_score: pd.Series,
+    dict_charts: Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]],
+    static_page_count: int,
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
 ) -> None:
     """
-    Render the html file by using jinja2 and the pilot.html file to customize the html file based on the specific candidate's scores
+    Render the html file by using jinja2 and the pilot.html file to customize the html file based on the specific candidate's scores.
+    Only the dynamic pages are rendered, the static pages are replaced by empty placeholder pages
 
     Args:
         param1(Dict[str, str]): a dictionary representing the candidate's profile
         param2(pd.Series): a pandas series representing the self-assessment scores
+        param3(Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]]): the path of every chart
+        param4(int): number of static pages to leave placeholders for
+        param5(str): name of the quality profile of the static images
 
     Returns:
         None
     """
+    template = _get_template()
+    rendered_template = template.render(
+        _get_template_payload(
+            dict_candidate,
+            series_self_score,
+            dict_charts,
+            "dynamic",
+            static_page_count,
+            quality_profile,
+        )
+    )
+
+    name, company = dict_candidate["name"].replace(" ", "_"), dict_candidate[
+        "company_name"
+    ].replace(" ", "_")
+    date_today_string = dt.date.today().strftime("%Y-%m-%d")
+    report_filename = "_".join([name, company, date_today_string])
+    report_filename += ".html"
+
+    path_rendered_template = (
+        artifact_path(report_filename)#.parent.parent / "results" / report_filename
+    )
+
+    with open(path_rendered_template, "w") as file:
+        file.write(rendered_template)
+
+
+def _get_template_payload(
+    dict_candidate: Dict[str, str],
+    series_self_score: pd.Series,
+    dict_charts: Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]],
+    page_group: str,
+    static_page_count: int,
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> Dict:
+    """
+    Builds the variables pilot.html is rendered with
+
+    Args:
+        param1(Dict[str, str]): a dictionary representing the candidate's profile
+        param2(pd.Series): a pandas series representing the self-assessment scores
+        param3(Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]]): the path of every chart
+        param4(str): static, dynamic, or anything else for the whole report
+        param5(int): number of static pages to leave placeholders for
+        param6(str): name of the quality profile of the static images
+
+    Returns:
+        Dict: the variables of the template
+    """
     list_top_skills, list_bottom_skills = _determine_top_and_bottom_skills(
         series_self_score
     )
@@ -488,36 +830,51 @@ def _generate_html(
         list_top_skills, list_bottom_skills
     )
 
+    # the narrative sections of a skill only depend on the text of the skill, they are rendered
+    # once per content version and the template only stitches them together in score order
     path_templates = pathlib.Path(__file__).parent.parent / "templates"
-    env = Environment(loader=FileSystemLoader(path_templates))
-    template = env.get_template("pilot.html")
+    dict_skill_fragments = {
+        "top_summaries": {
+            skill: render_fragment(
+                path_templates,
+                "fragments/skill_summary.html",
+                {"skill": skill, "text": dict_report_text[skill]["Potential Strength"]},
+            )
+            for skill in list_top_skills
+        },
+        "bottom_summaries": {
+            skill: render_fragment(
+                path_templates,
+                "fragments/skill_summary.html",
+                {"skill": skill, "text": dict_report_text[skill]["Development Considerations"]},
+            )
+            for skill in list_bottom_skills
+        },
+        "interview_questions": {
+            skill: render_fragment(
+                path_templates,
+                "fragments/interview_questions.html",
+                {"text": dict_report_text[skill]["Interview Questions"]},
+            )
+            for skill in list_top_skills + list_bottom_skills
+        },
+    }
 
-    payload = {
+    return {
+        "page_group": page_group,
+        "static_page_count": static_page_count,
+        "asset_directory": str(asset_directory(quality_profile)),
         "list_top_skills": list_top_skills,
         "number_top_skills": number_top_skills,
         "list_bottom_skills": list_bottom_skills,
         "number_bottom_skills": number_bottom_skills,
         "dict_report_text": dict_report_text,
+        "dict_skill_fragments": dict_skill_fragments,
         "dict_candidate": dict_candidate,
+        "dict_charts": dict_charts,
         "date": dt.date.today(),
     }
 
-    rendered_template = template.render(payload)
-
-    name, company = dict_candidate["name"].replace(" ", "_"), dict_candidate[
-        "company_name"
-    ].replace(" ", "_")
-    date_today_string = dt.date.today().strftime("%Y-%m-%d")
-    report_filename = "_".join([name, company, date_today_string])
-    report_filename += ".html"
-
-    path_rendered_template = (
-        pathlib.Path(f"/tmp/{report_filename}")#.parent.parent / "results" / report_filename
-    )
-
-    with open(path_rendered_template, "w") as file:
-        file.write(rendered_template)
-
 
 def _determine_top_and_bottom_skills(series_self_score: pd.Series) -> Tuple[List[str]]:
     """
@@ -574,12 +931,20 @@ def _get_text_for_top_and_bottom_skills(
     return dict_top_bottom_skills
 
 
-def _generate_pdf(dict_candidate: Dict[str, str]) -> None:
+def _generate_pdf(
+    dict_candidate: Dict[str, str],
+    document: weasyprint.Document,
+    thumbnail: Union[str, None] = None,
+) -> None:
     """
-    Creates the final PDF file and saves to the results folder
+    Creates the final PDF file from the laid out report, optimizes it for size with optimize_pdf,
+    and saves to the results folder
 
     Args:
         param1(Dict[str, int | str]]): The candidate's profile
+        param2(weasyprint.Document): the report laid out by _layout_report
+        param3(Union[str, None]): preview of the report written next to the pdf (first_page or
+        contact_sheet), painted from the same pages as the pdf
 
     Returns:
         None
@@ -589,19 +954,163 @@ def _generate_pdf(dict_candidate: Dict[str, str]) -> None:
     ].replace(" ", "_")
     date_today_string = dt.date.today().strftime("%Y-%m-%d")
     report_filename = "_".join([name, company, date_today_string])
-    report_filename_html = report_filename + ".html"
     report_filename_pdf = report_filename + ".pdf"
 
-    path_html_file = (
-        pathlib.Path(f"/tmp/{report_filename_html}")#.parent.parent / "results" / report_filename_html
-    )
     path_pdf_report = (
-        pathlib.Path(f"/tmp/{report_filename_pdf}")#.parent.parent / "results" / report_filename_pdf
+        artifact_path(report_filename_pdf)#.parent.parent / "results" / report_filename_pdf
     )
 
-    weasyprint.HTML(path_html_file).write_pdf(path_pdf_report)
+    document.write_pdf(path_pdf_report)
+    write_thumbnail(document, path_pdf_report, thumbnail)
+    optimize_pdf(path_pdf_report)
     return path_pdf_report
 
+
+def _generate_pdf_direct(
+    dict_candidate: Dict[str, str],
+    series_self_score: pd.Series,
+    dict_charts: Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> pathlib.Path:
+    """
+    Writes the final PDF file directly with the fixed layout of the report, without rendering the
+    template nor laying it out with weasyprint, optimizes it for size with optimize_pdf, and saves
+    to the results folder
+
+    Args:
+        param1(Dict[str, str]): a dictionary representing the candidate's profile
+        param2(pd.Series): a pandas series representing the self-assessment scores
+        param3(Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]]): the path of every chart
+        param4(str): name of the quality profile of the static images
+
+    Returns:
+        pathlib.Path: path of the pdf
+    """
+    name, company = dict_candidate["name"].replace(" ", "_"), dict_candidate[
+        "company_name"
+    ].replace(" ", "_")
+    date_today_string = dt.date.today().strftime("%Y-%m-%d")
+    report_filename = "_".join([name, company, date_today_string]) + ".pdf"
+
+    path_pdf_report = _layout_direct(
+        dict_candidate, series_self_score, dict_charts, quality_profile
+    ).write(artifact_path(report_filename))
+    # weasyprint does not lay these pages out, drop the preview of a previous report instead
+    save_thumbnail([], path_pdf_report, None)
+    optimize_pdf(path_pdf_report)
+    return path_pdf_report
+
+
+def _layout_direct(
+    dict_candidate: Dict[str, str],
+    series_self_score: pd.Series,
+    dict_charts: Dict[str, Union[pathlib.Path, Dict[str, pathlib.Path]]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> DirectPdf:
+    list_top_skills, list_bottom_skills = _determine_top_and_bottom_skills(
+        series_self_score
+    )
+    return layout_direct_report(
+        dict_candidate,
+        list_top_skills,
+        list_bottom_skills,
+        _get_text_for_top_and_bottom_skills(list_top_skills, list_bottom_skills),
+        dict_charts,
+        _prepare_images(quality_profile),
+    )
+
+
+class _TextExtractor(html.parser.HTMLParser):
+    """
+    Collects the text of the body of an html document, comments excluded
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.in_body = False
+        self.list_text = []
+
+    def handle_starttag(self, tag, attrs):
+        self.in_body = self.in_body or tag == "body"
+
+    def handle_data(self, data):
+        if self.in_body:
+            self.list_text.append(data)
+
+
+def _count_words(text: str) -> collections.Counter:
+    # case is ignored, headings are upper-cased by the stylesheet
+    return collections.Counter(re.findall(r"\w+", text.lower()))
+
+
+def backend_parity_check(
+    payload: Dict[str, Dict[str, Union[float, int, str]]],
+    quality_profile: str = DEFAULT_QUALITY_PROFILE,
+) -> Dict[str, Union[int, float, List[str]]]:
+    """
+    Checks that the direct backend writes the same report as the html backend: every word of the
+    rendered template must be drawn by the direct backend, and no other. The page count and the
+    time taken by both backends are reported as well, from the same charts
+
+    Args:
+        param1(Dict[str, Dict[str, int | str]]): The candidate's profile and assessment results
+        param2(str): name of the render-quality profile used for every chart
+
+    Returns:
+        Dict[str, Union[int, float, List[str]]]: the words missing from and the extra words of
+        the direct backend, and the pages and seconds of each backend
+
+    Raises:
+        AssertionError: the text of the backends differs
+    """
+    _validate_payload(payload)
+    dict_candidate, dict_job_fitment, df_all_scores, list_series_agent_scores = _parse_payload(
+        payload
+    )
+    series_self_score = df_all_scores["Self"]
+    dict_charts = _generate_charts(
+        dict_job_fitment, df_all_scores, list_series_agent_scores, quality_profile
+    )
+    path_assets = _prepare_images(quality_profile)
+
+    start = time.perf_counter()
+    rendered_template = _get_template().render(
+        _get_template_payload(
+            dict_candidate, series_self_score, dict_charts, "all", 0, quality_profile
+        )
+    )
+    document = weasyprint.HTML(
+        string=rendered_template, base_url=str(path_assets), url_fetcher=asset_url_fetcher
+    ).render()
+    html_pages = len(document.pages)
+    html_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    document = _layout_direct(dict_candidate, series_self_score, dict_charts, quality_profile)
+    document.write(artifact_path("backend_parity_check.pdf"))
+    direct_seconds = time.perf_counter() - start
+
+    extractor = _TextExtractor()
+    extractor.feed(rendered_template)
+    words_html = _count_words(" ".join(extractor.list_text))
+    words_direct = _count_words(" ".join(document.text_runs))
+
+    result = {
+        "missing_words": sorted((words_html - words_direct).elements()),
+        "extra_words": sorted((words_direct - words_html).elements()),
+        "html_pages": html_pages,
+        "direct_pages": len(document.pages),
+        "html_seconds": round(html_seconds, 3),
+        "direct_seconds": round(direct_seconds, 3),
+    }
+    print("backend parity check", result)
+    if result["missing_words"] or result["extra_words"]:
+        raise AssertionError(
+            f"the direct backend misses {result['missing_words']} and adds {result['extra_words']}"
+        )
+    return result
+
+
 def _delete_temp_files() -> None:
     """
     Deletes all files that were created except for the PDF file (images/graphs and html/css)
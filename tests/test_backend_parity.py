@@ -0,0 +1,136 @@
+"""
+The direct pdf backend of the talentinsights report must write the report the html backend lays
+out: the same pages, the same text on every page in the same order, and the charts holding the
+scores on the same pages
+
+    python -m pytest tests/test_backend_parity.py
+"""
+from typing import List, Set
+import re
+import shutil
+import pytest
+
+try:
+    # weasyprint loads cairo and pango when it is imported
+    from weasyprint.formatting_structure import boxes
+except OSError as error:
+    pytest.skip(f"weasyprint cannot load cairo: {error}", allow_module_level=True)
+
+from common.artifacts import report_artifacts
+from common.benchmark import sample_payload
+from talentinsights_assessment.scripts import talentinsights_pdf_report
+
+QUALITY_PROFILE = "draft"
+
+
+def _words(list_text: List[str]) -> List[str]:
+    # case is ignored, headings are upper-cased by the stylesheet
+    return re.findall(r"\w+", " ".join(list_text).lower())
+
+
+def _box_text(box) -> List[str]:
+    """
+    Text of a laid out box, without the margin boxes (page numbers) and the generated content
+    (list markers, ::before and ::after) the direct backend does not count as text either
+    """
+    if isinstance(box, boxes.MarginBox) or "::" in (getattr(box, "element_tag", "") or ""):
+        return []
+    if isinstance(box, boxes.TextBox):
+        return [box.text]
+    return [text for child in getattr(box, "children", []) for text in _box_text(child)]
+
+
+def _box_images(box) -> Set[str]:
+    if isinstance(box, boxes.ReplacedBox) and box.element is not None:
+        return {box.element.get("src")}
+    return {path for child in getattr(box, "children", []) for path in _box_images(child)}
+
+
+@pytest.fixture(scope="module")
+def layouts():
+    """
+    The sample report laid out by both backends, from the same charts
+    """
+    payload = sample_payload()
+    payload["Candidate"] = dict(payload["Candidate"])
+    with report_artifacts("backend_parity") as directory:
+        (
+            dict_candidate,
+            dict_job_fitment,
+            df_all_scores,
+            list_series_agent_scores,
+        ) = talentinsights_pdf_report._parse_payload(payload)
+        series_self_score = df_all_scores["Self"]
+        dict_charts = talentinsights_pdf_report._generate_charts(
+            dict_job_fitment, df_all_scores, list_series_agent_scores, QUALITY_PROFILE
+        )
+        html = talentinsights_pdf_report._layout_report(
+            dict_candidate, series_self_score, dict_charts, QUALITY_PROFILE
+        )
+        direct = talentinsights_pdf_report._layout_direct(
+            dict_candidate, series_self_score, dict_charts, QUALITY_PROFILE
+        )
+    yield series_self_score, dict_charts, html, direct
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_page_count(layouts):
+    _, _, html, direct = layouts
+    assert len(direct.pages) == len(html.pages)
+
+
+def test_text_of_every_page(layouts):
+    _, _, html, direct = layouts
+    for number, (html_page, direct_page) in enumerate(zip(html.pages, direct.pages), 1):
+        assert _words(direct_page["text_runs"]) == _words(_box_text(html_page._page_box)), (
+            f"page {number}"
+        )
+
+
+def test_every_score(layouts):
+    """
+    The scores are drawn by the charts: the match score by the job fitment bar, every score by the
+    spider plot and the scores of the top and bottom skills by their gauges, next to the heading
+    of their skill
+    """
+    series_self_score, dict_charts, html, direct = layouts
+    images_direct = {name: path for path, name in direct.images.items()}
+    list_html_images = [_box_images(page._page_box) for page in html.pages]
+    list_direct_images = [
+        {images_direct[name] for name in page["images"]} for page in direct.pages
+    ]
+    list_score_charts = [
+        str(dict_charts["job_fitment_graphic"]),
+        str(dict_charts["baseline_assessment"]),
+        *map(str, dict_charts["skill_gauges"].values()),
+    ]
+    for path_chart in list_score_charts:
+        html_pages = [
+            index for index, images in enumerate(list_html_images) if path_chart in images
+        ]
+        direct_pages = [
+            index for index, images in enumerate(list_direct_images) if path_chart in images
+        ]
+        assert html_pages, f"{path_chart} is not in the html report"
+        assert direct_pages == html_pages, path_chart
+
+    list_top_skills, list_bottom_skills = (
+        talentinsights_pdf_report._determine_top_and_bottom_skills(series_self_score)
+    )
+    list_headings = [(skill, "high") for skill in list_top_skills]
+    list_headings += [(skill, "low") for skill in list_bottom_skills]
+    list_html_words = [_words(_box_text(page._page_box)) for page in html.pages]
+    list_direct_words = [_words(page["text_runs"]) for page in direct.pages]
+    for skill, level in list_headings:
+        path_gauge = str(dict_charts["skill_gauges"][skill])
+        heading = _words([f"{skill}: {level}"])
+        for list_images, list_words in [
+            (list_html_images, list_html_words),
+            (list_direct_images, list_direct_words),
+        ]:
+            for images, words in zip(list_images, list_words):
+                if path_gauge in images:
+                    assert any(
+                        words[index : index + len(heading)] == heading
+                        for index in range(len(words))
+                    ), f"the gauge of {skill} is not under its heading"